@@ -1,19 +1,35 @@
 import sys
 import os
+import tornado.ioloop
 import forest.main
+import forest.sync
+import forest.watch
 import forest.cli.main
 import forest.data as data
 
 
 class DatasetSyncCallback:
-    """Process to synchronize datasets"""
-    def __init__(self, datasets):
+    """Process to synchronize datasets
+
+    Syncs run in a :class:`forest.sync.SyncWorker` so that the server
+    loop is free to serve sessions
+    """
+    def __init__(self, datasets, worker=None):
         self.datasets = datasets
+        if worker is None:
+            worker = forest.sync.SyncWorker()
+        self.worker = worker
 
     def __call__(self):
         for dataset in self.datasets:
             if hasattr(dataset, "sync"):
-                dataset.sync()
+                self.worker.submit(dataset)
+
+    def subscribe(self):
+        """Sync datasets as soon as watched files are added"""
+        for dataset in self.datasets:
+            if hasattr(dataset, "sync"):
+                self.worker.subscribe(dataset, dataset.sync.catalogue)
 
 
 def on_server_loaded(server_context):
@@ -23,7 +39,10 @@ def on_server_loaded(server_context):
     config = forest.main.configure(argv)
     #config = forest.main.configure(parse_forest_args())
     interval_ms = 15 * 60 * 1000  # 15 minutes in miliseconds
-    callback = DatasetSyncCallback(list(config.datasets))
+    worker = forest.sync.SyncWorker(loop=tornado.ioloop.IOLoop.current())
+    forest.watch.WATCHER.configure(**config.watch)
+    callback = DatasetSyncCallback(list(config.datasets), worker)
+    callback.subscribe()
     server_context.add_periodic_callback(callback, interval_ms)
 
 
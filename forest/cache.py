@@ -0,0 +1,140 @@
+"""
+Shared image cache
+------------------
+
+Decoded and stretched images are expensive to produce and are often
+requested by many sessions at once, e.g. when several users open
+the latest model run. Loaders store their payloads in a single
+process-wide cache with a memory budget so that work done for one
+session is re-used by all of them.
+
+.. autoclass:: ImageCache
+   :members:
+
+.. autodata:: IMAGE_CACHE
+
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+DEFAULT_MAX_MEGABYTES = 512
+
+
+class ImageCache:
+    """Least recently used cache limited by memory rather than entries
+
+    :param max_megabytes: memory budget for all cached payloads
+    """
+    def __init__(self, max_megabytes=DEFAULT_MAX_MEGABYTES):
+        self.max_megabytes = max_megabytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_bytes(self):
+        return int(self.max_megabytes * 1024 ** 2)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Retrieve a payload and mark it as recently used"""
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a payload, evicting least recently used entries
+
+        .. note:: Payloads without array data, e.g. empty images, are
+                  not stored so that missing data is searched for again
+        """
+        size = nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                _, old_size = self._entries.pop(key)
+                self.nbytes -= old_size
+            if (size == 0) or (size > self.max_bytes):
+                return
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            self._evict()
+
+    def load(self, key, method, *args, **kwargs):
+        """Retrieve a payload or compute and store it on a miss
+
+        .. note:: The lock is not held while ``method`` runs, concurrent
+                  misses for the same key may load it more than once
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = method(*args, **kwargs)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Remove all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def resize(self, max_megabytes):
+        """Change memory budget, evicting entries if necessary"""
+        with self._lock:
+            self.max_megabytes = max_megabytes
+            self._evict()
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and len(self._entries) > 0:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.nbytes -= size
+
+    def stats(self):
+        """Summary of cache usage"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+def nbytes(value):
+    """Estimate memory used by arrays inside a payload"""
+    if isinstance(value, np.ma.MaskedArray):
+        size = value.data.nbytes
+        if value.mask is not np.ma.nomask:
+            size += np.asarray(value.mask).nbytes
+        return size
+    elif isinstance(value, np.ndarray):
+        return value.nbytes
+    elif isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values())
+    elif isinstance(value, (list, tuple)):
+        return sum(nbytes(v) for v in value)
+    elif isinstance(getattr(value, "nbytes", None), (int, np.integer)):
+        # Objects that report their own size, e.g. forest.pyramid.Pyramid
+        return int(value.nbytes)
+    return 0
+
+
+#: Process-wide cache shared by all sessions and loaders
+IMAGE_CACHE = ImageCache()
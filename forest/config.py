@@ -23,6 +23,10 @@ applications.
 import os
 import string
 import yaml
+import forest.cache
+import forest.handles
+import forest.prefetch
+import forest.watch
 import forest.drivers
 import forest.state
 from dataclasses import dataclass, field
@@ -185,6 +189,97 @@ class Config(object):
         """
         return self.data.get("presets", {}).get("file", None)
 
+    @property
+    def image_cache_megabytes(self):
+        """Memory budget of the image cache shared by all sessions
+
+        .. code-block:: yaml
+
+            image_cache:
+              max_megabytes: 1024
+
+        :returns: size in megabytes (default: 512)
+        """
+        settings = self.data.get("image_cache", {})
+        return settings.get("max_megabytes", forest.cache.DEFAULT_MAX_MEGABYTES)
+
+    @property
+    def max_open_files(self):
+        """Number of files kept open between reads
+
+        .. code-block:: yaml
+
+            open_files:
+              max_handles: 32
+
+        A value of 0 opens files for every read
+
+        :returns: number of handles (default: 32)
+        """
+        settings = self.data.get("open_files", {})
+        return settings.get("max_handles",
+                            forest.handles.DEFAULT_MAX_HANDLES)
+
+    @property
+    def render_workers(self):
+        """Threads used to load images off the bokeh event loop
+
+        .. code-block:: yaml
+
+            render:
+              max_workers: 4
+
+        A value of 0 loads images synchronously
+
+        :returns: number of threads (default: 4)
+        """
+        settings = self.data.get("render", {})
+        return settings.get("max_workers", 4)
+
+    @property
+    def prefetch(self):
+        """Background loading of neighbouring valid times and pressures
+
+        .. code-block:: yaml
+
+            prefetch:
+              depth: 2
+              max_workers: 2
+
+        A depth of 0 turns prefetching off
+
+        :returns: dict with keys depth and max_workers
+        """
+        settings = {
+            "depth": forest.prefetch.DEFAULT_DEPTH,
+            "max_workers": forest.prefetch.DEFAULT_MAX_WORKERS
+        }
+        settings.update(self.data.get("prefetch", {}))
+        return settings
+
+    @property
+    def watch(self):
+        """Discover new files from file system events or by polling
+
+        .. code-block:: yaml
+
+            watch:
+              method: auto
+              interval: 60
+
+        Method is one of ``auto``, ``inotify``, ``poll`` or ``none``,
+        auto polls network file systems every interval seconds and
+        uses inotify elsewhere if watchdog is installed
+
+        :returns: dict with keys method and interval
+        """
+        settings = {
+            "method": forest.watch.DEFAULT_METHOD,
+            "interval": forest.watch.DEFAULT_INTERVAL
+        }
+        settings.update(self.data.get("watch", {}))
+        return settings
+
     @property
     def patterns(self):
         if "files" in self.data:
@@ -257,7 +352,10 @@ class Config(object):
                 "pattern": group.pattern,
                 "locator": group.locator,
                 "database_path": group.database_path,
-                "directory": group.directory
+                "directory": group.directory,
+                "cache_directory": group.cache_directory,
+                "index_directory": group.index_directory,
+                "max_megabytes": group.max_megabytes
             }
             yield forest.drivers.get_dataset(group.file_type, settings)
 
@@ -278,6 +376,12 @@ class FileGroup(object):
     :param locator: keyword describing search method (default: 'file_system')
     :param file_type: keyword describing file contents (default: 'unified_model')
     :param directory: leaf/absolute directory where file(s) are stored (default: None)
+    :param cache_directory: directory where drivers may store converted
+                            copies of files, e.g. earth_networks (default: None)
+    :param index_directory: directory where drivers may store file indices,
+                            e.g. nearcast (default: None)
+    :param max_megabytes: memory budget of driver caches, e.g. earth_networks
+                          grids (default: driver specific)
     """
     def __init__(self,
             label,
@@ -285,13 +389,19 @@ class FileGroup(object):
             locator="file_system",
             file_type="unified_model",
             directory=None,
-            database_path=None):
+            database_path=None,
+            cache_directory=None,
+            index_directory=None,
+            max_megabytes=None):
         self.label = label
         self.pattern = pattern
         self.locator = locator
         self.file_type = file_type
         self.directory = directory
         self.database_path = database_path
+        self.cache_directory = cache_directory
+        self.index_directory = index_directory
+        self.max_megabytes = max_megabytes
 
     @property
     def full_pattern(self):
@@ -302,7 +412,8 @@ class FileGroup(object):
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             raise Exception("Can not compare")
-        attrs = ("label", "pattern", "locator", "file_type", "directory")
+        attrs = ("label", "pattern", "locator", "file_type", "directory",
+                 "cache_directory", "index_directory", "max_megabytes")
         return all(
                 getattr(self, attr) == getattr(other, attr)
                 for attr in attrs)
@@ -317,7 +428,10 @@ class FileGroup(object):
             "locator",
             "file_type",
             "directory",
-            "database_path"]
+            "database_path",
+            "cache_directory",
+            "index_directory",
+            "max_megabytes"]
         kwargs = [
             "{}={}".format(attr, self._str(getattr(self, attr)))
                 for attr in kwarg_attrs]
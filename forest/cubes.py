@@ -0,0 +1,138 @@
+"""
+Cube catalogue
+--------------
+
+Gridded forecast, GHRSST and NAME datasets describe their menus and
+images with iris cubes. Loading every file with ``iris.load`` each
+time a navigator or map view was constructed meant every new browser
+tab re-parsed every file. A :class:`CubeCatalogue` loads the cubes of a
+dataset once, with deferred data, and is shared by the dataset's
+navigators and image loaders.
+
+Files are found by a :class:`forest.watch.Catalogue`. Cubes are loaded
+per file with ``iris.load_raw`` and merged as ``iris.load`` would, so
+that adding a file only parses that file. Call
+:meth:`CubeCatalogue.refresh` to pick up files that changed on disk.
+
+.. autoclass:: CubeCatalogue
+   :members:
+
+.. autofunction:: name_cubes
+
+"""
+import os
+import threading
+import collections
+from collections.abc import Mapping
+import datetime as dt
+import forest.watch
+try:
+    import iris
+except ModuleNotFoundError:
+    # ReadTheDocs can't import iris
+    iris = None
+
+
+def name_cubes(cubes, is_valid_cube):
+    """Map names to valid cubes, duplicate names get numeric suffixes"""
+    cubes = list(filter(is_valid_cube, cubes))
+
+    # Find all the names with duplicates
+    name_counts = collections.Counter(cube.name() for cube in cubes)
+    duplicate_names = {name for name, count in name_counts.items()
+                       if count > 1}
+
+    # Map names (with numeric suffixes for duplicates) to cubes
+    duplicate_counts = collections.defaultdict(int)
+    cube_mapping = {}
+    for cube in cubes:
+        name = cube.name()
+        if name in duplicate_names:
+            duplicate_counts[name] += 1
+            name += f' ({duplicate_counts[name]})'
+        cube_mapping[name] = cube
+    return cube_mapping
+
+
+class CubeCatalogue(Mapping):
+    """Lazily loaded mapping of names to the cubes matching a pattern
+
+    Cubes are loaded on first access and again after files are added
+    to or removed from the pattern's :class:`forest.watch.Catalogue`
+
+    :param pattern: glob pattern of files to load
+    :param is_valid_cube: callable selecting cubes to include
+    """
+    def __init__(self, pattern, is_valid_cube=None):
+        self.pattern = pattern
+        self.is_valid_cube = is_valid_cube or (lambda cube: True)
+        self.loads = 0
+        self._raw = {}
+        self._cubes = None
+        self._subscribed = False
+        self._lock = threading.RLock()
+        self.catalogue = forest.watch.WATCHER.catalogue(
+            pattern, max_age=dt.timedelta(minutes=10))
+
+    def __getitem__(self, key):
+        return self.cubes()[key]
+
+    def __iter__(self):
+        return iter(self.cubes())
+
+    def __len__(self):
+        return len(self.cubes())
+
+    def cubes(self):
+        """Names and cubes of current files"""
+        self.sync()
+        with self._lock:
+            if self._cubes is None:
+                self._cubes = self._load(self.catalogue.paths)
+            return self._cubes
+
+    def sync(self):
+        """Subscribe to catalogue on first use, rescan if out of date"""
+        with self._lock:
+            if not self._subscribed:
+                self.catalogue.subscribe(self.on_change)
+                self._subscribed = True
+        self.catalogue.refresh()
+
+    def on_change(self, added, removed):
+        """Forget cubes once paths are added or removed"""
+        with self._lock:
+            for path in removed:
+                self._raw.pop(path, None)
+            self._cubes = None
+
+    def refresh(self):
+        """Rescan files and reload any that changed on disk"""
+        self.catalogue.rescan()
+        with self._lock:
+            for path, (mtime_ns, _) in list(self._raw.items()):
+                if _mtime_ns(path) != mtime_ns:
+                    del self._raw[path]
+                    self._cubes = None
+
+    def _load(self, paths):
+        raw = iris.cube.CubeList()
+        for path in paths:
+            raw.extend(self._load_raw(path))
+        return name_cubes(raw.merge(unique=False), self.is_valid_cube)
+
+    def _load_raw(self, path):
+        mtime_ns = _mtime_ns(path)
+        entry = self._raw.get(path)
+        if (entry is None) or (entry[0] != mtime_ns):
+            entry = (mtime_ns, iris.load_raw(path))
+            self._raw[path] = entry
+            self.loads += 1
+        return entry[1]
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
@@ -9,7 +9,8 @@ class Connection(object):
     @classmethod
     def connect(cls, path):
         """Create database instance from location on disk or :memory:"""
-        return cls(sqlite3.connect(path))
+        # Shared with prefetch threads, see forest.prefetch
+        return cls(sqlite3.connect(path, check_same_thread=False))
 
     def __enter__(self):
         return self
@@ -95,11 +95,12 @@ State = namedtuple("State", (
     "valid_times",
     "pressure",
     "pressures",
-    "valid_format"))
+    "valid_format",
+    "viewport"))
 State.__new__.__defaults__ = (None,) * len(State._fields)
 
 def statehash(self):
-    return hash((self.pattern, str(self.patterns), self.variable, self.initial_time, str(self.initial_times), self.valid_time, str(self.valid_times), self.pressure, str(self.pressures), self.valid_format))
+    return hash((self.pattern, str(self.patterns), self.variable, self.initial_time, str(self.initial_times), self.valid_time, str(self.valid_times), self.pressure, str(self.pressures), self.valid_format, str(self.viewport)))
 
 def time_equal(a, b):
     if (a is None) and (b is None):
@@ -156,7 +157,8 @@ def state_eq(self, other):
             time_array_equal(self.valid_times, other.valid_times) and
             equal_value(self.pressure, other.pressure) and
             np.shape(self.pressures) == np.shape(other.pressures) and
-            equal_value(self.pressures, other.pressures)
+            equal_value(self.pressures, other.pressures) and
+            (self.viewport == other.viewport)
     )
 
 State.__hash__ = statehash
@@ -3,6 +3,7 @@ try:
 except ImportError:
     # ReadTheDocs can't install iris
     pass
+import sqlite3
 import netCDF4
 import jinja2
 import numpy as np
@@ -13,10 +14,50 @@ from forest import mark
 
 __all__ = [
     "Database",
-    "CoordinateDB"
+    "CoordinateDB",
+    "registered_datasets"
 ]
 
 
+#: Secondary indexes used by menu and locate queries, variable(name, file_id)
+#: is covered by its UNIQUE constraint
+INDEXES = [
+    ("file_reference", "file(reference)"),
+    ("variable_file_id", "variable(file_id, name)"),
+    ("time_value", "time(value)"),
+    ("variable_to_time_time_id", "variable_to_time(time_id)"),
+    ("variable_to_pressure_pressure_id", "variable_to_pressure(pressure_id)"),
+    ("dataset_to_file_file_id", "dataset_to_file(file_id)"),
+]
+
+
+def file_filter(file_id, file_name, indexed):
+    """SQL condition selecting files that match :pattern
+
+    :param file_id: column holding file ids, e.g. ``file.id``
+    :param file_name: column holding file names, e.g. ``file.name``
+    :param indexed: True if :pattern is a registered dataset
+    """
+    if indexed:
+        return """{} IN (
+                SELECT df.file_id
+                  FROM dataset_to_file AS df
+                  JOIN dataset AS d
+                    ON d.id = df.dataset_id
+                 WHERE d.pattern = :pattern)""".format(file_id)
+    return "{} GLOB :pattern".format(file_name)
+
+
+def registered_datasets(cursor):
+    """Patterns registered with :meth:`Database.insert_dataset`"""
+    try:
+        cursor.execute("SELECT pattern FROM dataset")
+    except sqlite3.OperationalError:
+        # Database created before datasets were introduced
+        return set()
+    return set(pattern for pattern, in cursor.fetchall())
+
+
 class CoordinateDB(Connection):
     def __init__(self, connection):
         self.connection = connection
@@ -224,6 +265,53 @@ class Database(Connection):
                     FOREIGN KEY(variable_id) REFERENCES variable(id),
                     FOREIGN KEY(time_id) REFERENCES time(id))
         """)
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dataset (
+                    id INTEGER PRIMARY KEY,
+                    pattern TEXT NOT NULL,
+                    UNIQUE(pattern))
+        """)
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dataset_to_file (
+                    dataset_id INTEGER,
+                    file_id INTEGER,
+                    PRIMARY KEY(dataset_id, file_id),
+                    FOREIGN KEY(dataset_id) REFERENCES dataset(id),
+                    FOREIGN KEY(file_id) REFERENCES file(id))
+        """)
+        for name, columns in INDEXES:
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS {} ON {}".format(name, columns))
+        self.datasets = registered_datasets(self.cursor)
+
+    def insert_dataset(self, pattern):
+        """Register a file name pattern as a dataset
+
+        Files matching a registered pattern are found with an
+        equality lookup rather than scanning every file name
+        """
+        with self.connection:
+            self.cursor.execute("""
+                INSERT OR IGNORE INTO dataset (pattern) VALUES (:pattern)
+            """, dict(pattern=pattern))
+            self.cursor.execute("""
+                INSERT OR IGNORE INTO dataset_to_file (dataset_id, file_id)
+                SELECT dataset.id, file.id
+                  FROM dataset
+                  JOIN file ON file.name GLOB dataset.pattern
+                 WHERE dataset.pattern = :pattern
+            """, dict(pattern=pattern))
+        self.datasets.add(pattern)
+
+    def _link_datasets(self, paths):
+        """Add newly inserted files to matching datasets"""
+        self.cursor.executemany("""
+            INSERT OR IGNORE INTO dataset_to_file (dataset_id, file_id)
+            SELECT dataset.id, file.id
+              FROM dataset
+              JOIN file ON file.name GLOB dataset.pattern
+             WHERE file.name = :path
+        """, [dict(path=path) for path in paths])
 
     def insert_netcdf(self, path):
         """Coordinate and meta-data information taken from NetCDF file"""
@@ -257,6 +345,58 @@ class Database(Connection):
             except iris.exceptions.CoordinateNotFoundError:
                 pass
 
+    def insert_headers(self, headers):
+        """Store headers of many files in a single transaction
+
+        :param headers: dicts returned by :func:`forest.db.ingest.read_header`
+        :returns: number of files stored
+        """
+        files, variables, times, pressures = [], [], [], []
+        for header in headers:
+            path = header["path"]
+            files.append(dict(path=path, reference=header["reference"]))
+            for variable in header["variables"]:
+                key = dict(path=path, variable=variable["name"])
+                variables.append(dict(
+                    key,
+                    time_axis=variable["time_axis"],
+                    pressure_axis=variable["pressure_axis"]))
+                times += [dict(key, i=i, value=value)
+                          for i, value in enumerate(variable["times"])]
+                pressures += [dict(key, i=i, value=value)
+                              for i, value in enumerate(variable["pressures"])]
+        with self.connection:
+            self.cursor.executemany("""
+                INSERT OR IGNORE INTO file (name, reference)
+                VALUES (:path, :reference)
+            """, files)
+            self._link_datasets([row["path"] for row in files])
+            self.cursor.executemany("""
+                INSERT OR IGNORE
+                       INTO variable (name, time_axis, pressure_axis, file_id)
+                     VALUES (
+                            :variable,
+                            :time_axis,
+                            :pressure_axis,
+                            (SELECT id FROM file WHERE name=:path))
+            """, variables)
+            for table, rows in (("time", times), ("pressure", pressures)):
+                self.cursor.executemany("""
+                    INSERT OR IGNORE INTO {table} (i, value) VALUES (:i, :value)
+                """.format(table=table), rows)
+                self.cursor.executemany("""
+                    INSERT OR IGNORE
+                           INTO variable_to_{table} (variable_id, {table}_id)
+                         VALUES (
+                                (SELECT variable.id FROM variable
+                                   JOIN file ON variable.file_id = file.id
+                                  WHERE file.name=:path
+                                    AND variable.name=:variable),
+                                (SELECT id FROM {table}
+                                  WHERE i=:i AND value=:value))
+                """.format(table=table), rows)
+        return len(files)
+
     @staticmethod
     def _axis(cube, coord):
         try:
@@ -282,9 +422,9 @@ class Database(Connection):
                 SELECT DISTINCT reference
                   FROM file
                  WHERE reference IS NOT NULL
-                   AND name GLOB :pattern
+                   AND {}
                  ORDER BY reference;
-            """
+            """.format(file_filter("id", "name", pattern in self.datasets))
         self.cursor.execute(query, dict(pattern=pattern))
         rows = self.cursor.fetchall()
         return [r for r, in rows]
@@ -301,9 +441,9 @@ class Database(Connection):
             query = """
                 SELECT name
                   FROM file
-                 WHERE name GLOB :pattern
+                 WHERE {}
                  ORDER BY name;
-            """
+            """.format(file_filter("id", "name", pattern in self.datasets))
         self.cursor.execute(query, dict(pattern=pattern))
         rows = self.cursor.fetchall()
         return [r for r, in rows]
@@ -318,10 +458,11 @@ class Database(Connection):
               {% if pattern is not none %}
               JOIN file
                 ON file.id = variable.file_id
-             WHERE file.name GLOB :pattern
+             WHERE {{ match }}
               {% endif %}
              ORDER BY variable.name;
-        """).render(pattern=pattern)
+        """).render(pattern=pattern, match=file_filter(
+            "file.id", "file.name", pattern in self.datasets))
         self.cursor.execute(query, dict(pattern=pattern))
         rows = self.cursor.fetchall()
         return [r for r, in rows]
@@ -333,6 +474,8 @@ class Database(Connection):
             INSERT OR IGNORE INTO file (name, reference)
             VALUES (:path, :reference)
         """, dict(path=path, reference=reference_time))
+        if self.cursor.rowcount == 1:
+            self._link_datasets([path])
 
     def insert_variable(
             self,
@@ -377,7 +520,8 @@ class Database(Connection):
     @mark.sql_sanitize_time("initial_time")
     def valid_times(self, pattern, variable, initial_time):
         """Valid times associated with search criteria"""
-        query = self.valid_times_query(pattern, variable, initial_time)
+        query = self.valid_times_query(pattern, variable, initial_time,
+                                     indexed=pattern in self.datasets)
         self.cursor.execute(query, dict(
             variable=variable,
             pattern=pattern,
@@ -386,7 +530,7 @@ class Database(Connection):
         return [time for time, in rows]
 
     @staticmethod
-    def valid_times_query(pattern, variable, initial_time):
+    def valid_times_query(pattern, variable, initial_time, indexed=False):
         """Valid times SQL query syntax"""
         # Note: SQL injection possible if not properly escaped
         #       use ? and :name syntax in template
@@ -397,7 +541,7 @@ class Database(Connection):
                {% do EQNS.append('file.reference = :initial_time') %}
             {% endif %}
             {% if pattern is not none %}
-               {% do EQNS.append('file.name GLOB :pattern') %}
+               {% do EQNS.append(match) %}
             {% endif %}
             {% if variable is not none %}
                {% do EQNS.append('v.name = :variable') %}
@@ -416,12 +560,14 @@ class Database(Connection):
         """).render(
             initial_time=initial_time,
             variable=variable,
-            pattern=pattern)
+            pattern=pattern,
+            match=file_filter("file.id", "file.name", indexed))
 
     @mark.sql_sanitize_time("initial_time")
     def pressures(self, pattern=None, variable=None, initial_time=None):
         """Select pressures from database"""
-        query = self.pressures_query(pattern, variable, initial_time)
+        query = self.pressures_query(pattern, variable, initial_time,
+                                     indexed=pattern in self.datasets)
         self.cursor.execute(query, dict(
             variable=variable,
             pattern=pattern,
@@ -430,7 +576,7 @@ class Database(Connection):
         return [time for time, in rows]
 
     @staticmethod
-    def pressures_query(pattern, variable, initial_time):
+    def pressures_query(pattern, variable, initial_time, indexed=False):
         # Note: SQL injection possible if not properly escaped
         #       use ? and :name syntax in template
         environment = jinja2.Environment(extensions=['jinja2.ext.do'])
@@ -440,7 +586,7 @@ class Database(Connection):
                {% do EQNS.append('v.name = :variable') %}
             {% endif %}
             {% if pattern is not none %}
-               {% do EQNS.append('file.name GLOB :pattern') %}
+               {% do EQNS.append(match) %}
             {% endif %}
             {% if initial_time is not none %}
                {% do EQNS.append('file.reference = :initial_time') %}
@@ -464,7 +610,8 @@ class Database(Connection):
         """).render(
             variable=variable,
             pattern=pattern,
-            initial_time=initial_time)
+            initial_time=initial_time,
+            match=file_filter("file.id", "file.name", indexed))
 
     def fetch_times(self, path, variable):
         """Helper method to find times related to a variable"""
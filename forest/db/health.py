@@ -44,7 +44,10 @@ class HealthDB:
         return [path for path, in self.cursor.execute(query, params)]
 
     def insert_error(self, path, error, check_time):
-        """Insert OSError into table"""
+        """Insert error raised reading a file into table
+
+        Errors other than OSError are stored with their message
+        """
         query = """
             INSERT OR IGNORE
               INTO health (name, errno, strerror, time)
@@ -52,8 +55,8 @@ class HealthDB:
         """
         params = {
             "path": path,
-            "errno": error.errno,
-            "strerror": error.strerror,
+            "errno": getattr(error, "errno", None),
+            "strerror": getattr(error, "strerror", None) or str(error),
             "time": check_time.isoformat()
         }
         self.cursor.execute(query, params)
@@ -0,0 +1,139 @@
+"""
+Bulk ingest
+-----------
+
+Indexing files one at a time with :meth:`Database.insert_netcdf` loads
+every file with iris and issues several statements per coordinate
+value. For large archives most of that time is spent parsing headers
+and committing tiny transactions.
+
+:func:`ingest` instead reads headers with netCDF4 in a pool of worker
+processes and hands them to a single writer, which stores each group of
+files with ``executemany`` inside one transaction.
+
+.. autofunction:: ingest
+
+.. autofunction:: read_header
+
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import netCDF4
+import numpy as np
+from forest import disk
+
+
+#: Files stored per transaction
+DEFAULT_BATCH_SIZE = 100
+
+#: Fewer files than this are read in the calling process
+PARALLEL_THRESHOLD = 8
+
+
+def ingest(database, paths, max_workers=None, batch_size=DEFAULT_BATCH_SIZE,
+           on_error=None, on_progress=None):
+    """Index many NetCDF files in as few transactions as possible
+
+    :param database: :class:`forest.db.Database` to extend
+    :param paths: NetCDF files to index
+    :param max_workers: processes used to read headers, 0 reads them
+                        in the calling process
+    :param batch_size: files stored per transaction
+    :param on_error: callable taking path and exception, called for files
+                     that could not be read, by default errors are raised
+    :param on_progress: callable taking number of files processed and
+                        total number of files, called after each transaction
+    :returns: number of files inserted
+    """
+    paths = list(paths)
+    count = 0
+    done = 0
+    batch = []
+    for path, header, error in _read_headers(paths, max_workers):
+        done += 1
+        if error is not None:
+            if on_error is None:
+                raise error
+            on_error(path, error)
+        else:
+            batch.append(header)
+        if (len(batch) >= batch_size) or (done == len(paths)):
+            if len(batch) > 0:
+                count += database.insert_headers(batch)
+                batch = []
+            if on_progress is not None:
+                on_progress(done, len(paths))
+    return count
+
+
+def _read_headers(paths, max_workers):
+    if (max_workers == 0) or (len(paths) < PARALLEL_THRESHOLD):
+        yield from map(_read_safely, paths)
+    else:
+        # Spawn avoids forking a process holding SQLite/HDF5 state
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 mp_context=context) as executor:
+            yield from executor.map(_read_safely, paths, chunksize=4)
+
+
+def _read_safely(path):
+    try:
+        return path, read_header(path), None
+    except Exception as error:
+        # Errors reading one file should not stop the others
+        return path, None, error
+
+
+def read_header(path):
+    """Meta-data needed by :class:`forest.db.Database` from a NetCDF file
+
+    Variables, axes and coordinate values match those found by loading
+    the file with iris, without reading any data arrays
+
+    :returns: dict with ``path``, ``reference`` and ``variables``
+    """
+    with netCDF4.Dataset(path) as dataset:
+        try:
+            obj = dataset.variables["forecast_reference_time"]
+            reference = str(netCDF4.num2date(obj[:], units=obj.units))
+        except KeyError:
+            reference = None
+        variables = []
+        for variable in disk.cube_names(dataset):
+            var = dataset.variables[variable]
+            header = {"name": variable}
+            for coord in ("time", "pressure"):
+                header[coord + "_axis"], header[coord + "s"] = _coordinate(
+                    dataset, var, coord)
+            variables.append(header)
+    return {
+        "path": path,
+        "reference": reference,
+        "variables": variables
+    }
+
+
+def _coordinate(dataset, var, coord):
+    """Axis and values of a time or pressure coordinate"""
+    dims = var.dimensions
+    coords = getattr(var, "coordinates", "")
+    name = disk.coord_var(coord, dims, coords)
+    if (name is None) or (name not in dataset.variables):
+        return None, []
+    obj = dataset.variables[name]
+    axis = None
+    for dim in obj.dimensions:
+        if dim in dims:
+            axis = dims.index(dim)
+            break
+    values = np.ma.ravel(obj[:])
+    if coord == "time":
+        values = netCDF4.num2date(
+            values,
+            units=obj.units,
+            calendar=getattr(obj, "calendar", "standard"))
+        values = [str(value) for value in values]
+    else:
+        values = [float(value) for value in values]
+    return axis, values
@@ -2,6 +2,7 @@ import os
 from functools import lru_cache
 import numpy as np
 from .connection import Connection
+from .database import file_filter, registered_datasets
 from forest.exceptions import SearchFail
 from forest import mark
 
@@ -17,6 +18,7 @@ class Locator(Connection):
         self.directory = directory
         self.connection = connection
         self.cursor = self.connection.cursor()
+        self.datasets = registered_datasets(self.cursor)
 
     @mark.sql_sanitize_time("initial_time", "valid_time")
     def locate(
@@ -68,10 +70,28 @@ class Locator(Connection):
                     return path, (ti, pi)
         raise SearchFail("Could not locate: {}".format(pattern))
 
-    @mark.sql_sanitize_time("initial_time", "valid_time")
+    def refresh(self):
+        """Forget cached searches, e.g. after new files are inserted"""
+        self.datasets = registered_datasets(self.cursor)
+        for method in (Locator.file_names, Locator.coordinate, Locator.axes):
+            method.cache_clear()
+
     @lru_cache()
+    @mark.sql_sanitize_time("initial_time", "valid_time")
     def file_names(self, pattern, variable, initial_time, valid_time):
-        self.cursor.execute("""
+        query = self.file_names_query(indexed=pattern in self.datasets)
+        self.cursor.execute(query, dict(
+            pattern=pattern,
+            variable=variable,
+            initial_time=initial_time,
+            valid_time=valid_time,
+        ))
+        return [file_name for file_name, in self.cursor.fetchall()]
+
+    @staticmethod
+    def file_names_query(indexed=False):
+        """File names SQL query syntax"""
+        return """
             SELECT DISTINCT(f.name)
               FROM file AS f
               JOIN variable AS v
@@ -80,17 +100,11 @@ class Locator(Connection):
                 ON vt.variable_id = v.id
               JOIN time AS t
                 ON t.id = vt.time_id
-             WHERE f.name GLOB :pattern
+             WHERE {}
                AND f.reference = :initial_time
                AND v.name = :variable
                AND t.value = :valid_time
-        """, dict(
-            pattern=pattern,
-            variable=variable,
-            initial_time=initial_time,
-            valid_time=valid_time,
-        ))
-        return [file_name for file_name, in self.cursor.fetchall()]
+        """.format(file_filter("f.id", "f.name", indexed))
 
     @lru_cache()
     def coordinate(self, file_name, variable, coord):
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import argparse
 from . import database as db
+from . import ingest
 
 
 def parse_args(argv=None, parser=None):
@@ -16,14 +17,21 @@ def add_arguments(parser):
     parser.add_argument(
         "paths", nargs="+", metavar="FILE",
         help="unified model netcdf files")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="processes used to read file headers, 0 disables parallel reads")
+    parser.add_argument(
+        "--batch-size", type=int, default=ingest.DEFAULT_BATCH_SIZE,
+        help="files stored per transaction")
 
 
 def main(argv=None, args=None):
     if args is None:
         args = parse_args(argv=argv)
     with db.Database.connect(args.database) as database:
-        for path in args.paths:
-            database.insert_netcdf(path)
+        ingest.ingest(database, args.paths,
+                      max_workers=args.workers,
+                      batch_size=args.batch_size)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Migrate
+-------
+
+Bring an existing database file up to date with the current schema,
+i.e. create missing tables and indexes, register dataset patterns and
+refresh the statistics used by the SQLite query planner.
+
+Run with ``--benchmark`` to print the ``EXPLAIN QUERY PLAN`` and timing
+of the queries used to populate menus and locate files.
+
+.. autofunction:: migrate
+
+.. autofunction:: benchmark
+
+.. autofunction:: explain
+
+"""
+import argparse
+import time
+from . import database as db
+from .locate import Locator
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    return parser.parse_args(args=argv)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--database", required=True,
+        help="database file to migrate")
+    parser.add_argument(
+        "--pattern", dest="patterns", action="append", default=[],
+        metavar="PATTERN",
+        help="file name pattern of a dataset, may be repeated")
+    parser.add_argument(
+        "--benchmark", action="store_true",
+        help="print query plans and timings after migration")
+
+
+def main(argv=None, args=None):
+    if args is None:
+        args = parse_args(argv=argv)
+    with db.Database.connect(args.database) as database:
+        migrate(database, args.patterns)
+        if args.benchmark:
+            for pattern in args.patterns or [None]:
+                for result in benchmark(database, pattern):
+                    print("{name}: {seconds:.6f}s".format(**result))
+                    for detail in result["plan"]:
+                        print("    {}".format(detail))
+
+
+def migrate(database, patterns=()):
+    """Register dataset patterns and analyse tables
+
+    Indexes and tables are created by :class:`forest.db.Database`
+    """
+    for pattern in patterns:
+        database.insert_dataset(pattern)
+    with database.connection:
+        database.cursor.execute("ANALYZE")
+
+
+def benchmark(database, pattern=None):
+    """Query plan and time taken by typical queries
+
+    Parameters are taken from the first file matching pattern
+
+    :returns: list of dicts with ``name``, ``plan`` and ``seconds``
+    """
+    params = _sample(database, pattern)
+    indexed = pattern in database.datasets
+    queries = [
+        ("valid_times", database.valid_times_query(
+            pattern, params["variable"], params["initial_time"],
+            indexed=indexed)),
+        ("pressures", database.pressures_query(
+            pattern, params["variable"], params["initial_time"],
+            indexed=indexed)),
+        ("locate", Locator.file_names_query(indexed=indexed)),
+    ]
+    if pattern is None:
+        queries = queries[:2]
+    results = []
+    for name, query in queries:
+        plan = explain(database.cursor, query, params)
+        start = time.perf_counter()
+        database.cursor.execute(query, params)
+        database.cursor.fetchall()
+        seconds = time.perf_counter() - start
+        results.append(dict(name=name, plan=plan, seconds=seconds))
+    return results
+
+
+def explain(cursor, query, params):
+    """Details of ``EXPLAIN QUERY PLAN`` for a query"""
+    cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+    return [row[-1] for row in cursor.fetchall()]
+
+
+def _sample(database, pattern):
+    query = """
+        SELECT file.reference, variable.name, time.value
+          FROM file
+          JOIN variable ON variable.file_id = file.id
+          LEFT JOIN variable_to_time AS vt ON vt.variable_id = variable.id
+          LEFT JOIN time ON time.id = vt.time_id
+    """
+    if pattern is not None:
+        query += " WHERE {}".format(db.file_filter(
+            "file.id", "file.name", pattern in database.datasets))
+    database.cursor.execute(query + " LIMIT 1", dict(pattern=pattern))
+    row = database.cursor.fetchone() or (None, None, None)
+    initial_time, variable, valid_time = row
+    return dict(pattern=pattern,
+                variable=variable,
+                initial_time=initial_time,
+                valid_time=valid_time)
+
+
+if __name__ == '__main__':
+    main()
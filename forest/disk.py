@@ -102,3 +102,24 @@ def axis(name, dims, coords):
     for c in coords.split():
         if c.startswith(name):
             return 0
+
+
+def cube_names(dataset):
+    """Map data variables to the names iris would give their cubes"""
+    referenced = set()
+    for var in dataset.variables.values():
+        for attr in ("coordinates", "bounds", "grid_mapping",
+                     "ancillary_variables"):
+            referenced.update(str(getattr(var, attr, "")).split())
+        measures = str(getattr(var, "cell_measures", "")).split()
+        referenced.update(measures[1::2])
+    names = {}
+    for variable, var in dataset.variables.items():
+        if variable in referenced:
+            continue
+        if var.dimensions == (variable,):
+            continue  # Dimension coordinate
+        names[variable] = (getattr(var, "standard_name", None) or
+                           getattr(var, "long_name", None) or
+                           variable)
+    return names
@@ -1,6 +1,60 @@
+"""
+EarthNetworks lightning
+-----------------------
+
+Flashes are delivered as CSV files, one per time stamp. Parsing text is
+slow for busy storm days, so :class:`Loader` converts each file once
+into a time-sorted NumPy array with a categorical ``flash_type``. If a
+``cache_directory`` is given the arrays are saved as ``.npy`` files and
+memory mapped, so that a time window only reads the rows it needs.
+Cache files are named after the absolute path, mtime and size of their
+source, see :meth:`Loader.cache_path`.
+
+Files are found by :class:`TimestampLocator`, which partitions file
+name time stamps into per-day buckets kept up to date by a
+:class:`forest.watch.Catalogue`.
+
+Density and time since flash images are built by an :class:`Aggregator`
+from cached sub-interval grids, so stepping through time only
+aggregates the flashes that entered the window. Grids follow the
+figure's viewport and resolution, and a :class:`MortonIndex` of each
+file selects the flashes inside the viewport. A dataset's views share
+one :class:`Aggregator`, whose grid cache is limited to
+``max_megabytes``.
+
+.. code-block:: yaml
+
+    files:
+      - label: Lightning
+        file_type: earth_networks
+        pattern: ~/lightning/*.txt
+        cache_directory: ~/cache/lightning
+        max_megabytes: 512
+
+.. autoclass:: Loader
+   :members:
+
+.. autoclass:: TimestampLocator
+   :members:
+
+.. autoclass:: Aggregator
+   :members:
+
+.. autoclass:: MortonIndex
+   :members:
+
+.. autofunction:: convert
+
+"""
 import re
 import os
 import glob
+import hashlib
+import bisect
+import threading
+import functools
+import operator
+from collections import OrderedDict
 import datetime as dt
 import datashader
 import pandas as pd
@@ -8,6 +62,7 @@ from functools import lru_cache
 from forest import geo
 from forest.util import to_datetime as _to_datetime
 import forest.util
+import forest.watch
 from forest.old_state import old_state, unique
 import bokeh.models
 import bokeh.palettes
@@ -15,12 +70,28 @@ import bokeh.colors
 import numpy as np
 
 
+#: Memory budget of sub-interval grids, a one hour window of five
+#: minute grids at :attr:`Aggregator.max_pixels` needs 384 megabytes
+DEFAULT_MAX_MEGABYTES = 512
+
+
 class Dataset:
-    """High-level class to relate navigators, loaders and views"""
-    def __init__(self, pattern=None, **kwargs):
+    """High-level class to relate navigators, loaders and views
+
+    Views share the dataset's :class:`Aggregator`, so that sessions
+    reuse each other's grids
+
+    :param max_megabytes: memory used to cache sub-interval grids
+    """
+    def __init__(self, pattern=None, cache_directory=None,
+                 max_megabytes=None, **kwargs):
+        if max_megabytes is None:
+            max_megabytes = DEFAULT_MAX_MEGABYTES
         self.pattern = pattern
-        self.loader = Loader()
+        self.loader = Loader(cache_directory)
         self.locator = TimestampLocator(pattern)
+        self.aggregator = Aggregator(self.loader, self.locator,
+                                     max_megabytes=max_megabytes)
 
     def navigator(self):
         """Construct navigator"""
@@ -28,11 +99,11 @@ class Dataset:
 
     def map_view(self):
         """Construct view"""
-        return View(self.loader, self.locator)
+        return View(self.loader, self.locator, self.aggregator)
 
 
 class View:
-    def __init__(self, loader, locator):
+    def __init__(self, loader, locator, aggregator=None):
         self.loader = loader
         self.locator = locator
         palette = bokeh.palettes.all_palettes['Spectral'][11][::-1]
@@ -68,6 +139,9 @@ class View:
         self.variable_to_method = {
             "Lightning": self.scatter,
         }
+        if aggregator is None:
+            aggregator = Aggregator(loader, locator)
+        self.aggregator = aggregator
 
     @old_state
     @unique
@@ -84,39 +158,25 @@ class View:
 
         # 15 minute/1 hour slice of data?
         window = dt.timedelta(minutes=60)  # 1 hour window
-        paths = self.locator.find_period(valid_time, window)
-        frame = self.loader.load(paths)
-        frame = self.select_date(frame, valid_time, window)
 
         # Filter intra-cloud/cloud-ground rows
         if "intra-cloud" in state.variable.lower():
-            frame = frame[frame["flash_type"] == "IC"]
+            flash_type = "IC"
         elif "cloud-ground" in state.variable.lower():
-            frame = frame[frame["flash_type"] == "CG"]
-
-        # EarthNetworks validity box (not needed if tiling algorithm)
-        longitude_range = (26, 40)
-        latitude_range = (-12, 4)
-        x_range, y_range = geo.web_mercator(longitude_range,
-                                            latitude_range)
-
-        x, y = geo.web_mercator(frame["longitude"], frame["latitude"])
-        frame["x"] = x
-        frame["y"] = y
-        pixels = 256
-        canvas = datashader.Canvas(
-            plot_width=pixels,
-            plot_height=pixels,
-            x_range=x_range,
-            y_range=y_range
-        )
+            flash_type = "CG"
+        else:
+            flash_type = None
 
+        # Aggregate visible extent at screen resolution
+        viewport = geo.snap_viewport(getattr(state, "viewport", None))
         if "density" in state.variable.lower():
             # N flashes per pixel
-            agg = canvas.points(frame, "x", "y", datashader.count())
+            agg = self.aggregator.window(valid_time, window, flash_type,
+                                         "count", viewport)
         else:
-            frame["since_flash"] = self.since_flash(frame["date"], valid_time)
-            agg = canvas.points(frame, "x", "y", datashader.max("since_flash"))
+            agg = self.aggregator.window(valid_time, window, flash_type,
+                                         "latest", viewport)
+            agg = agg - _seconds(np.datetime64(valid_time, "ns"))
 
         # Note: DataArray objects are not JSON serializable, .values is the
         #       same data cast as a numpy array
@@ -169,18 +229,23 @@ class View:
     def scatter(self, state):
         """Scatter plot of flash position colored by time since flash"""
         valid_time = _to_datetime(state.valid_time)
-        paths = self.locator.find(valid_time)
-        frame = self.loader.load(paths)
-        frame = self.select_date(frame, valid_time)
-        frame = frame[:400]  # Limit points
-        frame['time_since_flash'] = self.since_flash(frame['date'], valid_time)
+        window = dt.timedelta(minutes=60)
+        frame = self.loader.load(self.locator.find_period(valid_time, window))
+        if len(frame) > 0:
+            i, j = np.searchsorted(
+                frame["date"].values,
+                np.array([valid_time, valid_time + window],
+                         dtype="datetime64[ns]"))
+            frame = frame.iloc[i:min(j, i + 400)]  # Limit points
         if len(frame) == 0:
-            return self.empty_image
+            self.sources["scatter"].data = self.empty_image
+            return
+        time_since_flash = (frame["date"] - valid_time).dt.total_seconds()
         x, y = geo.web_mercator(
                 frame.longitude,
                 frame.latitude)
-        self.color_mapper.low = np.min(frame.time_since_flash)
-        self.color_mapper.high = np.max(frame.time_since_flash)
+        self.color_mapper.low = np.min(time_since_flash)
+        self.color_mapper.high = np.max(time_since_flash)
         self.sources["scatter"].data = {
             "x": x,
             "y": y,
@@ -188,30 +253,9 @@ class View:
             "longitude": frame.longitude,
             "latitude": frame.latitude,
             "flash_type": frame.flash_type,
-            "time_since_flash": frame.time_since_flash
+            "time_since_flash": time_since_flash
         }
 
-    def select_date(self, frame, date, window):
-        if len(frame) == 0:
-            return frame
-        frame = frame.set_index('date')
-        start = date
-        end = start + window
-        s = "{:%Y-%m-%dT%H:%M}".format(start)
-        e = "{:%Y-%m-%dT%H:%M}".format(end)
-        small_frame = frame[s:e].copy()
-        return small_frame.reset_index()
-
-    def since_flash(self, date_column, date):
-        """Pandas helper to calculate seconds since valid date"""
-        if len(date_column) == 0:
-            return []
-        if isinstance(date, str):
-            date = pd.Timestamp(date)
-        if isinstance(date_column, list):
-            date_column = pd.Series(pd.to_datetime(date_column))
-        return (date_column - date).dt.total_seconds()
-
     @staticmethod
     def tooltips(variable):
         if "density" in variable.lower():
@@ -288,37 +332,326 @@ class View:
         return renderer
 
 
-class TimestampLocator:
-    """Find files by time stamp"""
-    def __init__(self, pattern):
-        if pattern is None:
-            paths = []
+class Aggregator:
+    """Rolling-window flash grids combined from sub-interval grids
+
+    Windows are split at multiples of ``interval`` and each whole
+    sub-interval is aggregated once and cached, so consecutive windows
+    only aggregate the sub-intervals they do not share. Sub-interval
+    grids are combined by summing counts or taking the maximum of the
+    latest flash times
+
+    Grids cover the viewport returned by :func:`forest.geo.snap_viewport`
+    at its resolution, nearby viewports snap to the same extent so that
+    their grids are shared. Without a viewport the EarthNetworks
+    validity box is aggregated on a 256 by 256 grid
+
+    :param loader: :class:`Loader` used to read tables and projections
+    :param locator: :class:`TimestampLocator` used to find files
+    :param interval: datetime.timedelta of cached sub-intervals
+    :param max_megabytes: memory used to cache sub-interval grids
+    """
+    #: EarthNetworks validity box used if viewport is not known
+    longitude_range = (26, 40)
+    latitude_range = (-12, 4)
+    pixels = 256
+
+    #: Largest grid dimension
+    max_pixels = 2048
+
+    def __init__(self, loader, locator, interval=dt.timedelta(minutes=5),
+                 max_megabytes=DEFAULT_MAX_MEGABYTES):
+        self.loader = loader
+        self.locator = locator
+        self.interval = interval
+        self.max_bytes = max_megabytes * 1024 ** 2
+        self.x_range, self.y_range = geo.web_mercator(self.longitude_range,
+                                                      self.latitude_range)
+        self._grids = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def window(self, start, window, flash_type=None, metric="count",
+               viewport=None):
+        """Grid of flashes with start <= date < start + window
+
+        :param flash_type: 'CG', 'IC' or None to include all flashes
+        :param metric: 'count' of flashes or 'latest' flash time in
+                       seconds since 1970-01-01 per pixel
+        :param viewport: tuple returned by :func:`forest.geo.snap_viewport`
+        :returns: xarray.DataArray similar to datashader aggregates
+        """
+        extent = self.extent(viewport)
+        grids = [self.grid(a, b, flash_type, metric, extent)
+                 for a, b in self.intervals(start, start + window)]
+        if metric == "count":
+            return functools.reduce(operator.add, grids)
         else:
-            paths = glob.glob(pattern)
+            return functools.reduce(np.fmax, grids)
+
+    def extent(self, viewport=None):
+        """Ranges and grid size used to aggregate a viewport
+
+        :returns: tuple (x_range, y_range, width, height)
+        """
+        if viewport is None:
+            return (tuple(self.x_range), tuple(self.y_range),
+                    self.pixels, self.pixels)
+        x_start, x_end, y_start, y_end, width, height = viewport
+        scale = max(width / self.max_pixels, height / self.max_pixels, 1)
+        return ((x_start, x_end), (y_start, y_end),
+                max(int(width / scale), 1), max(int(height / scale), 1))
+
+    def intervals(self, start, end):
+        """Split [start, end) at multiples of interval"""
+        epoch = dt.datetime(1970, 1, 1)
+        edge = epoch + ((start - epoch) // self.interval) * self.interval
+        intervals = []
+        while start < end:
+            edge = min(edge + self.interval, end)
+            intervals.append((start, edge))
+            start = edge
+        return intervals
+
+    def grid(self, start, end, flash_type=None, metric="count",
+             extent=None):
+        """Grid of a single sub-interval, cached if it is a whole interval"""
+        if extent is None:
+            extent = self.extent()
+        paths = self.locator.find_period(start, end - start)
+        key = (start, end, flash_type, metric, extent,
+               tuple((path, os.stat(path).st_mtime_ns) for path in paths))
+        cacheable = (end - start) == self.interval
+        if cacheable:
+            with self._lock:
+                if key in self._grids:
+                    self._grids.move_to_end(key)
+                    return self._grids[key]
+        grid = self._aggregate(paths, start, end, flash_type, metric, extent)
+        if cacheable:
+            with self._lock:
+                if key not in self._grids:
+                    self._grids[key] = grid
+                    self._nbytes += grid.nbytes
+                while (self._nbytes > self.max_bytes) and (
+                        len(self._grids) > 1):
+                    _, evicted = self._grids.popitem(last=False)
+                    self._nbytes -= evicted.nbytes
+        return grid
+
+    def _aggregate(self, paths, start, end, flash_type, metric, extent):
+        x_range, y_range, width, height = extent
+        start = np.datetime64(start, "ns")
+        end = np.datetime64(end, "ns")
+        columns = {"x": [], "y": [], "latest": []}
+        for path in paths:
+            table = self.loader.load_table(path)
+            i, j = np.searchsorted(table["date"], [start, end])
+            rows = self.loader.spatial_index(path).query(
+                x_range, y_range, i, j)
+            if flash_type is not None:
+                code = FLASH_TYPES.index(flash_type)
+                rows = rows[table["flash_type"][rows] == code]
+            x, y = self.loader.project(path)
+            columns["x"].append(x[rows])
+            columns["y"].append(y[rows])
+            columns["latest"].append(_seconds(table["date"][rows]))
+        frame = pd.DataFrame({
+            name: np.concatenate(arrays) if arrays else np.array([], "f8")
+            for name, arrays in columns.items()})
+        canvas = datashader.Canvas(
+            plot_width=width,
+            plot_height=height,
+            x_range=x_range,
+            y_range=y_range
+        )
+        if metric == "count":
+            return canvas.points(frame, "x", "y", datashader.count())
+        else:
+            return canvas.points(frame, "x", "y", datashader.max("latest"))
+
+
+class MortonIndex:
+    """Rows of a table sorted along a Z-order curve of web mercator cells
+
+    Rows are binned into a ``2**level`` by ``2**level`` grid of cells
+    over the world and stably sorted by the Morton code of their cell,
+    so the rows in a cell are contiguous and remain in time order.
+    Viewport queries search the sorted codes of the cells they overlap
+    instead of testing every row
+
+    :param x: web mercator x of each row
+    :param y: web mercator y of each row
+    :param level: number of bits used per axis
+    """
+    def __init__(self, x, y, level=8):
+        self.level = level
+        cells = self.cells(x, y)
+        codes = _morton(*cells)
+        self.order = np.argsort(codes, kind="stable")
+        self.codes = codes[self.order]
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+
+    def __len__(self):
+        return len(self.order)
+
+    def cells(self, x, y):
+        """Cell indices of web mercator coordinates"""
+        n = 2 ** self.level
+        half = geo.WORLD_WIDTH / 2
+
+        def index(values):
+            values = np.asarray(values, dtype="f8")
+            i = np.floor((values + half) / geo.WORLD_WIDTH * n)
+            return np.clip(np.nan_to_num(i), 0, n - 1).astype("u4")
+
+        return index(x), index(y)
+
+    def query(self, x_range, y_range, start=0, stop=None):
+        """Sorted row indices in [start, stop) inside a box
+
+        Rows in the cells overlapping the box are returned, these may
+        lie slightly outside the box itself
+        """
+        if stop is None:
+            stop = len(self)
+        if stop <= start:
+            return np.array([], dtype="i8")
+        (i0, i1), (j0, j1) = self.cells(x_range, y_range)
+        ncells = (int(i1) - int(i0) + 1) * (int(j1) - int(j0) + 1)
+        if ncells > len(self):
+            # Box covers more cells than rows, test rows directly
+            return self._mask(x_range, y_range, start, stop)
+        ii, jj = np.meshgrid(np.arange(i0, i1 + 1, dtype="u4"),
+                             np.arange(j0, j1 + 1, dtype="u4"))
+        codes = np.sort(_morton(ii.ravel(), jj.ravel()))
+        lower = np.searchsorted(self.codes, codes, side="left")
+        upper = np.searchsorted(self.codes, codes, side="right")
+        lengths = upper - lower
+        total = lengths.sum()
+        if total == 0:
+            return np.array([], dtype="i8")
+        if (stop - start) <= total:
+            # Time slice holds fewer rows than the box, test them directly
+            return self._mask(x_range, y_range, start, stop)
+        # Concatenate aranges of each [lower, upper) without a loop
+        offsets = np.repeat(lower - np.cumsum(lengths) + lengths, lengths)
+        rows = self.order[offsets + np.arange(total)]
+        return np.sort(rows[(rows >= start) & (rows < stop)])
+
+    def _mask(self, x_range, y_range, start, stop):
+        """Row indices in [start, stop) inside a box tested row by row"""
+        x = self.x[start:stop]
+        y = self.y[start:stop]
+        inside = ((x >= x_range[0]) & (x <= x_range[1]) &
+                  (y >= y_range[0]) & (y <= y_range[1]))
+        return start + np.flatnonzero(inside)
+
+
+def _morton(i, j):
+    """Interleave bits of two arrays of 16-bit cell indices"""
+    def spread(values):
+        values = np.asarray(values, dtype="u4") & 0x0000FFFF
+        values = (values | (values << 8)) & 0x00FF00FF
+        values = (values | (values << 4)) & 0x0F0F0F0F
+        values = (values | (values << 2)) & 0x33333333
+        values = (values | (values << 1)) & 0x55555555
+        return values
+    return spread(i) | (spread(j) << 1)
+
+
+def _seconds(dates):
+    """Seconds since 1970-01-01 of datetime64[ns] values"""
+    return np.asarray(dates).astype("datetime64[ns]").astype("i8") / 1e9
 
-        # TODO: Find better way to reduce data volume
-        if len(paths) > 1000:
-            paths = sorted(paths)[-1000:]
-        self.paths = paths
 
-        self.table = {}
-        for path in self.paths:
-            self.table[self._parse_date(path)] = path
+class TimestampLocator:
+    """Find files by time stamp
 
-        times = [
-            self._parse_date(path) for path in self.paths
-        ]
-        times = [t for t in times if t is not None]
-        index = pd.DatetimeIndex(times)
-        self._valid_times = index.sort_values()
+    File names are partitioned into per-day buckets that are kept up to
+    date by a :class:`forest.watch.Catalogue`, so that searches and
+    updates only touch the days they need, however long the archive
+    """
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.catalogue = forest.watch.WATCHER.catalogue(
+            pattern, max_age=dt.timedelta(minutes=5))
+        self._days = []
+        self._buckets = {}
+        self._valid_times = None
+        self._subscribed = False
+        self._lock = threading.RLock()
+
+    def sync(self):
+        """Follow catalogue on first use, then refresh"""
+        with self._lock:
+            if not self._subscribed:
+                self._subscribed = True
+                self.catalogue.follow(self.on_change)
+                return
+        self.catalogue.refresh()
+
+    def on_change(self, added, removed):
+        """Catalogue subscriber, see :class:`forest.watch.Catalogue`"""
+        with self._lock:
+            for path in removed:
+                time = self._parse_date(path)
+                if time is None or time.date() not in self._buckets:
+                    continue
+                times, paths = self._buckets[time.date()]
+                i = bisect.bisect_left(times, time)
+                while i < len(times) and times[i] == time:
+                    if paths[i] == path:
+                        del times[i]
+                        del paths[i]
+                        break
+                    i += 1
+                if len(times) == 0:
+                    del self._buckets[time.date()]
+                    self._days.remove(time.date())
+            for path in added:
+                time = self._parse_date(path)
+                if time is None:
+                    continue
+                day = time.date()
+                if day not in self._buckets:
+                    bisect.insort(self._days, day)
+                    self._buckets[day] = ([], [])
+                times, paths = self._buckets[day]
+                i = bisect.bisect_left(times, time)
+                if i < len(times) and times[i] == time:
+                    continue  # First path of a time stamp wins
+                times.insert(i, time)
+                paths.insert(i, path)
+            self._valid_times = None
 
     def find_period(self, date, window):
-        return self.find(date)  # TODO: implement search window
+        """Files that may contain flashes in [date, date + window)
+
+        Each file is assumed to cover the period from its own time stamp
+        to the time stamp of the next file
+        """
+        self.sync()
+        with self._lock:
+            # Include the previous day, its last file may overlap date
+            i = max(bisect.bisect_right(self._days, date.date()) - 2, 0)
+            j = bisect.bisect_right(self._days, (date + window).date())
+            times, paths = [], []
+            for day in self._days[i:j]:
+                times += self._buckets[day][0]
+                paths += self._buckets[day][1]
+        start = bisect.bisect_right(times, date) - 1
+        end = bisect.bisect_left(times, date + window)
+        return paths[max(start, 0):end]
 
     def find(self, date):
-        if date in self.table:
-            return [self.table[date]]
-        else:
+        self.sync()
+        with self._lock:
+            times, paths = self._buckets.get(date.date(), ([], []))
+            i = bisect.bisect_left(times, date)
+            if i < len(times) and times[i] == date:
+                return [paths[i]]
             return []
 
     @staticmethod
@@ -328,9 +661,15 @@ class TimestampLocator:
             return dt.datetime.strptime(groups[0], "%Y%m%dT%H%M")
 
     def valid_times(self):
-        if len(self._valid_times) == 0:
-            return []
-        return self._valid_times
+        self.sync()
+        with self._lock:
+            if self._valid_times is None:
+                times = [time for day in self._days
+                         for time in self._buckets[day][0]]
+                self._valid_times = pd.DatetimeIndex(times)
+            if len(self._valid_times) == 0:
+                return []
+            return self._valid_times
 
 
 class Navigator:
@@ -357,34 +696,119 @@ class Navigator:
         return []
 
 
+#: Categories of the flash_type column
+FLASH_TYPES = ["CG", "IC", "Keep alive"]
+
+#: Row layout of converted files
+DTYPE = np.dtype([
+    ("date", "datetime64[ns]"),
+    ("latitude", "f8"),
+    ("longitude", "f8"),
+    ("flash_type", "i1"),
+])
+
+
 class Loader:
-    """Methods to manipulate EarthNetworks data"""
+    """Methods to manipulate EarthNetworks data
+
+    :param cache_directory: directory to store converted files, if None
+                            files are converted in memory only
+    """
+    def __init__(self, cache_directory=None):
+        if cache_directory is not None:
+            cache_directory = os.path.expanduser(cache_directory)
+        self.cache_directory = cache_directory
+
     def load(self, csv_files):
         if isinstance(csv_files, str):
             csv_files = [csv_files]
-        frames = []
-        for csv_file in csv_files:
-            frame = self.load_file(csv_file)
-            frames.append(frame)
-        if len(frames) == 0:
+        return self._frame([self.load_table(path) for path in csv_files])
+
+    def load_file(self, path):
+        return self._frame([self.load_table(path)])
+
+    def project(self, path):
+        """Web mercator x, y of each row of :meth:`load_table`"""
+        return self._project(path, os.stat(path).st_mtime_ns)
+
+    @lru_cache(maxsize=32)
+    def _project(self, path, mtime_ns):
+        table = self._load_table(path, mtime_ns)
+        if len(table) == 0:
+            return np.array([], dtype="f8"), np.array([], dtype="f8")
+        return geo.web_mercator(table["longitude"], table["latitude"])
+
+    def spatial_index(self, path):
+        """:class:`MortonIndex` of the rows of :meth:`load_table`"""
+        return self._spatial_index(path, os.stat(path).st_mtime_ns)
+
+    @lru_cache(maxsize=32)
+    def _spatial_index(self, path, mtime_ns):
+        return MortonIndex(*self._project(path, mtime_ns))
+
+    def load_table(self, path):
+        """Time-sorted structured array of a CSV file, see :data:`DTYPE`"""
+        return self._load_table(path, os.stat(path).st_mtime_ns)
+
+    @lru_cache(maxsize=32)
+    def _load_table(self, path, mtime_ns):
+        if self.cache_directory is None:
+            return read_csv(path)
+        cache_path = self.cache_path(path)
+        if not os.path.exists(cache_path):
+            convert(path, cache_path)
+            self._remove_stale(path, cache_path)
+        return np.load(cache_path, mmap_mode="r")
+
+    def cache_path(self, path):
+        """Location of the converted copy of the current version of path
+
+        The name includes a digest of the absolute path, so files with
+        the same name in different directories never share a cache
+        file, and the source mtime and size, so that any change to the
+        source file is converted again
+        """
+        stat = os.stat(path)
+        return os.path.join(self.cache_directory, "{}-{}-{}.npy".format(
+            self._cache_prefix(path), stat.st_mtime_ns, stat.st_size))
+
+    @staticmethod
+    def _cache_prefix(path):
+        digest = hashlib.sha1(
+            os.path.abspath(path).encode("utf-8")).hexdigest()
+        return "{}-{}".format(os.path.basename(path), digest)
+
+    def _remove_stale(self, path, cache_path):
+        """Delete copies of earlier versions of path"""
+        prefix = glob.escape(self._cache_prefix(path))
+        pattern = os.path.join(self.cache_directory, prefix + "-*.npy")
+        for stale_path in glob.glob(pattern):
+            if stale_path != cache_path:
+                try:
+                    os.remove(stale_path)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _frame(tables):
+        tables = [table for table in tables if len(table) > 0]
+        if len(tables) == 0:
             return pd.DataFrame({
                 "flash_type": [],
                 "date": [],
                 "latitude": [],
                 "longitude": [],
             })
-        else:
-            return pd.concat(frames, ignore_index=True)
-
-    @lru_cache(maxsize=32)
-    def load_file(self, path):
-        return pd.read_csv(
-            path,
-            parse_dates=[1],
-            converters={0: self.flash_type},
-            usecols=[0, 1, 2, 3],
-            names=["flash_type", "date", "latitude", "longitude"],
-            header=None)
+        table = np.concatenate(tables)
+        if np.any(np.diff(table["date"]) < np.timedelta64(0)):
+            table = table[np.argsort(table["date"], kind="stable")]
+        return pd.DataFrame({
+            "flash_type": pd.Categorical.from_codes(table["flash_type"],
+                                                    FLASH_TYPES),
+            "date": table["date"],
+            "latitude": table["latitude"],
+            "longitude": table["longitude"],
+        })
 
     @staticmethod
     def flash_type(value):
@@ -393,3 +817,33 @@ class Loader:
             "1": "IC",
             "9": "Keep alive"
         }.get(value, value)
+
+
+def read_csv(path):
+    """Parse a CSV file into a time-sorted array, see :data:`DTYPE`"""
+    frame = pd.read_csv(
+        path,
+        dtype={"flash_type": str},
+        usecols=[0, 1, 2, 3],
+        names=["flash_type", "date", "latitude", "longitude"],
+        header=None)
+    table = np.empty(len(frame), dtype=DTYPE)
+    table["date"] = pd.to_datetime(frame["date"]).values
+    table["latitude"] = frame["latitude"].values
+    table["longitude"] = frame["longitude"].values
+    labels = frame["flash_type"].map(Loader.flash_type)
+    table["flash_type"] = pd.Categorical(labels, FLASH_TYPES).codes
+    return table[np.argsort(table["date"], kind="stable")]
+
+
+def convert(csv_path, npy_path):
+    """Write CSV file as a time-sorted ``.npy`` file, see :data:`DTYPE`"""
+    directory = os.path.dirname(npy_path)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+    table = read_csv(csv_path)
+    # Write to a temporary file so readers never see partial files
+    tmp_path = "{}.{}.tmp".format(npy_path, os.getpid())
+    with open(tmp_path, "wb") as stream:
+        np.save(stream, table)
+    os.replace(tmp_path, npy_path)
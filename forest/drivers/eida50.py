@@ -1,19 +1,22 @@
 import re
 import sqlite3
+import threading
 import os
-import glob
 import datetime as dt
 import bokeh.models
-import xarray
 import numpy as np
 from functools import lru_cache
 from forest.exceptions import FileNotFound, IndexNotFound
 from forest.old_state import old_state, unique
+import forest.handles
 import forest.util
+import forest.watch
 import forest.map_view
+from forest.cache import IMAGE_CACHE
 from forest import (
         geo,
-        locate)
+        locate,
+        pyramid)
 
 
 ENGINE = "h5netcdf"
@@ -47,8 +50,10 @@ class Database:
     def __init__(self, path=":memory:"):
         self.fmt = "%Y-%m-%d %H:%M:%S"
         self.path = path
-        self.connection = sqlite3.connect(self.path)
+        # Shared with prefetch threads, see forest.prefetch
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
         self.cursor = self.connection.cursor()
+        self._lock = threading.RLock()
 
         # Schema
         query = """
@@ -80,6 +85,10 @@ class Database:
 
     def insert_times(self, times, path):
         """Store times"""
+        with self._lock:
+            self._insert_times(times, path)
+
+    def _insert_times(self, times, path):
         # Update file table
         query = """
             INSERT OR IGNORE INTO file (path) VALUES (:path);
@@ -99,6 +108,10 @@ class Database:
 
     def fetch_times(self, path=None):
         """Retrieve times"""
+        with self._lock:
+            return self._fetch_times(path)
+
+    def _fetch_times(self, path):
         if path is None:
             query = """
                 SELECT time
@@ -119,25 +132,211 @@ class Database:
         times = [dt.datetime.strptime(text, self.fmt) for text in texts]
         return list(sorted(times))
 
+    def fetch_axes(self):
+        """Retrieve time axes of all files in a single query
+
+        :returns: dict mapping path to sorted datetime64[s] array
+        """
+        query = """
+            SELECT file.path, time.time
+              FROM time
+              JOIN file
+                ON file.id = time.file_id;
+        """
+        with self._lock:
+            rows = self.cursor.execute(query).fetchall()
+        texts = {}
+        for path, text in rows:
+            texts.setdefault(path, []).append(text)
+        return {path: np.sort(np.array(values, dtype="datetime64[s]"))
+                for path, values in texts.items()}
+
     def fetch_paths(self):
         """Retrieve paths"""
         query = """
             SELECT path FROM file;
         """
-        rows = self.cursor.execute(query).fetchall()
+        with self._lock:
+            rows = self.cursor.execute(query).fetchall()
         texts = [text for text, in rows]
         return list(sorted(texts))
 
 
+#: Largest batch of added paths inserted one at a time by TimeIndex
+SMALL_BATCH = 16
+
+
+class TimeIndex:
+    """Sorted datetime64 index of files and their time axes
+
+    File name dates are kept in a sorted array so that the file
+    containing a time is found by bisection. Time axes read from
+    files are stored in the :class:`Database`, which is read once
+    when the index is created
+
+    :param database: :class:`Database` used to persist time axes
+    :param load_time_axis: callable returning datetime64[s] times of a file
+    :param parse_date: callable returning datetime of a file name or None
+    """
+    def __init__(self, database, load_time_axis, parse_date):
+        self.database = database
+        self.load_time_axis = load_time_axis
+        self.parse_date = parse_date
+        self._dates = np.array([], dtype="datetime64[s]")
+        self._paths = []
+        self._unparsed = set()
+        self._axes = database.fetch_axes()
+        self._times = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._paths) + len(self._unparsed)
+
+    def on_change(self, added, removed):
+        """Catalogue subscriber, see :class:`forest.watch.Catalogue`
+
+        Small batches are inserted one path at a time, large batches,
+        e.g. the first sync of an archive, are merged with a single sort
+        """
+        with self._lock:
+            self._remove(removed)
+            dates, paths = [], []
+            for path in added:
+                date = self.parse_date(path)
+                if date is None:
+                    self._unparsed.add(path)
+                else:
+                    dates.append(date)
+                    paths.append(path)
+            if len(paths) <= SMALL_BATCH:
+                for date, path in zip(dates, paths):
+                    self._insert(date, path)
+            else:
+                self._merge(dates, paths)
+            self._times = None
+
+    def _remove(self, paths):
+        indices = set()
+        for path in paths:
+            self._unparsed.discard(path)
+            i = self._search(path)
+            if i is not None:
+                indices.add(i)
+        if len(indices) > 0:
+            self._dates = np.delete(self._dates, sorted(indices))
+            self._paths = [path for k, path in enumerate(self._paths)
+                           if k not in indices]
+
+    def _insert(self, date, path):
+        if self._search(path) is None:
+            date = np.datetime64(date, "s")
+            i = np.searchsorted(self._dates, date, side="right")
+            self._dates = np.insert(self._dates, i, date)
+            self._paths.insert(i, path)
+
+    def _merge(self, dates, paths):
+        known = set(self._paths)
+        keep = []
+        for k, path in enumerate(paths):
+            if path not in known:
+                known.add(path)
+                keep.append(k)
+        dates = np.array([dates[k] for k in keep], dtype="datetime64[s]")
+        dates = np.concatenate([self._dates, dates])
+        paths = self._paths + [paths[k] for k in keep]
+        # Stable sort keeps existing paths before new paths of equal date
+        order = np.argsort(dates, kind="stable")
+        self._dates = dates[order]
+        self._paths = [paths[k] for k in order]
+
+    def _search(self, path):
+        date = self.parse_date(path)
+        if date is None:
+            return None
+        date = np.datetime64(date, "s")
+        i = np.searchsorted(self._dates, date, side="left")
+        j = np.searchsorted(self._dates, date, side="right")
+        for k in range(i, j):
+            if self._paths[k] == path:
+                return k
+
+    def find_file(self, date):
+        """Latest file whose file name date is at or before date"""
+        date = np.datetime64(date, "s")
+        with self._lock:
+            i = np.searchsorted(self._dates, date, side="right")
+            if i == 0:
+                raise FileNotFound("No file for {}".format(date))
+            return self._paths[i - 1]
+
+    def axis(self, path):
+        """Stored time axis of a file or None"""
+        with self._lock:
+            return self._axes.get(path)
+
+    def insert_axis(self, path):
+        """Read and store time axis of a file unless already known"""
+        with self._lock:
+            if path in self._axes:
+                return self._axes[path]
+        times = np.sort(self.load_time_axis(path))
+        with self._lock:
+            if path not in self._axes:
+                self.database.insert_times(times.astype(dt.datetime), path)
+                self._axes[path] = times
+                self._times = None
+            return self._axes[path]
+
+    def times(self):
+        """Sorted unique times of stored axes and file name dates"""
+        with self._lock:
+            unparsed = [path for path in self._unparsed
+                        if path not in self._axes]
+        for path in unparsed:
+            self.insert_axis(path)
+        with self._lock:
+            if self._times is None:
+                unstored = np.array(
+                    [path not in self._axes for path in self._paths],
+                    dtype=bool)
+                arrays = list(self._axes.values())
+                arrays.append(self._dates[unstored] if len(unstored)
+                              else self._dates)
+                self._times = np.unique(np.concatenate(arrays))
+            return self._times
+
+
 class Locator:
-    """Locate EIDA50 satellite images"""
+    """Locate EIDA50 satellite images
+
+    Searches use a :class:`TimeIndex` kept up to date by the file
+    catalogue when ``paths`` is None, explicit lists of paths are
+    searched directly
+    """
     def __init__(self, pattern, database):
         self.pattern = pattern
-        self._glob = forest.util.cached_glob(dt.timedelta(minutes=15))
+        self.catalogue = forest.watch.WATCHER.catalogue(
+            pattern, max_age=dt.timedelta(minutes=15))
         self.database = database
-
-    def all_times(self, paths):
+        self.index = TimeIndex(database, self.load_time_axis, self.parse_date)
+        self._subscribed = False
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """Follow catalogue with index on first use, then refresh"""
+        with self._lock:
+            if not self._subscribed:
+                self._subscribed = True
+                self.catalogue.follow(self.index.on_change)
+                return
+        self.catalogue.refresh()
+
+    def all_times(self, paths=None):
         """All available times"""
+        if paths is None:
+            self.sync()
+            return self.index.times()
+
         # Parse times from file names not in database
         unparsed_paths = []
         filename_times = []
@@ -170,6 +369,14 @@ class Locator:
 
         .. note:: Find should not write to disk
         """
+        if paths is None:
+            path = self.find_file(None, date)
+            times = self.index.axis(path)
+            if times is None:
+                times = self.load_time_axis(path)  # datetime64[s]
+            index = self.find_index(times, date, dt.timedelta(minutes=15))
+            return path, index
+
         # Search file system
         path = self.find_file(paths, date)
 
@@ -184,12 +391,12 @@ class Locator:
         return path, index
 
     def glob(self):
-        return self._glob(self.pattern)
+        return self.catalogue.paths
 
     @staticmethod
     @lru_cache()
     def load_time_axis(path):
-        with xarray.open_dataset(path, engine=ENGINE) as nc:
+        with forest.handles.open_xarray(path, engine=ENGINE) as nc:
             values = nc["time"]
         return np.array(values, dtype='datetime64[s]')
 
@@ -202,6 +409,9 @@ class Locator:
         """
         if isinstance(user_date, (dt.datetime, str)):
             user_date = np.datetime64(user_date, 's')
+        if paths is None:
+            self.sync()
+            return self.index.find_file(user_date)
         dates = np.array([
             self.parse_date(path) for path in paths],
             dtype='datetime64[s]')
@@ -256,7 +466,7 @@ class Loader:
         self.cache = {}
         paths = self.locator.glob()
         if len(paths) > 0:
-            with xarray.open_dataset(paths[-1], engine=ENGINE) as nc:
+            with forest.handles.open_xarray(paths[-1], engine=ENGINE) as nc:
                 self.cache["longitude"] = nc["longitude"].values
                 self.cache["latitude"] = nc["latitude"].values
 
@@ -273,28 +483,48 @@ class Loader:
             data = self.empty_image
         else:
             try:
-                data = self._image(forest.util.to_datetime(state.valid_time))
+                viewport = geo.snap_viewport(getattr(state, "viewport", None))
+                data = self._image(forest.util.to_datetime(state.valid_time),
+                                   viewport)
             except (FileNotFound, IndexNotFound):
                 data = self.empty_image
         return data
 
-    def _image(self, valid_time):
-        paths = self.locator.glob()
-        path, itime = self.locator.find(paths, valid_time)
-        return self.load_image(path, itime)
+    def _image(self, valid_time, viewport=None):
+        # Full resolution field, shared by every overview level
+        key = ("field", "eida50", self.locator.pattern, valid_time)
+        field = IMAGE_CACHE.load(key, self._load_valid_time, valid_time)
+        factor = self._factor(field, viewport)
 
-    def load_image(self, path, itime):
-        lons = self.longitudes
-        lats = self.latitudes
-        with xarray.open_dataset(path, engine=ENGINE) as nc:
+        # Only the requested level is block-averaged and stretched
+        key = ("eida50", None, self.locator.pattern, "EIDA50",
+               None, valid_time, None, factor)
+        return IMAGE_CACHE.load(key, self._stretch, field, factor)
+
+    def _load_valid_time(self, valid_time):
+        path, itime = self.locator.find(None, valid_time)
+        return self.load_field(path, itime)
+
+    def load_field(self, path, itime):
+        """Longitudes, latitudes and brightness temperatures"""
+        with forest.handles.open_xarray(path, engine=ENGINE) as nc:
             values = nc["data"][itime].values
+        return self.longitudes, self.latitudes, values
 
-        # Use datashader to coarsify images from 4.4km to 8.8km grid
-        scale = 2
-        return geo.stretch_image(
-                lons, lats, values,
-                plot_width=int(values.shape[1] / scale),
-                plot_height=int(values.shape[0] / scale))
+    def load_image(self, path, itime, viewport=None):
+        field = self.load_field(path, itime)
+        return self._stretch(field, self._factor(field, viewport))
+
+    @staticmethod
+    def _factor(field, viewport):
+        lons, lats, values = field
+        return pyramid.choose_factor(
+            values.shape, *pyramid.plot_size(lons, lats, viewport))
+
+    @staticmethod
+    def _stretch(field, factor):
+        lons, lats, values = pyramid.coarsen(*field, factor)
+        return geo.stretch_image(lons, lats, values)
 
 
 class Navigator:
@@ -312,11 +542,8 @@ class Navigator:
                          action["payload"]["value"])
             if key == "valid_time":
                 # Detect missing file
-                paths = self.locator.glob()
-                path = self.locator.find_file(paths, time)
-                if path not in self.database.fetch_paths():
-                    times = self.locator.load_time_axis(path)  # datetime64[s]
-                    self.database.insert_times(times.astype(dt.datetime), path)
+                path = self.locator.find_file(None, time)
+                self.locator.index.insert_axis(path)
 
                 # Update stale state
                 store_times = store.state.get("valid_times", [])
@@ -341,8 +568,7 @@ class Navigator:
 
         :param valid_time: application state valid time
         """
-        paths = self.locator.glob()
-        datetimes = self.locator.all_times(paths)
+        datetimes = self.locator.all_times()
         return np.array(datetimes, dtype='datetime64[s]')
 
     def pressures(self, pattern, variable, initial_time):
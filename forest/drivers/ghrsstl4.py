@@ -5,10 +5,13 @@ These conventions should conform the GDS 2.0 conventions (based on cf1.7)
 See:
 https://www.ghrsst.org/about-ghrsst/governance-documents/
 
+Global L4 grids are too large to realise for every frame. Images only
+read the window of each field inside the current viewport, at a stride
+matching the screen resolution, see :func:`window`
+
 """
 
 from datetime import datetime
-import collections
 
 import numpy as np
 try:
@@ -17,8 +20,9 @@ except ModuleNotFoundError:
     # ReadTheDocs can't import iris
     iris = None
 
-import glob
-from forest import geo
+from forest import geo, pyramid
+from forest.cache import IMAGE_CACHE
+from forest.cubes import CubeCatalogue, name_cubes
 from forest.map_view import ImageView
 from forest.util import to_datetime as _to_datetime
 
@@ -69,47 +73,37 @@ def _load(pattern):
 
     # Ensure that we only retain cubes that meet our entry criteria
     # for "gridded forecast"
-    cubes = list(filter(_is_valid_cube, cubes))
-    assert len(cubes) > 0
-
-    # Find all the names with duplicates
-    name_counts = collections.Counter(cube.name() for cube in cubes)
-    duplicate_names = {name for name, count in name_counts.items()
-                       if count > 1}
-
-    # Map names (with numeric suffixes for duplicates) to cubes
-    duplicate_counts = collections.defaultdict(int)
-    cube_mapping = {}
-    for cube in cubes:
-        name = cube.name()
-        if name in duplicate_names:
-            duplicate_counts[name] += 1
-            name += f' ({duplicate_counts[name]})'
-        cube_mapping[name] = cube
+    cube_mapping = name_cubes(cubes, _is_valid_cube)
+    assert len(cube_mapping) > 0
     return cube_mapping
 
 class Dataset:
-    """High-level class to relate navigators, loaders and views"""
+    """High-level class to relate navigators, loaders and views
+
+    Cubes are loaded once per server by a
+    :class:`forest.cubes.CubeCatalogue` shared by navigators and views
+    """
     def __init__(self, label=None, pattern=None, **kwargs):
         self._label = label
         self.pattern = pattern
-        if pattern is not None:
-            self._paths = glob.glob(pattern)
-        else:
-            self._paths = []
+        self._cubes = CubeCatalogue(pattern, _is_valid_cube)
+
+    def refresh(self):
+        """Reload cubes of files that changed on disk"""
+        self._cubes.refresh()
 
     def navigator(self):
         """Construct navigator"""
-        return Navigator(self._paths)
+        return Navigator(self._cubes)
 
     def map_view(self, color_mapper):
         """Construct view"""
-        return ImageView(ImageLoader(self._label, self._paths), color_mapper)
+        return ImageView(ImageLoader(self._label, self._cubes), color_mapper)
 
 class ImageLoader:
-    def __init__(self, label, pattern):
+    def __init__(self, label, cube_dict):
         self._label = label
-        self._cubes = _load(pattern)
+        self._cubes = cube_dict
 
     def image(self, state):
         cube = self._cubes[state.variable]
@@ -117,22 +111,61 @@ class ImageLoader:
         cube = cube.extract(iris.Constraint(time=valid_datetime))
 
         if cube is None:
-            data = empty_image()
-        else:
-            data = geo.stretch_image(cube.coord('longitude').points,
-                                     cube.coord('latitude').points, cube.data)
-            data.update(coordinates(state.valid_time, state.initial_time,
-                                    state.pressures, state.pressure))
-            data.update({
-                'name': [self._label],
-                'units': [str(cube.units)]
-            })
+            return empty_image()
+        viewport = geo.snap_viewport(getattr(state, "viewport", None))
+        key = ("ghrsstl4", self._label, state.variable, valid_datetime,
+               viewport)
+        data = IMAGE_CACHE.load(key, self._load_image, cube, viewport)
+        if data is None:
+            return empty_image()
+        data = dict(data)
+        data.update(coordinates(state.valid_time, state.initial_time,
+                                state.pressures, state.pressure))
+        data.update({
+            'name': [self._label],
+            'units': [str(cube.units)]
+        })
         return data
 
+    @staticmethod
+    def _load_image(cube, viewport):
+        """Stretched image of the part of a 2D cube inside a viewport
+
+        Only the strided window is realised, the cube's deferred data
+        only reads the chunks it needs
+        """
+        lons = cube.coord('longitude').points
+        lats = cube.coord('latitude').points
+        lat_slice, lon_slice = window(lons, lats, viewport)
+        lons, lats = lons[lon_slice], lats[lat_slice]
+        if (lons.size == 0) or (lats.size == 0):
+            # Field outside viewport
+            return None
+        return geo.stretch_image(lons, lats,
+                                 cube[lat_slice, lon_slice].data)
+
+
+def window(lons, lats, viewport):
+    """Latitude and longitude slices to read for a viewport
+
+    Strides give roughly one grid point per screen pixel, a whole field
+    is read at :data:`forest.pyramid.DEFAULT_PIXELS` if the viewport is
+    not known
+
+    :param viewport: tuple returned by :func:`forest.geo.snap_viewport`
+                     or None
+    :returns: (latitude slice, longitude slice)
+    """
+    if viewport is None:
+        pixels = pyramid.DEFAULT_PIXELS
+        return (geo.axis_slice(lats, np.min(lats), np.max(lats), pixels),
+                geo.axis_slice(lons, np.min(lons), np.max(lons), pixels))
+    return geo.viewport_slices(lons, lats, viewport)
+
 
 class Navigator:
-    def __init__(self, paths):
-        self._cubes = _load(paths)
+    def __init__(self, cube_dict):
+        self._cubes = cube_dict
 
     def variables(self, pattern):
         return list(self._cubes.keys())
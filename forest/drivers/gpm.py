@@ -1,27 +1,51 @@
-"""GPM driver"""
+"""
+GPM driver
+----------
+
+IMERG files hold a day of half-hourly precipitation. A :class:`Locator`
+keeps a catalogue of daily files, indexed by the date in their file
+name, together with the time axis of each file it has read. Longitudes
+and latitudes are read once per grid, so loading a frame is a lookup
+followed by a read of a single time slice
+
+.. autoclass:: Locator
+   :members:
+
+"""
 from functools import partial, lru_cache
-import glob
+import threading
 import datetime as dt
 import netCDF4
 import numpy as np
 import forest.map_view
 import forest.geo
+import forest.handles
 import forest.util
+import forest.watch
+from forest.cache import IMAGE_CACHE
 
 
 @lru_cache(maxsize=16)
 def read_times(path):
     """Read time axis from a file"""
-    with netCDF4.Dataset(path) as dataset:
+    with forest.handles.open_netcdf(path) as dataset:
         var = dataset.variables["time"]
         times = netCDF4.num2date(var[:], units=var.units)
     return np.array([forest.util.to_datetime(t) for t in times], dtype=object)
 
 
+def read_coordinates(path):
+    """Read longitude and latitude axes from a file"""
+    with forest.handles.open_netcdf(path) as dataset:
+        lons = dataset.variables["longitude"][:]
+        lats = dataset.variables["latitude"][:]
+    return lons, lats
+
+
 class Dataset:
     def __init__(self, pattern=None, **kwargs):
         self.pattern = pattern
-        self.locator = Locator()
+        self.locator = Locator(pattern)
 
     def navigator(self):
         return Navigator(self.pattern, self.locator)
@@ -34,10 +58,99 @@ class Dataset:
 
 
 class Locator:
-    """Search files to find paths"""
-    def __init__(self):
+    """Search files to find paths
+
+    Daily files are indexed by file name date as they appear in the
+    catalogue of pattern. Time axes and coordinates are cached until
+    a file is removed from the catalogue
+
+    :param pattern: glob pattern of daily files
+    """
+    def __init__(self, pattern=None):
         self.parse_date = partial(forest.util.parse_date,
                                   "[0-9]{8}", "%Y%m%d")
+        self.catalogue = forest.watch.WATCHER.catalogue(
+            pattern, max_age=dt.timedelta(minutes=15))
+        self._days = {}
+        self._axes = {}
+        self._grids = {}
+        self._coordinates = {}
+        self._subscribed = False
+        self._lock = threading.RLock()
+
+    def sync(self):
+        """Follow catalogue on first use, then refresh"""
+        with self._lock:
+            if not self._subscribed:
+                self._subscribed = True
+                self.catalogue.follow(self.on_change)
+                return
+        self.catalogue.refresh()
+
+    def on_change(self, added, removed):
+        """Catalogue subscriber, see :class:`forest.watch.Catalogue`"""
+        with self._lock:
+            for path in removed:
+                date = self.parse_date(path)
+                if self._days.get(date) == path:
+                    del self._days[date]
+                self._axes.pop(path, None)
+                self._coordinates.pop(path, None)
+            for path in added:
+                date = self.parse_date(path)
+                if date is not None:
+                    self._days[date] = path
+
+    def timestamps(self):
+        """Sorted dict of file name dates and paths"""
+        self.sync()
+        with self._lock:
+            return dict(sorted(self._days.items()))
+
+    def axis(self, path):
+        """Time axis of a file, read once"""
+        with self._lock:
+            if path in self._axes:
+                return self._axes[path]
+        times = read_times(path)
+        with self._lock:
+            self._axes[path] = times
+        return times
+
+    def coordinates(self, path):
+        """Longitudes and latitudes of a file, shared by identical grids"""
+        with self._lock:
+            if path in self._coordinates:
+                return self._coordinates[path]
+        lons, lats = read_coordinates(path)
+        key = (len(lons), float(lons[0]), float(lons[-1]),
+               len(lats), float(lats[0]), float(lats[-1]))
+        with self._lock:
+            grid = self._grids.setdefault(key, (lons, lats))
+            self._coordinates[path] = grid
+        return grid
+
+    def find(self, date):
+        """Path and time index of a date or None
+
+        Files dated the same day as date are searched first, then
+        the files of the neighbouring days
+        """
+        self.sync()
+        day = dt.datetime(date.year, date.month, date.day)
+        one_day = dt.timedelta(days=1)
+        with self._lock:
+            paths = [self._days.get(day + offset * one_day)
+                     for offset in (0, -1, 1)]
+        window_size = dt.timedelta(days=1)
+        for path in paths:
+            if path is None:
+                continue
+            if abs(self.parse_date(path) - date) >= window_size:
+                continue
+            for index in self.find_index(path, date):
+                return path, index
+        return None
 
     def find_paths_and_index(self, paths, date):
         """Flatten paths and index generators"""
@@ -52,7 +165,7 @@ class Locator:
                 yield path
 
     def find_index(self, path, date):
-        times = read_times(path)
+        times = self.axis(path)
         tolerance = dt.timedelta(minutes=1)
         pts = np.where(np.abs(times - date) < tolerance)
         for index in pts[0]:
@@ -73,8 +186,7 @@ class Navigator:
 
     def valid_times(self, *args, valid_times=None, valid_time=None, **kwargs):
         """Times from time stamps and contents of file(s)"""
-        paths = list(sorted(glob.glob(self.pattern)))
-        timestamps = {self.locator.parse_date(path): path for path in paths}
+        timestamps = self.locator.timestamps()
 
         # Guard clause uninitialised state
         if (valid_times is None) or (valid_time is None):
@@ -83,7 +195,7 @@ class Navigator:
         # Cache path time axis
         if valid_time in timestamps:
             path = timestamps[valid_time]
-            self._time_arrays[valid_time] = read_times(path)
+            self._time_arrays[valid_time] = self.locator.axis(path)
 
         # Compute dataset time axis
         arrays = [
@@ -115,21 +227,20 @@ class _Loader:
     def image(self, old_state):
         if old_state.valid_time is None:
             return self.empty_image
-
-        # Default value
-        data = self.empty_image
-
-        # Search file system
-        paths = sorted(glob.glob(self.pattern))
-        date = old_state.valid_time
-        for path, index in self.locator.find_paths_and_index(paths, date):
-            with netCDF4.Dataset(path) as dataset:
-                lons = dataset.variables["longitude"][:]
-                lats = dataset.variables["latitude"][:]
-                data = dataset.variables["precipitation_flux"][index]
-            npixels = 512
-            data = forest.geo.stretch_image(lons, lats, data,
-                                    plot_height=npixels,
-                                    plot_width=npixels)
-            break
-        return data
+        key = ("gpm", None, self.pattern, "precipitation_flux",
+               None, old_state.valid_time, None, None)
+        return IMAGE_CACHE.load(key, self._load_image, old_state.valid_time)
+
+    def _load_image(self, date):
+        """Load and stretch image shared by all sessions"""
+        found = self.locator.find(forest.util.to_datetime(date))
+        if found is None:
+            return self.empty_image
+        path, index = found
+        lons, lats = self.locator.coordinates(path)
+        with forest.handles.open_netcdf(path) as dataset:
+            data = dataset.variables["precipitation_flux"][index]
+        npixels = 512
+        return forest.geo.stretch_image(lons, lats, data,
+                                        plot_height=npixels,
+                                        plot_width=npixels)
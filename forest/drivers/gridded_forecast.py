@@ -1,5 +1,4 @@
 from datetime import datetime
-import collections
 
 import numpy as np
 try:
@@ -10,8 +9,9 @@ except ModuleNotFoundError:
 
 import cftime
 
-import glob
 from forest import geo
+from forest.cache import IMAGE_CACHE
+from forest.cubes import CubeCatalogue, name_cubes
 import forest.map_view
 from forest.util import to_datetime as _to_datetime
 
@@ -72,40 +72,33 @@ def _load(pattern, is_valid_cube=None):
 
     # Ensure that we only retain cubes that meet our entry criteria
     # for "gridded forecast"
-    cubes = list(filter(is_valid_cube, cubes))
-    assert len(cubes) > 0
-
-    # Find all the names with duplicates
-    name_counts = collections.Counter(cube.name() for cube in cubes)
-    duplicate_names = {name for name, count in name_counts.items()
-                       if count > 1}
-
-    # Map names (with numeric suffixes for duplicates) to cubes
-    duplicate_counts = collections.defaultdict(int)
-    cube_mapping = {}
-    for cube in cubes:
-        name = cube.name()
-        if name in duplicate_names:
-            duplicate_counts[name] += 1
-            name += f' ({duplicate_counts[name]})'
-        cube_mapping[name] = cube
+    cube_mapping = name_cubes(cubes, is_valid_cube)
+    assert len(cube_mapping) > 0
     return cube_mapping
 
 
 class Dataset:
-    """High-level class to relate navigators, loaders and views"""
+    """High-level class to relate navigators, loaders and views
+
+    Navigators and image loaders share a :class:`forest.cubes.CubeCatalogue`
+    so that files are only loaded once per server
+    """
     def __init__(self, label=None, pattern=None, **kwargs):
         self._label = label
         self.pattern = pattern
-        if pattern is not None:
-            self._paths = glob.glob(pattern)
-        else:
-            self._paths = []
+        self._cubes = CubeCatalogue(pattern, self.is_valid_cube)
+
+    @staticmethod
+    def is_valid_cube(cube):
+        return _is_valid_cube(cube)
+
+    def refresh(self):
+        """Reload cubes of files that changed on disk"""
+        self._cubes.refresh()
 
     def navigator(self):
         """Construct navigator"""
-        cube_dict = _load(self._paths, _is_valid_cube)
-        return Navigator(cube_dict)
+        return Navigator(self._cubes)
 
     def map_view(self, color_mapper):
         """Construct view"""
@@ -113,33 +106,45 @@ class Dataset:
 
     def image_loader(self):
         """Construct ImageLoader"""
-        cube_dict = _load(self._paths, _is_valid_cube)
-        return ImageLoader(self._label, cube_dict)
+        return ImageLoader(self._label, self._cubes, pattern=self.pattern)
 
 
 class ImageLoader:
     def __init__(self, label, cube_dict,
-                 extract_cube=None):
+                 extract_cube=None,
+                 pattern=None):
         self._label = label
         self._cubes = cube_dict
+        self._pattern = pattern
         if extract_cube is not None:
             self.extract_cube = extract_cube
 
     def image(self, state):
-        cube = self._cubes[state.variable]
         valid_datetime = _to_datetime(state.valid_time)
-        cube = self.extract_cube(cube, valid_datetime)
-        if cube is None:
+        key = ("gridded_forecast", self._label, self._pattern, state.variable,
+               None, valid_datetime, None, None)
+        data = IMAGE_CACHE.load(key, self._load_image, state.variable,
+                                valid_datetime)
+        if data is None:
             data = empty_image()
         else:
-            data = geo.stretch_image(cube.coord('longitude').points,
-                                     cube.coord('latitude').points, cube.data)
+            data = dict(data)
             data.update(coordinates(state.valid_time, state.initial_time,
                                     state.pressures, state.pressure))
-            data.update({
-                'name': [self._label],
-                'units': [str(cube.units)]
-            })
+        return data
+
+    def _load_image(self, variable, valid_datetime):
+        """Stretched image shared by all sessions or None"""
+        cube = self._cubes[variable]
+        cube = self.extract_cube(cube, valid_datetime)
+        if cube is None:
+            return None
+        data = geo.stretch_image(cube.coord('longitude').points,
+                                 cube.coord('latitude').points, cube.data)
+        data.update({
+            'name': [self._label],
+            'units': [str(cube.units)]
+        })
         return data
 
     @staticmethod
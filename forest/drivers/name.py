@@ -5,7 +5,6 @@ from functools import partial
 import iris
 import datetime as dt
 import forest.util
-from forest.drivers.gridded_forecast import _load
 from forest.drivers.gridded_forecast import Dataset as _Dataset
 from forest.drivers.gridded_forecast import Navigator as _Navigator
 from forest.drivers.gridded_forecast import ImageLoader
@@ -13,15 +12,18 @@ from forest.drivers.gridded_forecast import ImageLoader
 
 class Dataset(_Dataset):
     """Provide dataset specific functionality"""
+    @staticmethod
+    def is_valid_cube(cube):
+        return is_valid_cube(cube)
+
     def navigator(self):
         """Construct a Navigator"""
-        cube_dict = _load(self._paths, is_valid_cube)
-        return Navigator(cube_dict)
+        return Navigator(self._cubes)
 
     def image_loader(self):
-        cube_dict = _load(self._paths, is_valid_cube)
-        return ImageLoader(self._label, cube_dict,
-                           extract_cube=extract_cube)
+        return ImageLoader(self._label, self._cubes,
+                           extract_cube=extract_cube,
+                           pattern=self.pattern)
 
 
 class Navigator(_Navigator):
@@ -1,15 +1,44 @@
 """
 NearCast
 --------------------------------------
+
+NearCast GRIB2 files hold thousands of messages. Rather than searching
+them with ``pygrib.index`` for every image and menu, each file is
+scanned once into a :class:`GribIndex` of message byte offsets and
+meta-data. Images read a single message from its offset and menus are
+served from the index.
+
+Indices are cached in memory and, if an ``index_directory`` is given,
+saved as JSON so that they survive restarts. Indices are rebuilt if a
+file's modification time or size changes.
+
+.. code-block:: yaml
+
+    files:
+      - label: NearCast
+        file_type: nearcast
+        pattern: ~/nearcast/NEARCAST_*_LAKEVIC_LATLON.GRIB2
+        index_directory: ~/cache/nearcast
+
+.. autoclass:: GribIndex
+   :members:
+
+.. autofunction:: read_index
+
+.. autofunction:: scan
+
 """
 import os
-import glob
 import re
+import json
+import mmap
+import threading
 import datetime as dt
+from functools import lru_cache
 import numpy as np
 import forest.map_view
+import forest.watch
 from forest import geo
-from forest.util import timeout_cache
 from forest.drivers.gridded_forecast import _to_datetime
 
 try:
@@ -24,12 +53,18 @@ NEARCAST_TOOLTIPS = [("Name", "@name"),
 
 
 class Dataset:
-    def __init__(self, pattern=None, **kwargs):
+    def __init__(self, pattern=None, index_directory=None, **kwargs):
         self.pattern = pattern
-        self.loader = NearCast(self.pattern)
+        if index_directory is not None:
+            index_directory = os.path.expanduser(index_directory)
+        self.index_directory = index_directory
+        self.locator = Locator(self.pattern)
+        self.loader = NearCast(self.pattern, index_directory,
+                               locator=self.locator)
 
     def navigator(self):
-        return Navigator(self.pattern)
+        return Navigator(self.pattern, self.index_directory,
+                         locator=self.locator)
 
     def map_view(self, color_mapper):
         return forest.map_view.map_view(self.loader,
@@ -39,8 +74,11 @@ class Dataset:
 
 class NearCast(object):
     """View responsible for plotting Nearcast dataset"""
-    def __init__(self, pattern):
-        self.locator = Locator(pattern)
+    def __init__(self, pattern, index_directory=None, locator=None):
+        if locator is None:
+            locator = Locator(pattern)
+        self.locator = locator
+        self.index_directory = index_directory
         self.empty_image = {
             "x": [],
             "y": [],
@@ -80,52 +118,46 @@ class NearCast(object):
                                  imageData["data"])
 
     def get_grib2_data(self, path, valid_time, variable, pressure):
-        cache = {}
-
-        validTime = dt.datetime.strptime(str(valid_time), "%Y-%m-%d %H:%M:%S")
-        vTime = "{0:d}{1:02d}".format(validTime.hour, validTime.minute)
-
-        messages = pg.index(path, "name", "scaledValueOfFirstFixedSurface", "validityTime")
-        if len(path) > 0:
-            field = messages.select(name=variable, scaledValueOfFirstFixedSurface=int(pressure), validityTime=vTime)[0]
-            cache["longitude"] = field.latlons()[1][0,:]
-            cache["latitude"] = field.latlons()[0][:,0]
-            cache["data"] = field.values
-            cache["units"] = field.units
-            cache["name"] = field.name
-            cache["valid"] = "{0:02d}:{1:02d} UTC".format(validTime.hour, validTime.minute)
-            cache["initial"] = "blah"
-            scaledLowerLevel = float(field.scaledValueOfFirstFixedSurface)
-            scaleFactorLowerLevel = float(field.scaleFactorOfFirstFixedSurface)
-            lowerSigmaLevel = str(round(scaledLowerLevel * 10**-scaleFactorLowerLevel, 2))
-            scaledUpperLevel = float(field.scaledValueOfSecondFixedSurface)
-            scaleFactorUpperLevel = float(field.scaleFactorOfSecondFixedSurface)
-            upperSigmaLevel = str(round(scaledUpperLevel * 10**-scaleFactorUpperLevel, 2))
-            cache['layer'] = lowerSigmaLevel+"-"+upperSigmaLevel
-        messages.close()
-        return cache
+        validTime = _to_datetime(valid_time)
+        index = read_index(path, self.index_directory)
+        record = index.find(variable, pressure, validTime)
+        if record is None:
+            raise ValueError("no message matching {} {} {}".format(
+                variable, pressure, validTime))
+        field = index.message(record)
+        latitudes, longitudes = field.latlons()
+        return {
+            "longitude": longitudes[0, :],
+            "latitude": latitudes[:, 0],
+            "data": field.values,
+            "units": record["units"],
+            "name": record["name"],
+            "valid": "{0:02d}:{1:02d} UTC".format(validTime.hour,
+                                                  validTime.minute),
+            "initial": "blah",
+            "layer": record["layer"]
+        }
 
 
 class Navigator:
     """Simplified navigator
+
+    Menus are served from the :class:`GribIndex` of each file, pass
+    the dataset's :class:`Locator` to share it with its loader
     """
-    def __init__(self, pattern):
+    def __init__(self, pattern, index_directory=None, locator=None):
         self.pattern = pattern
-        self.locator = Locator(pattern)
+        self.index_directory = index_directory
+        if locator is None:
+            locator = Locator(pattern)
+        self.locator = locator
 
     def variables(self, pattern):
         """Names of variables in dataset"""
         paths = self.locator.find(self.pattern)
         if len(paths) == 0:
             return []
-        return list(sorted(set(self._variables(paths[-1]))))
-
-    @staticmethod
-    def _variables(path):
-        messages = pg.open(path)
-        for message in messages.select():
-            yield message['name']
-        messages.close()
+        return read_index(paths[-1], self.index_directory).variables()
 
     def initial_times(self, pattern, variable=None):
         """Model initialisation times"""
@@ -134,50 +166,35 @@ class Navigator:
 
     def valid_times(self, pattern, variable, initial_time):
         """Validity times"""
-        return self._dim(self._valid_times, variable, initial_time)
-
-    @staticmethod
-    def _valid_times(variable, path):
-        messages = pg.index(path, "name")
-        try:
-            for message in messages.select(name=variable):
-                validTime = "{0:8d}{1:04d}".format(message["validityDate"],
-                                                   message["validityTime"])
-                yield dt.datetime.strptime(validTime, "%Y%m%d%H%M")
-        except ValueError:
-            # messages.select(name=variable) raises ValueError if not found
-            pass
-        messages.close()
+        return self._dim(GribIndex.valid_times, variable, initial_time)
 
     def pressures(self, pattern, variable, initial_time):
         """Vertical coordinate"""
-        return self._dim(self._pressures, variable, initial_time)
-
-    @staticmethod
-    def _pressures(variable, path):
-        messages = pg.index(path, "name")
-        try:
-            for message in messages.select(name=variable):
-                yield message["scaledValueOfFirstFixedSurface"]
-        except ValueError:
-            # messages.select(name=variable) raises ValueError if not found
-            pass
-        messages.close()
+        return self._dim(GribIndex.pressures, variable, initial_time)
 
     def _dim(self, method, variable, initial_time):
         paths = self.locator.find_paths(initial_time)
         values = []
         for path in paths:
-            for value in method(variable, path):
-                values.append(value)
+            index = read_index(path, self.index_directory)
+            values += method(index, variable)
         return list(sorted(set(values)))
 
 
 class Locator(object):
-    """Locate files on disk"""
+    """Locate files on disk
+
+    The initial time to path mapping is updated as files are added to
+    or removed from the catalogue, see :mod:`forest.watch`. The
+    catalogue is followed on first use
+    """
     def __init__(self, pattern):
         self.pattern = pattern
         self._initial_time_to_path = {}
+        self._subscribed = False
+        self._lock = threading.Lock()
+        self.catalogue = forest.watch.WATCHER.catalogue(
+            pattern, max_age=dt.timedelta(minutes=10))
 
     def find_paths(self, initial_time):
         """Find paths by initial time"""
@@ -189,18 +206,184 @@ class Locator(object):
             return []
 
     def sync(self):
-        paths = self.find(self.pattern)
-        for path in paths:
+        """Follow catalogue on first use, then refresh"""
+        with self._lock:
+            if not self._subscribed:
+                self._subscribed = True
+                self.catalogue.follow(self.on_change)
+                return
+        self.catalogue.refresh()
+
+    def on_change(self, added, removed):
+        for path in removed:
+            key = str(self.parse_date(path))
+            if self._initial_time_to_path.get(key) == path:
+                del self._initial_time_to_path[key]
+        for path in added:
             key = str(self.parse_date(path))
             self._initial_time_to_path[key] = path
 
     @staticmethod
-    @timeout_cache(dt.timedelta(minutes=10))
     def find(pattern):
-        return sorted(glob.glob(pattern))
+        return forest.watch.WATCHER.catalogue(
+            pattern, max_age=dt.timedelta(minutes=10)).paths
 
     @staticmethod
     def parse_date(path):
         groups = re.search("[0-9]{8}_[0-9]{4}", os.path.basename(path))
         if groups is not None:
             return dt.datetime.strptime(groups[0], "%Y%m%d_%H%M")
+
+
+class GribIndex:
+    """Byte offsets and meta-data of the messages in a GRIB file
+
+    :param path: GRIB file
+    :param records: list of dicts with ``name``, ``level``, ``valid``,
+                    ``units``, ``layer``, ``offset`` and ``length``
+                    of each message, see :func:`read_index`
+    """
+    def __init__(self, path, records):
+        self.path = path
+        self.records = records
+        self._lookup = {}
+        for record in records:
+            key = (record["name"], record["level"], record["valid"])
+            self._lookup.setdefault(key, record)
+
+    def variables(self):
+        """Sorted message names"""
+        return sorted(set(record["name"] for record in self.records))
+
+    def valid_times(self, variable):
+        """Sorted validity times of a variable"""
+        return sorted(set(_parse_time(record["valid"])
+                          for record in self.records
+                          if record["name"] == variable))
+
+    def pressures(self, variable):
+        """Sorted levels, i.e. scaledValueOfFirstFixedSurface"""
+        return sorted(set(record["level"]
+                          for record in self.records
+                          if record["name"] == variable))
+
+    def find(self, variable, level, valid_time):
+        """Record of a message or None if not present"""
+        try:
+            level = int(level)
+        except (TypeError, ValueError):
+            return None
+        key = (variable, level, _format_time(_to_datetime(valid_time)))
+        return self._lookup.get(key)
+
+    def message(self, record):
+        """Read a single message directly from its byte offset"""
+        with open(self.path, "rb") as stream:
+            stream.seek(record["offset"])
+            return pg.fromstring(stream.read(record["length"]))
+
+
+def read_index(path, directory=None):
+    """:class:`GribIndex` of a file, built once per modification
+
+    :param path: GRIB file
+    :param directory: location to save indices, if None indices are
+                      only kept in memory
+    """
+    stat = os.stat(path)
+    return _read_index(path, stat.st_mtime_ns, stat.st_size, directory)
+
+
+@lru_cache(maxsize=64)
+def _read_index(path, mtime_ns, size, directory):
+    if directory is None:
+        return GribIndex(path, build_records(path))
+    index_path = os.path.join(directory, os.path.basename(path) + ".json")
+    try:
+        with open(index_path) as stream:
+            content = json.load(stream)
+        if (content["mtime_ns"], content["size"]) == (mtime_ns, size):
+            return GribIndex(path, content["records"])
+    except (OSError, ValueError, KeyError):
+        pass
+    records = build_records(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = index_path + ".{}.tmp".format(os.getpid())
+    with open(tmp_path, "w") as stream:
+        json.dump({
+            "path": os.path.abspath(path),
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "records": records
+        }, stream)
+    os.replace(tmp_path, index_path)
+    return GribIndex(path, records)
+
+
+def build_records(path):
+    """Meta-data of every message in a GRIB file, see :class:`GribIndex`"""
+    records = []
+    with open(path, "rb") as stream:
+        for offset, length in scan(stream):
+            stream.seek(offset)
+            message = pg.fromstring(stream.read(length))
+            valid = "{0:8d}{1:04d}".format(message["validityDate"],
+                                           message["validityTime"])
+            records.append({
+                "name": message["name"],
+                "level": int(message["scaledValueOfFirstFixedSurface"]),
+                "valid": _format_time(
+                    dt.datetime.strptime(valid, "%Y%m%d%H%M")),
+                "units": message["units"],
+                "layer": _layer(message),
+                "offset": offset,
+                "length": length
+            })
+    return records
+
+
+def scan(stream):
+    """Byte offset and length of each GRIB message in a binary file
+
+    Bytes between messages are skipped
+
+    :param stream: file opened in binary mode
+    :returns: list of (offset, length) tuples
+    """
+    size = os.fstat(stream.fileno()).st_size
+    if size == 0:
+        return []
+    result = []
+    with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        offset = buffer.find(b"GRIB")
+        while 0 <= offset <= size - 16:
+            edition = buffer[offset + 7]
+            if edition == 1:
+                length = int.from_bytes(buffer[offset + 4:offset + 7], "big")
+            else:
+                length = int.from_bytes(buffer[offset + 8:offset + 16], "big")
+            if (length < 16) or (offset + length > size):
+                # Not a message header, keep searching
+                offset = buffer.find(b"GRIB", offset + 1)
+                continue
+            result.append((offset, length))
+            offset = buffer.find(b"GRIB", offset + length)
+    return result
+
+
+def _layer(message):
+    """Sigma layer label, e.g. '0.8-0.9'"""
+    levels = []
+    for surface in ("First", "Second"):
+        scaled = float(message["scaledValueOf{}FixedSurface".format(surface)])
+        factor = float(message["scaleFactorOf{}FixedSurface".format(surface)])
+        levels.append(str(round(scaled * 10**-factor, 2)))
+    return "-".join(levels)
+
+
+def _format_time(time):
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _parse_time(text):
+    return dt.datetime.strptime(text, "%Y-%m-%d %H:%M:%S")
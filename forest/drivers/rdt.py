@@ -1,9 +1,23 @@
 """
 Rapidly Developing Thunderstorms (RDT)
 --------------------------------------
+
+Cells, their trajectories and forecast motion are drawn from
+``ColumnDataSource`` columns. NetCDF files are read with
+:func:`read_netcdf`, which converts whole variables with NumPy and
+projects every coordinate in a single call, instead of building GeoJSON
+features one cell at a time. GeoJSON files are parsed once by
+:func:`read_json`. :class:`Loader` caches the columns of recently
+used files until they are modified
+
+.. autofunction:: read_netcdf
+
+.. autofunction:: read_json
+
+.. autofunction:: geojson_columns
+
 """
 import os
-import glob
 import re
 import datetime as dt
 import bokeh
@@ -18,10 +32,11 @@ from forest import (
         locate)
 from forest.old_state import old_state, unique
 import forest.util
+import forest.watch
 from forest.exceptions import FileNotFound
+from functools import lru_cache
 from bokeh.palettes import GnBu3, OrRd3
 import itertools
-import math
 
 
 class Dataset:
@@ -112,6 +127,7 @@ class View:
             ]
         }
         self.empty_geojson = json.dumps(empty)
+        self.empty_polygons = geojson_columns(self.empty_geojson)
         self.empty_tail_line = dict(
                 xs=[], ys=[],
                 LonTrajCellCG=[],
@@ -156,7 +172,7 @@ class View:
         self.color_mapper = bokeh.models.CategoricalColorMapper(
                 palette=['#fee8c8', '#fdbb84', '#e34a33', '#43a2ca', '#a8ddb5'],
                 factors=["Triggering", "Triggering from split", "Growing", "Mature", "Decaying"])
-        self.source = bokeh.models.GeoJSONDataSource(geojson=self.empty_geojson)
+        self.source = bokeh.models.ColumnDataSource(self.empty_polygons)
         self.tail_line_source = bokeh.models.ColumnDataSource(self.empty_tail_line)
         self.tail_point_source = bokeh.models.ColumnDataSource(self.empty_tail_point)
         self.centre_point_source = bokeh.models.ColumnDataSource(self.empty_centre_point)
@@ -168,13 +184,13 @@ class View:
         if state.valid_time is not None:
             date = forest.util.to_datetime(state.valid_time)
             try:
-                (self.source.geojson,
+                (self.source.data,
                  self.tail_line_source.data,
                  self.tail_point_source.data,
                  self.centre_point_source.data) = self.loader.load_date(date)
             except FileNotFound:
                 print("rdt.View.render caught FileNotFound", date)
-                self.source.geojson = self.empty_geojson
+                self.source.data = self.empty_polygons
                 self.tail_line_source.data = self.empty_tail_line
                 self.tail_point_source.data = self.empty_tail_point
                 self.centre_point_source.data = self.empty_centre_point
@@ -229,80 +245,56 @@ class Loader:
     def load_date(self, date):
         file_name = self.locator.find_file(date)
         print(file_name)
-        if os.path.splitext(file_name)[1] == '.nc':
-            return self.load_all_netcdf(file_name)
-        elif os.path.splitext(file_name)[1] == '.json':
-            return (
-                self.load_polygon_json(file_name),
-                self.load_tail_lines_json(file_name),
-                self.load_tail_points_json(file_name),
-                self.load_centre_points_json(file_name)
-            )
+        return self.load(file_name)
+
+    def load(self, path):
+        """Polygon, tail line, tail point and centre point data of a file
+
+        Files are parsed once and the results re-used until the file
+        is modified
+        """
+        data = self._load(path, os.stat(path).st_mtime_ns)
+        if isinstance(data, str):
+            return data
+        # Copies protect cached columns from changes to sources
+        return tuple(dict(columns) for columns in data)
+
+    @lru_cache(maxsize=16)
+    def _load(self, path, mtime_ns):
+        if os.path.splitext(path)[1] == '.nc':
+            return self.load_all_netcdf(path)
+        elif os.path.splitext(path)[1] == '.json':
+            return read_json(path)
         else:
-            return 'File extension not recognised: ' + file_name
+            return 'File extension not recognised: ' + path
 
     @staticmethod
     def load_all_netcdf(path):
         """
-        Loads polygons from netcdf
+        Loads polygons, tail lines, tail points and centre points from netcdf
         :param path: absolute path and filename
-        :return: geojson object for plotting in bokeh
+        :return: tuple of ColumnDataSource data dicts, see :func:`read_netcdf`
         """
 
-        return getRDT(path, 0, 'All')
+        return read_netcdf(path, 0)
 
     @staticmethod
     def load_polygon_json(path):
-        """Load GeoJSON string representation of Polygons from file
+        """Load Polygons from file
 
-        :returns: GeoJSON str
+        :returns: dict representation suitable for ColumnDataSource
         """
-
-        with open(path) as stream:
-            rdt = json.load(stream)
-
-        # Convert units from the netcdf / geojson data file units into something more readable (e.g. could be Kelvin to degrees C or Pa to hPa)
-        unitsToRescale = {'Pa' : {'scale':100, 'offset':0, 'Units': 'hPa'} }
-        # Get text labels instead of numbers for certain fields
-        fieldsToLookup = ['PhaseLife', 'SeverityType', 'SeverityIntensity', 'ConvType', 'CType']
-
-        copy = dict(rdt)
-        for i, feature in enumerate(rdt["features"]):
-            coordinates = feature['geometry']['coordinates'][0]
-            lons, lats = np.asarray(coordinates).T
-            x, y = geo.web_mercator(lons, lats)
-            c = np.array([x, y]).T.tolist()
-            copy["features"][i]['geometry']['coordinates'][0] = c
-
-            for k in feature['properties'].keys():
-
-                # Might be easier to have a units lookup instead of this ...
-                deldata, myunits = descale_rdt(k, feature['properties'][k])
-                if myunits in unitsToRescale.keys():
-                    try:
-                        mydict = unitsToRescale.get(myunits)
-                        scale, offset, units = mydict.values()
-                        conv_data = (feature['properties'][k] / scale) + offset
-                        copy['features'][i]['properties'][k] = conv_data
-                    except:
-                        continue
-
-                if k in fieldsToLookup:
-                    try:
-                        copy['features'][i]['properties'][k] = fieldValueLUT(k, feature['properties'][k])
-                    except:
-                        continue
-        return json.dumps(copy)
+        return read_json(path)[0]
 
     @staticmethod
     def load_polygon_netcdf(path):
         """
         Loads polygons from netcdf
         :param path: absolute path and filename
-        :return: geojson object for plotting in bokeh
+        :return: ColumnDataSource data with xs, ys and cell properties
         """
 
-        return getRDT(path, 0, 'Polygon')
+        return read_netcdf(path, 0)[0]
 
 
     @staticmethod
@@ -311,34 +303,7 @@ class Loader:
 
         :returns: dict representation suitable for ColumnDataSource
         """
-        with open(path) as stream:
-            rdt = json.load(stream)
-
-        # Create an empty dictionary
-        mydict = get_empty_feature_dict('Tail_Lines')
-
-        # Loop through features
-        for i, feature in enumerate(rdt["features"]):
-            # Append data from the feature properties to the dictionary
-            for k in mydict.keys():
-                try:
-                    thisdata, units = descale_rdt(k, feature['properties'][k])
-                    mydict[k].append(thisdata)
-                except:
-                    # Do nothing at the moment with the xs and ys
-                    if not k in ['xs', 'ys']:
-                        mydict[k].append(None)
-                    else:
-                        continue
-            # Takes the trajectory lat/lons, reprojects and
-            # puts them in a list within a list
-            lons = feature['properties']['LonTrajCellCG']
-            lats = feature['properties']['LatTrajCellCG']
-            xs, ys = geo.web_mercator(lons, lats)
-            mydict['xs'].append(xs)
-            mydict['ys'].append(ys)
-
-        return mydict
+        return read_json(path)[1]
 
     @staticmethod
     def load_tail_lines_netcdf(path):
@@ -348,43 +313,16 @@ class Loader:
         :return: dictionary of data for plotting as a ColumnDataSource in bokeh
         """
 
-        return getRDT(path, 0, 'Tail_Lines')
+        return read_netcdf(path, 0)[1]
 
 
     @staticmethod
     def load_tail_points_json(path):
-        with open(path) as stream:
-            rdt = json.load(stream)
-
-        # Create an empty dictionary
-        mydict = get_empty_feature_dict('Tail_Points')
+        """Load tail point data from file
 
-        # Loop through features
-        for i, feature in enumerate(rdt["features"]):
-            # Append data from the feature properties to the dictionary
-            # First though, how many points do we have in the trajectory tail?
-            npts = len(feature['properties']['LonTrajCellCG'])
-            mykeys = [k for k in mydict.keys() if k not in ['x', 'y']]
-            for k in mykeys:
-                # print(k, type(feature['properties'][k]), sep=':')
-                try:
-                    if not isinstance(feature['properties'][k], list):
-                        datalist = [i for i in itertools.repeat(feature['properties'][k],npts)]
-                        thisdata, units = descale_rdt(k, datalist)
-                        mydict[k].extend(datalist)
-                    else:
-                        thisdata, units = descale_rdt(k, feature['properties'][k])
-                        mydict[k].extend(thisdata)
-                except:
-                    datalist = [i for i in itertools.repeat(None, npts)]
-                    mydict[k].extend(datalist)
-            # Takes the trajectory lat/lons, reprojects and puts them in a list within a list
-            lons = feature['properties']['LonTrajCellCG']
-            lats = feature['properties']['LatTrajCellCG']
-            x, y = geo.web_mercator(lons, lats)
-            mydict['x'].extend(x)
-            mydict['y'].extend(y)
-        return mydict
+        :returns: dict representation suitable for ColumnDataSource
+        """
+        return read_json(path)[2]
 
     @staticmethod
     def load_tail_points_netcdf(path):
@@ -394,48 +332,12 @@ class Loader:
         :return: dictionary of data for plotting as a ColumnDataSource in bokeh
         """
 
-        return getRDT(path, 0, 'Tail_Points')
+        return read_netcdf(path, 0)[2]
 
     @staticmethod
     def load_centre_points_json(path):
         """Holds a centre point, future point and future movement line"""
-
-        with open(path) as stream:
-            rdt = json.load(stream)
-
-        # Create an empty dictionary
-        mydict = get_empty_feature_dict('Centre_Point')
-
-        # Loop through features
-        for i, feature in enumerate(rdt["features"]):
-            # Append data from the feature properties to the dictionary
-            mykeys = [k for k in mydict.keys() if not (('x' in k) or ('y' in k))]
-            for k in mykeys:
-                try:
-                    thisdata, units = descale_rdt(k, feature['properties'][k])
-                    mydict[k].append(thisdata)
-                except:
-                    mydict[k].append(None)
-            # Takes the trajectory lat/lons, reprojects and puts them in a list within a list
-            lon = feature['properties']['LonG']
-            lat = feature['properties']['LatG']
-            x1, y1 = geo.web_mercator(lon, lat)
-            mydict['x1'].extend(x1)
-            mydict['y1'].extend(y1)
-
-            # Now calculate future point and line
-            try:
-                speed = float(feature['properties']['MvtSpeed'])
-            except ValueError:
-                speed = 0
-            try:
-                direction = float(feature['properties']['MvtDirection'])
-            except ValueError:
-                direction = 0
-
-            mydict = make_arrow(mydict, lon, lat, speed, direction)
-
-        return mydict
+        return read_json(path)[3]
 
     @staticmethod
     def load_centre_points_netcdf(path):
@@ -445,7 +347,7 @@ class Loader:
         :return: dictionary of data for plotting as a ColumnDataSource in bokeh
         """
 
-        return getRDT(path, 0, 'Centre_Point')
+        return read_netcdf(path, 0)[3]
 
 
 def make_arrow(mydict, lon, lat, speed, direction):
@@ -730,6 +632,330 @@ def getRDT(path, lev, type):
         return 'Nothing to return'
 
 
+#: Cell properties shown as text labels, see :func:`fieldValueLUT`
+LOOKUP_FIELDS = ['PhaseLife', 'SeverityType', 'SeverityIntensity',
+                 'ConvType', 'CType']
+
+
+def read_netcdf(path, lev=0):
+    """Read RDT NetCDF file into ColumnDataSource compatible columns
+
+    Equivalent to :func:`getRDT` with type 'All' but arrays indexed by
+    ``recNUM``, ``nlevel`` and ``nbpttraj`` are converted in bulk and
+    polygons are returned as ``xs``/``ys`` patches instead of GeoJSON
+
+    :param path: Full path and filename of the netcdf file
+    :param lev: [0,1] Level number. 0 = bottom of the cloud, 1 = top
+    :returns: tuple of polygon, tail line, tail point and centre point
+              data dicts
+    """
+    with nc.Dataset(path) as ncds:
+        return (_polygon_columns(ncds, lev),
+                _tail_line_columns(ncds),
+                _tail_point_columns(ncds),
+                _centre_point_columns(ncds, lev))
+
+
+def _polygon_columns(ncds, lev):
+    lats = ncds.variables['LatContour'][:, lev, :]
+    lons = ncds.variables['LonContour'][:, lev, :]
+    xs, ys = _project_rows(lons, lats)
+    data = {"xs": xs, "ys": ys}
+    for name, var in ncds.variables.items():
+        dims = var.dimensions
+        if (len(dims) == 0) or (dims[0] != 'recNUM'):
+            continue
+        if var.dtype.kind not in "iuf":
+            continue
+        if dims == ('recNUM',):
+            values = var[:]
+        elif (len(dims) == 2) and (dims[1] == 'nlevel'):
+            values = var[:, lev]
+        else:
+            continue
+        if name in LOOKUP_FIELDS:
+            values = ma.filled(values.astype("i8"), -1)
+            data[name] = [fieldValueLUT(name, int(value))
+                          for value in values]
+        else:
+            data[name] = _column(_convert_column(name, values))
+    return data
+
+
+def _convert_column(name, values):
+    """Vectorised equivalent of :func:`convert_values`"""
+    values = ma.asarray(values, dtype="f8")
+    if name == 'ExpansionRate':
+        return ma.round(values * 360000)  # to %/hr
+    elif name == 'CoolingRate':
+        return ma.round(values * 3600)  # to K/hr
+    elif name == 'Surface':
+        return ma.round(values / 1e6)  # to km2
+    elif name == 'CTPressure':
+        return ma.round(values / 100)  # Pa to hPa
+    elif name == 'CRainRate':
+        return ma.round(values)
+    elif name == 'CTPressRate':
+        return ma.round(values * 36)  # Pa/s to hPa/hour
+    elif name in ['BTemp', 'BTmin', 'BTmoy']:
+        return ma.round(values - 273.15, 1)  # K to degC
+    else:
+        return values
+
+
+def _tail_line_columns(ncds):
+    keys = get_empty_feature_dict('Tail_Lines').keys()
+    lats = ncds.variables['LatTrajCellCG'][:]
+    lons = ncds.variables['LonTrajCellCG'][:]
+    mask = _valid(lons, lats)
+    xs, ys = _project_rows(lons, lats)
+    data = {"xs": xs, "ys": ys}
+    for k in keys:
+        if k in data:
+            continue
+        if k not in ncds.variables:
+            data[k] = [None] * len(xs)
+            continue
+        values, _ = descale_rdt(k, ncds.variables[k][:])
+        if ma.ndim(values) == 2:
+            values = ma.asarray(values, dtype="f8")
+            data[k] = [_column(row[valid])
+                       for row, valid in zip(values, mask)]
+        else:
+            data[k] = _column(values)
+    return data
+
+
+def _tail_point_columns(ncds):
+    keys = get_empty_feature_dict('Tail_Points').keys()
+    lats = ncds.variables['LatTrajCellCG'][:]
+    lons = ncds.variables['LonTrajCellCG'][:]
+    mask = _valid(lons, lats)
+    x, y = _web_mercator(ma.getdata(lons)[mask], ma.getdata(lats)[mask])
+    data = {"x": x, "y": y}
+    npts = mask.sum(axis=1)
+    for k in keys:
+        if k in data:
+            continue
+        if k not in ncds.variables:
+            data[k] = [None] * len(x)
+            continue
+        values, _ = descale_rdt(k, ncds.variables[k][:])
+        values = ma.asarray(values, dtype="f8")
+        if values.ndim == 2:
+            data[k] = _column(values[mask])
+        else:
+            data[k] = _column(np.repeat(values, npts))
+    return data
+
+
+def _centre_point_columns(ncds, lev):
+    keys = get_empty_feature_dict('Centre_Point').keys()
+    lat = ma.getdata(ncds.variables['LatG'][:, lev]).astype("f8")
+    lon = ma.getdata(ncds.variables['LonG'][:, lev]).astype("f8")
+    speed = ma.filled(ma.asarray(ncds.variables['MvtSpeed'][:], "f8"), 0)
+    direction = ma.filled(
+        ma.asarray(ncds.variables['MvtDirection'][:], "f8"), 0)
+
+    # Future position and arrow head in longitude/latitude space
+    lon2, lat2 = calc_dst_point(lon, lat, speed, direction)
+    lon3, lat3, lon4, lat4 = get_arrow_poly(lon2, lat2, speed, direction)
+
+    # Project all points with one transform
+    n = len(lon)
+    x, y = _web_mercator(np.concatenate([lon, lon2, lon3, lon4]),
+                         np.concatenate([lat, lat2, lat3, lat4]))
+    x1, x2, x3, x4 = x[:n], x[n:2 * n], x[2 * n:3 * n], x[3 * n:]
+    y1, y2, y3, y4 = y[:n], y[n:2 * n], y[2 * n:3 * n], y[3 * n:]
+    data = {
+        "x1": x1, "y1": y1,
+        "x2": x2, "y2": y2,
+        "xs": np.stack([x1, x2], axis=1).tolist(),
+        "ys": np.stack([y1, y2], axis=1).tolist(),
+        "Arrowxs": np.stack([x2, x3, x4], axis=1).tolist(),
+        "Arrowys": np.stack([y2, y3, y4], axis=1).tolist(),
+    }
+    for k in keys:
+        if k in data:
+            continue
+        if k not in ncds.variables:
+            data[k] = [None] * n
+            continue
+        var = ncds.variables[k]
+        values = var[:, lev] if 'nlevel' in var.dimensions else var[:]
+        values, _ = descale_rdt(k, values)
+        data[k] = _column(values)
+    return data
+
+
+def _valid(lons, lats):
+    """Points with both longitude and latitude"""
+    return ~(ma.getmaskarray(lons) | ma.getmaskarray(lats))
+
+
+def _project_rows(lons, lats):
+    """Project 2D masked arrays to a list of arrays per row"""
+    mask = _valid(lons, lats)
+    x, y = _web_mercator(ma.getdata(lons)[mask], ma.getdata(lats)[mask])
+    splits = np.cumsum(mask.sum(axis=1))[:-1]
+    return np.split(x, splits), np.split(y, splits)
+
+
+def _web_mercator(lons, lats):
+    lons = np.asarray(lons, dtype="f8")
+    lats = np.asarray(lats, dtype="f8")
+    if lons.size == 0:
+        return np.array([], dtype="f8"), np.array([], dtype="f8")
+    return geo.web_mercator(lons, lats)
+
+
+def _column(values):
+    """Masked values to a float array with NaN"""
+    return ma.filled(ma.asarray(values, dtype="f8"), np.nan)
+
+
+def read_json(path):
+    """Read RDT GeoJSON file into ColumnDataSource compatible columns
+
+    The file is parsed once and every contour, trajectory, centre and
+    arrow point is projected with a single call
+
+    :param path: Full path and filename of the GeoJSON file
+    :returns: tuple of polygon, tail line, tail point and centre point
+              data dicts
+    """
+    with open(path) as stream:
+        rdt = json.load(stream)
+    return _json_columns(rdt["features"])
+
+
+def _json_columns(features):
+    props = [feature['properties'] for feature in features]
+    n = len(features)
+
+    # Longitude/latitude of every point that needs projecting
+    contours = [np.asarray(feature['geometry']['coordinates'][0],
+                           dtype="f8").reshape(-1, 2)
+                for feature in features]
+    trajs = [(np.atleast_1d(np.asarray(p.get('LonTrajCellCG', []), "f8")),
+              np.atleast_1d(np.asarray(p.get('LatTrajCellCG', []), "f8")))
+             for p in props]
+    lon = np.array([p['LonG'] for p in props], dtype="f8")
+    lat = np.array([p['LatG'] for p in props], dtype="f8")
+    speed = np.array([_float(p.get('MvtSpeed')) for p in props])
+    direction = np.array([_float(p.get('MvtDirection')) for p in props])
+    lon2, lat2 = calc_dst_point(lon, lat, speed, direction)
+    lon3, lat3, lon4, lat4 = get_arrow_poly(lon2, lat2, speed, direction)
+
+    pieces = ([contour[:, 0] for contour in contours] +
+              [lons for lons, _ in trajs] +
+              [lon, lon2, lon3, lon4])
+    sizes = [len(piece) for piece in pieces]
+    x, y = _web_mercator(
+        np.concatenate(pieces) if pieces else [],
+        np.concatenate([contour[:, 1] for contour in contours] +
+                       [lats for _, lats in trajs] +
+                       [lat, lat2, lat3, lat4]) if pieces else [])
+    splits = np.cumsum(sizes)[:-1]
+    xs, ys = np.split(x, splits), np.split(y, splits)
+    contour_xs, contour_ys = xs[:n], ys[:n]
+    traj_xs, traj_ys = xs[n:2 * n], ys[n:2 * n]
+    x1, x2, x3, x4 = xs[2 * n:]
+    y1, y2, y3, y4 = ys[2 * n:]
+
+    # Polygons
+    polygons = {"xs": [xs.tolist() for xs in contour_xs],
+                "ys": [ys.tolist() for ys in contour_ys]}
+    for key in itertools.chain.from_iterable(props):
+        if key in polygons:
+            continue
+        units = RDT_UNITS_LUT.get(key, {}).get('Units')
+        values = [p.get(key) for p in props]
+        if units == 'Pa':
+            # Pa to hPa
+            values = [value / 100 if isinstance(value, (int, float))
+                      else value for value in values]
+        if key in LOOKUP_FIELDS:
+            values = [fieldValueLUT(key, value) for value in values]
+        polygons[key] = values
+
+    # Tail lines
+    tail_lines = get_empty_feature_dict('Tail_Lines')
+    tail_lines["xs"] = traj_xs
+    tail_lines["ys"] = traj_ys
+    for k in tail_lines.keys():
+        if k not in ("xs", "ys"):
+            tail_lines[k] = [_descale(k, p[k]) if k in p else None
+                             for p in props]
+
+    # Tail points
+    tail_points = get_empty_feature_dict('Tail_Points')
+    npts = np.array([len(lons) for lons, _ in trajs], dtype=int)
+    tail_points["x"] = np.concatenate(traj_xs) if n else np.array([])
+    tail_points["y"] = np.concatenate(traj_ys) if n else np.array([])
+    for k in tail_points.keys():
+        if k in ("x", "y"):
+            continue
+        values = []
+        for p, count in zip(props, npts):
+            value = _descale(k, p[k]) if k in p else None
+            if isinstance(value, list):
+                values.extend(value)
+            else:
+                values.extend(itertools.repeat(value, count))
+        tail_points[k] = values
+
+    # Centre points, future points and movement arrows
+    centre_points = get_empty_feature_dict('Centre_Point')
+    for k in centre_points.keys():
+        if not (('x' in k) or ('y' in k)):
+            centre_points[k] = [_descale(k, p[k]) if k in p else None
+                                for p in props]
+    centre_points.update({
+        "x1": x1, "y1": y1,
+        "x2": x2, "y2": y2,
+        "xs": np.stack([x1, x2], axis=1).tolist(),
+        "ys": np.stack([y1, y2], axis=1).tolist(),
+        "Arrowxs": np.stack([x2, x3, x4], axis=1).tolist(),
+        "Arrowys": np.stack([y2, y3, y4], axis=1).tolist(),
+    })
+    return polygons, tail_lines, tail_points, centre_points
+
+
+def _descale(fn, value):
+    data, _ = descale_rdt(fn, value)
+    return data
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.
+
+
+def geojson_columns(text):
+    """Convert GeoJSON polygons to ColumnDataSource columns
+
+    :param text: GeoJSON str of a FeatureCollection of Polygons
+    :returns: dict with ``xs``, ``ys`` and a column per property
+    """
+    features = json.loads(text).get("features", [])
+    data = {"xs": [], "ys": []}
+    for key in itertools.chain.from_iterable(
+            feature.get("properties", {}).keys() for feature in features):
+        data.setdefault(key, [])
+    for feature in features:
+        ring = feature["geometry"]["coordinates"][0]
+        data["xs"].append([point[0] for point in ring])
+        data["ys"].append([point[1] for point in ring])
+        properties = feature.get("properties", {})
+        for key in data:
+            if key not in ("xs", "ys"):
+                data[key].append(properties.get(key))
+    return data
+
+
 def getDataOnly(array1d):
     '''
     Removes redundant no data slots in a 1D array
@@ -780,7 +1006,8 @@ def calc_dst_point(x1d, y1d, speed, angle):
     """Calculate destination point
 
     Estimates positions in longitude/latitude space from speed and
-    angle on the surface of a sphere, in this case Earth.
+    angle on the surface of a sphere, in this case Earth. Works with
+    scalars or arrays.
 
     :param x1d: longitude
     :param y1d: latitude
@@ -794,20 +1021,20 @@ def calc_dst_point(x1d, y1d, speed, angle):
     # Radius of the earth (m)
     R = 6378137
 
-    x1 = math.radians(x1d)
-    y1 = math.radians(y1d)
+    x1 = np.radians(x1d)
+    y1 = np.radians(y1d)
 
     # Convert degrees to radians
-    direction = math.radians(angle)
+    direction = np.radians(angle)
 
-    y2 = math.asin(math.sin(y1) * math.cos(d / R) +
-                   math.cos(y1) * math.sin(d / R) * math.cos(direction))
+    y2 = np.arcsin(np.sin(y1) * np.cos(d / R) +
+                   np.cos(y1) * np.sin(d / R) * np.cos(direction))
 
-    x2 = x1 + math.atan2(math.sin(direction) * math.sin(d / R) * math.cos(y1),
-                         math.cos(d / R) - math.sin(y1) * math.sin(y2))
+    x2 = x1 + np.arctan2(np.sin(direction) * np.sin(d / R) * np.cos(y1),
+                         np.cos(d / R) - np.sin(y1) * np.sin(y2))
 
-    x2d = math.degrees(x2)
-    y2d = math.degrees(y2)
+    x2d = np.degrees(x2)
+    y2d = np.degrees(y2)
     return x2d, y2d
 
 
@@ -830,7 +1057,7 @@ def get_arrow_poly(x2,y2, speed, direction):
 
     # First point
     pt1_dir = (mvt_line_dir - 180) % 360 - arrow_angl
-    pt1_len = math.sqrt(3. * math.pow( mvt_line_len * arrow_linefrac, 2 ) / 2) # Metres
+    pt1_len = np.sqrt(3. * np.power( mvt_line_len * arrow_linefrac, 2 ) / 2) # Metres
     # Convert len back to speed for the function
     pt1_speed = pt1_len / (timestep * 60)
     # Calculate x3, y3
@@ -838,7 +1065,7 @@ def get_arrow_poly(x2,y2, speed, direction):
 
     # Second point
     pt2_dir = (mvt_line_dir - 180) % 360 + arrow_angl
-    pt2_len = math.sqrt(3.* math.pow( mvt_line_len * arrow_linefrac, 2 ) / 2) # Metres
+    pt2_len = np.sqrt(3.* np.power( mvt_line_len * arrow_linefrac, 2 ) / 2) # Metres
     # Convert len back to speed for the function
     pt2_speed = pt2_len / (timestep * 60)
     # Calculate x3, y3
@@ -900,47 +1127,49 @@ def convert_values(conv_value, conv_var):
         return conv_value
 
 
+#: Scale, offset and units of RDT variables, see :func:`descale_rdt`
+RDT_UNITS_LUT = {
+    'DecTime': {'scale': 1, 'offset': 0, 'Units': 's'},
+    'LeadTime': {'scale': 1, 'offset': 0, 'Units': 's'},
+    'Duration': {'scale': 1, 'offset': 0, 'Units': 's'},
+    'MvtSpeed': {'scale': 0.001, 'offset': 0, 'Units': 'm s-1'},
+    'MvtDirection': {'scale': 1, 'offset': 0, 'Units': 'degree'},
+    'DtTimeRate': {'scale': 1, 'offset': 0, 'Units': 's'},
+    'ExpansionRate': {'scale': 2e-07, 'offset': -0.005, 'Units': 's-1'},
+    'CoolingRate': {'scale': 2e-06, 'offset': -0.05, 'Units': 'K s-1'},
+    'LightningRate': {'scale': 1e-04, 'offset': -2.0, 'Units': 's-1'},
+    'CTPressRate': {'scale': 0.001, 'offset': -25.0, 'Units': 'Pa s-1'},
+    'BTemp': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
+    'BTmoy': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
+    'BTmin': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
+    'Surface': {'scale': 5000000.0, 'offset': 0, 'Units': 'm2'},
+    'EllipseGaxe': {'scale': 20.0, 'offset': 0, 'Units': 'm'},
+    'EllipsePaxe': {'scale': 20.0, 'offset': 0, 'Units': 'm'},
+    'EllipseAngle': {'scale': 1, 'offset': 0, 'Units': 'degrees_north'},
+    'DtLightning': {'scale': 1, 'offset': 0, 'Units': 's'},
+    'CTPressure': {'scale': 10.0, 'offset': 0, 'Units': 'Pa'},
+    'CTCot': {'scale': 0.01, 'offset': 0, 'Units': '1'},
+    'CTReff': {'scale': 1e-08, 'offset': 0, 'Units': 'm'},
+    'CTCwp': {'scale': 0.001, 'offset': 0, 'Units': 'kg m-2'},
+    'CRainRate': {'scale': 0.1, 'offset': 0, 'Units': 'mm/h'},
+    'BTempSlice': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
+    'SurfaceSlice': {'scale': 5000000.0, 'offset': 0, 'Units': 'm2'},
+    'DTimeTraj': {'scale': 1, 'offset': 0, 'Units': 's'},
+    'BTempTraj': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
+    'BTminTraj': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
+    'BaseAreaTraj': {'scale': 5000000.0, 'offset': 0, 'Units': 'm2'},
+    'TopAreaTraj': {'scale': 5000000.0, 'offset': 0, 'Units': 'm2'},
+    'CoolingRateTraj': {'scale': 2e-06, 'offset': -0.05, 'Units': 'K s-1'},
+    'ExpanRateTraj': {'scale': 2e-07, 'offset': -0.005, 'Units': 's-1'},
+    'SpeedTraj': {'scale': 0.001, 'offset': 0, 'Units': 'm s-1'},
+    'DirTraj': {'scale': 1, 'offset': 0, 'Units': 'degree'}
+}
+
+
 def descale_rdt(fn, data):
     # Converts units according to netcdf files definition
-    rdtUnitsLUT = {
-        'DecTime': {'scale': 1, 'offset': 0, 'Units': 's'},
-        'LeadTime': {'scale': 1, 'offset': 0, 'Units': 's'},
-        'Duration': {'scale': 1, 'offset': 0, 'Units': 's'},
-        'MvtSpeed': {'scale': 0.001, 'offset': 0, 'Units': 'm s-1'},
-        'MvtDirection': {'scale': 1, 'offset': 0, 'Units': 'degree'},
-        'DtTimeRate': {'scale': 1, 'offset': 0, 'Units': 's'},
-        'ExpansionRate': {'scale': 2e-07, 'offset': -0.005, 'Units': 's-1'},
-        'CoolingRate': {'scale': 2e-06, 'offset': -0.05, 'Units': 'K s-1'},
-        'LightningRate': {'scale': 1e-04, 'offset': -2.0, 'Units': 's-1'},
-        'CTPressRate': {'scale': 0.001, 'offset': -25.0, 'Units': 'Pa s-1'},
-        'BTemp': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
-        'BTmoy': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
-        'BTmin': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
-        'Surface': {'scale': 5000000.0, 'offset': 0, 'Units': 'm2'},
-        'EllipseGaxe': {'scale': 20.0, 'offset': 0, 'Units': 'm'},
-        'EllipsePaxe': {'scale': 20.0, 'offset': 0, 'Units': 'm'},
-        'EllipseAngle': {'scale': 1, 'offset': 0, 'Units': 'degrees_north'},
-        'DtLightning': {'scale': 1, 'offset': 0, 'Units': 's'},
-        'CTPressure': {'scale': 10.0, 'offset': 0, 'Units': 'Pa'},
-        'CTCot': {'scale': 0.01, 'offset': 0, 'Units': '1'},
-        'CTReff': {'scale': 1e-08, 'offset': 0, 'Units': 'm'},
-        'CTCwp': {'scale': 0.001, 'offset': 0, 'Units': 'kg m-2'},
-        'CRainRate': {'scale': 0.1, 'offset': 0, 'Units': 'mm/h'},
-        'BTempSlice': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
-        'SurfaceSlice': {'scale': 5000000.0, 'offset': 0, 'Units': 'm2'},
-        'DTimeTraj': {'scale': 1, 'offset': 0, 'Units': 's'},
-        'BTempTraj': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
-        'BTminTraj': {'scale': 0.01, 'offset': 130.0, 'Units': 'K'},
-        'BaseAreaTraj': {'scale': 5000000.0, 'offset': 0, 'Units': 'm2'},
-        'TopAreaTraj': {'scale': 5000000.0, 'offset': 0, 'Units': 'm2'},
-        'CoolingRateTraj': {'scale': 2e-06, 'offset': -0.05, 'Units': 'K s-1'},
-        'ExpanRateTraj': {'scale': 2e-07, 'offset': -0.005, 'Units': 's-1'},
-        'SpeedTraj': {'scale': 0.001, 'offset': 0, 'Units': 'm s-1'},
-        'DirTraj': {'scale': 1, 'offset': 0, 'Units': 'degree'}
-    }
-
     try:
-        dict = rdtUnitsLUT.get(fn, {'scale': 1, 'offset': 0, 'units': '-'})
+        dict = RDT_UNITS_LUT.get(fn, {'scale': 1, 'offset': 0, 'units': '-'})
         scale, offset, units = dict.values()
         conv_data = ( data / scale ) + offset
         return(conv_data, units)
@@ -1169,9 +1398,9 @@ class Locator:
         return self.find(self.pattern)
 
     @staticmethod
-    @forest.util.timeout_cache(dt.timedelta(minutes=10))
     def find(pattern):
-        return sorted(glob.glob(pattern))
+        return forest.watch.WATCHER.catalogue(
+            pattern, max_age=dt.timedelta(minutes=10)).paths
 
     def dates(self, paths):
         return np.array([
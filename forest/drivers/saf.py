@@ -4,9 +4,17 @@ SAF Driver
 
 Loads data from NWCSAF satellite NetCDF files.
 
+Files of the same satellite and region share their geolocation, so the
+projected longitudes and latitudes and their extent are computed once
+per :class:`Geometry`. Each frame then reads a single variable from the
+one file that covers its time.
+
 .. autoclass:: Loader
     :members:
 
+.. autoclass:: Geometry
+    :members:
+
 .. autoclass:: Locator
     :members:
 
@@ -15,15 +23,18 @@ Loads data from NWCSAF satellite NetCDF files.
 
 """
 from functools import partial
+import bisect
 import datetime as dt
-import glob
 import re
 import os
-import xarray
+import threading
 import numpy as np
 from forest.drivers.gridded_forecast import empty_image, coordinates
+import forest.handles
 import forest.util
-from forest import geo, map_view
+import forest.watch
+from forest import geo, map_view, regrid
+from forest.cache import IMAGE_CACHE
 from functools import lru_cache
 
 
@@ -55,7 +66,6 @@ class Loader:
         self.locator = locator
         self.label = label
 
-    @lru_cache(maxsize=16)
     def image(self, state):
         '''Gets actual data.
 
@@ -70,26 +80,77 @@ class Loader:
                            state.pressure)
 
     def _image(self, long_name, initial_time, valid_time, pressures, pressure):
+        key = ("saf", self.label, self.locator.pattern, long_name,
+               None, valid_time, None, None)
+        data = dict(IMAGE_CACHE.load(key, self._load_image,
+                                     long_name, valid_time))
+        if len(data["image"]) > 0:
+            data.update(coordinates(valid_time, initial_time, pressures, pressure))
+        return data
+
+    def _load_image(self, long_name, valid_time):
+        """Load and stretch image shared by all sessions"""
         data = empty_image()
-        paths = self.locator.glob()
-        long_name_to_variable = self.locator.long_name_to_variable(paths)
+        if valid_time is None:
+            return data
         frequency = dt.timedelta(minutes=15)  # TODO: Support arbitrary frequencies
-        for path in self.locator.find_paths(paths, valid_time, frequency):
-            with xarray.open_dataset(path) as nc:
-                if long_name not in long_name_to_variable:
-                    continue
-                x = np.ma.masked_invalid(nc['lon'])[:]
-                y = np.ma.masked_invalid(nc['lat'])[:]
-                var = nc[long_name_to_variable[long_name]]
-                z = np.ma.masked_invalid(var)[:]
-                data = geo.stretch_image(x, y, z)
-                data.update(coordinates(valid_time, initial_time, pressures, pressure))
-                data['name'] = [str(var.long_name)]
-                if 'units' in var.attrs:
-                    data['units'] = [str(var.units)]
+        path = self.locator.find_file(forest.util.to_datetime(valid_time),
+                                      frequency)
+        if path is None:
+            return data
+        long_name_to_variable = self.locator._read_long_name_to_variable(path)
+        if long_name not in long_name_to_variable:
+            return data
+        with forest.handles.open_xarray(path) as nc:
+            var = nc[long_name_to_variable[long_name]]
+            z = np.ma.masked_invalid(var.values)
+            attrs = dict(var.attrs)
+        geometry = self.locator.geometry(path, z.shape)
+        data.update(geometry.stretch(z))
+        data['name'] = [str(attrs['long_name'])]
+        if 'units' in attrs:
+            data['units'] = [str(attrs['units'])]
         return data
 
 
+class Geometry:
+    """Projected geolocation shared by a grid
+
+    SAF grids are curvilinear, so images are stretched by
+    :class:`forest.regrid.Quadmesh`
+
+    :param lons: 2D longitudes, NaN outside the disk
+    :param lats: 2D latitudes, NaN outside the disk
+    """
+    def __init__(self, lons, lats):
+        self.lons = np.ma.masked_invalid(lons)
+        self.lats = np.ma.masked_invalid(lats)
+        gx, gy = geo.web_mercator(self.lons, self.lats)
+        self.gx = np.ma.masked_invalid(gx.reshape(self.lons.shape))
+        self.gy = np.ma.masked_invalid(gy.reshape(self.lats.shape))
+        self.x_range = (self.gx.min(), self.gx.max())
+        self.y_range = (self.gy.min(), self.gy.max())
+        if regrid.datashader is None:
+            self.regridder = None
+        else:
+            height, width = self.lons.shape
+            self.regridder = regrid.Quadmesh(self.gx, self.gy,
+                                             self.x_range, self.y_range,
+                                             width, height)
+
+    def stretch(self, values):
+        """Equivalent to :func:`forest.geo.stretch_image` on this grid"""
+        if self.regridder is None:
+            return geo.stretch_image(self.lons, self.lats, values)
+        return {
+            "x": [self.x_range[0]],
+            "y": [self.y_range[0]],
+            "dw": [self.x_range[1] - self.x_range[0]],
+            "dh": [self.y_range[1] - self.y_range[0]],
+            "image": [self.regridder(values)]
+        }
+
+
 class Locator:
     """Locate SAF files"""
     def __init__(self, pattern):
@@ -97,11 +158,86 @@ class Locator:
         regex = "[0-9]{8}T[0-9]{6}Z"
         fmt = "%Y%m%dT%H%M%S%Z"
         self.parse_date = partial(forest.util.parse_date, regex, fmt)
-        self._glob = forest.util.cached_glob(dt.timedelta(minutes=10))
+        self.catalogue = forest.watch.WATCHER.catalogue(
+            pattern, max_age=dt.timedelta(minutes=10))
+        self._index = []
+        self._geometries = {}
+        self._subscribed = False
+        self._lock = threading.RLock()
 
     def glob(self):
         """List file system"""
-        return self._glob(self.pattern)
+        return self.catalogue.paths
+
+    def sync(self):
+        """Follow catalogue on first use, then refresh"""
+        with self._lock:
+            if not self._subscribed:
+                self._subscribed = True
+                self.catalogue.follow(self.on_change)
+                return
+        self.catalogue.refresh()
+
+    def on_change(self, added, removed):
+        """Keep (date, path) pairs sorted, see :class:`forest.watch.Catalogue`"""
+        with self._lock:
+            for path in removed:
+                item = (self.parse_date(path), path)
+                if item[0] is None:
+                    continue
+                i = bisect.bisect_left(self._index, item)
+                if (i < len(self._index)) and (self._index[i] == item):
+                    del self._index[i]
+            for path in added:
+                item = (self.parse_date(path), path)
+                if item[0] is None:
+                    continue
+                i = bisect.bisect_left(self._index, item)
+                if (i == len(self._index)) or (self._index[i] != item):
+                    self._index.insert(i, item)
+
+    def find_file(self, date, frequency):
+        """Latest file covering [file date, file date + frequency)"""
+        self.sync()
+        with self._lock:
+            i = bisect.bisect_right(self._index, (date, chr(0x10ffff)))
+            if i == 0:
+                return None
+            file_date, path = self._index[i - 1]
+        if date < (file_date + frequency):
+            return path
+        return None
+
+    def geometry(self, path, shape=None):
+        """:class:`Geometry` shared by files of a satellite and region
+
+        :param shape: shape of the file's lon/lat grid, read from the
+                      file if not given
+        """
+        if shape is None:
+            with forest.handles.open_xarray(path) as nc:
+                shape = nc['lon'].shape
+        key = (self.geometry_name(path), shape)
+        with self._lock:
+            if key in self._geometries:
+                return self._geometries[key]
+        with forest.handles.open_xarray(path) as nc:
+            geometry = Geometry(nc['lon'].values, nc['lat'].values)
+        with self._lock:
+            return self._geometries.setdefault(key, geometry)
+
+    @staticmethod
+    def geometry_name(path):
+        """Satellite and region from file name, e.g. MSG4_GuineaCoast-VISIR
+
+        Files not following the NWCSAF naming convention get their own
+        geometry
+        """
+        match = re.match(r"S_NWC_[^_]+_([^_]+_[^_]+)_",
+                         os.path.basename(path))
+        if match is None:
+            return path
+        return match.group(1)
 
     def find_paths(self, paths, date, frequency):
         """Find a file(s) containing information related to date"""
@@ -127,10 +263,10 @@ class Locator:
         return mapping
 
     @staticmethod
-    @lru_cache(maxsize=1)
+    @lru_cache(maxsize=128)
     def _read_long_name_to_variable(path):
         mapping = {}
-        with xarray.open_dataset(path) as nc:
+        with forest.handles.open_xarray(path) as nc:
             for variable in nc.data_vars:
                 # Only display variables with lon/lat coords
                 if('lon' in nc.data_vars[variable].coords):
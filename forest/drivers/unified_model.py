@@ -1,6 +1,5 @@
-import xarray
-from functools import lru_cache
 import os
+import json
 import glob
 import re
 import fnmatch
@@ -8,16 +7,24 @@ import datetime as dt
 import numpy as np
 import netCDF4
 import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import forest.db
 import forest.db.health
+import forest.db.ingest
+import forest.handles
 import forest.util
+import forest.watch
 import forest.map_view
 import forest._profile
 from forest.bases import Reusable
+from forest.cache import IMAGE_CACHE
 from forest import (
     db,
     disk,
-    geo)
+    geo,
+    pyramid)
 from forest.exceptions import SearchFail, PressuresNotFound
 from forest.drivers import gridded_forecast
 import bokeh.models
@@ -28,6 +35,13 @@ except ImportError:
     pass
 
 
+# Locators are shared by sessions and prefetch threads
+_LOCATE_LOCK = threading.RLock()
+
+# Number of unread headers worth starting a process pool for
+PARALLEL_THRESHOLD = 8
+
+
 class NotFound(Exception):
     pass
 
@@ -39,11 +53,16 @@ class Sync:
         self.pattern = pattern
         self.directory = directory
 
-    def __call__(self):
+    def __call__(self, progress=None):
+        """Insert files matching pattern that are not in the database
+
+        :param progress: callable taking files processed and total files
+        :returns: number of files inserted
+        """
         print(f"sync: {self.database_path} {self.pattern} {self.directory}")
 
         # Find S3 objects
-        paths = glob.glob(self.full_path(self.pattern))
+        paths = self.catalogue.paths
         s3_names = [os.path.basename(path) for path in paths]
 
         # Find names in database
@@ -58,21 +77,33 @@ class Sync:
         extra_paths = [self.full_path(name) for name in extra_names]
 
         # Add NetCDF files to database
+        inserted = 0
         if len(extra_paths) > 0:
             print("connecting to: {}".format(self.database_path))
             with forest.db.Database.connect(self.database_path) as database:
                 health_db = forest.db.health.HealthDB(database.connection)
-                for path in extra_paths:
-                    print("inserting: '{}'".format(path))
-                    try:
-                        database.insert_netcdf(path)
-                    except OSError as e:
-                        # S3 Glacier objects inaccessible via goofys
-                        health_db.insert_error(path, e, dt.datetime.now())
-                        print(e)
-                        print(f"skip file: {path}")
-                        continue
+                database.insert_dataset(self.pattern)
+
+                def on_error(path, e):
+                    # Record unreadable files, e.g. S3 Glacier objects
+                    # inaccessible via goofys or malformed headers, so
+                    # that later syncs skip them
+                    health_db.insert_error(path, e, dt.datetime.now())
+                    print(e)
+                    print(f"skip file: {path}")
+
+                print("inserting: {} files".format(len(extra_paths)))
+                inserted = forest.db.ingest.ingest(database, extra_paths,
+                                                   on_error=on_error,
+                                                   on_progress=progress)
             print("finished")
+        return inserted
+
+    @property
+    def catalogue(self):
+        """Watched paths matching pattern, see :mod:`forest.watch`"""
+        return forest.watch.WATCHER.catalogue(
+            self.full_path(self.pattern), max_age=dt.timedelta(0))
 
     def full_path(self, name):
         """Prepend directory if available"""
@@ -101,13 +132,24 @@ class Dataset:
             self.locator = db.Locator(self.database.connection,
                                       directory=directory)
         else:
-            self.locator = Locator.pattern(self.pattern)
+            if database_path is None:
+                database_path = ":memory:"
+            self.locator = Locator.pattern(
+                self.pattern,
+                index=CoordinateIndex(database_path))
+
+    def refresh(self):
+        """Forget cached searches once new files have been synchronised"""
+        if self.use_database:
+            self.database.datasets = db.registered_datasets(
+                self.database.cursor)
+            self.locator.refresh()
 
     def navigator(self):
         if self.use_database:
             return self.database
         else:
-            return Navigator(self.pattern)
+            return Navigator(self.pattern, index=self.locator.index)
 
     def map_view(self, color_mapper=None):
         loader = Loader(self.label, self.pattern, self.locator)
@@ -195,38 +237,71 @@ class SeriesView(Reusable):
 
 
 class Navigator:
-    def __init__(self, pattern):
+    """Answer navigation queries from NetCDF headers
+
+    Headers are read once per file into a :class:`CoordinateIndex`,
+    shared with the Locator of the same dataset, and re-read only if a
+    file changes on disk
+
+    :param pattern: glob pattern of files
+    :param index: optional :class:`CoordinateIndex`
+    :param max_workers: processes used to read new headers
+    """
+    def __init__(self, pattern, index=None, max_workers=None):
+        if index is None:
+            index = CoordinateIndex()
         self.pattern = pattern
-        self._locators = {
-            "initial": read_initial_time,
-            "valid": read_valid_times,
-            "pressure": PressuresLocator(),
-        }
+        self.index = index
+        self.max_workers = max_workers
 
     def variables(self, pattern):
-        cubes = iris.load(pattern)
-        return [cube.name() for cube in cubes]
+        names = set()
+        for entry in self._entries(pattern).values():
+            names.update(entry["names"].values())
+        return list(sorted(names))
 
     def initial_times(self, pattern, variable):
-        locator = self._locators["initial"]
-        return list(sorted(set(locator(path)
-                               for path in glob.glob(pattern))))
+        return list(sorted(set(
+            entry["initial_time"]
+            for entry in self._entries(pattern).values()
+            if entry["initial_time"] is not None)))
 
     def valid_times(self, pattern, variable, initial_time):
-        return self._dimension("valid", pattern, variable, initial_time)
+        return self._dimension("time", pattern, variable, initial_time)
 
     def pressures(self, pattern, variable, initial_time):
         return self._dimension("pressure", pattern, variable, initial_time)
 
-    def _dimension(self, keyword, pattern, variable, initial_time):
+    def _dimension(self, coord, pattern, variable, initial_time):
+        if initial_time is not None:
+            initial_time = forest.util.to_datetime(initial_time)
         arrays = []
-        locator = self._locators[keyword]
-        for path in glob.glob(self.pattern):
-            arrays.append(locator(path, variable))
+        for entry in self._entries(self.pattern).values():
+            if ((initial_time is not None) and
+                    (entry["initial_time"] is not None) and
+                    (entry["initial_time"] != initial_time)):
+                continue
+            for name in self._var_names(entry, variable):
+                axes = entry["variables"][name]
+                if coord in axes:
+                    _, coord_var = axes[coord]
+                    arrays.append(entry["coordinates"][coord_var])
         if len(arrays) == 0:
             return []
         return np.unique(np.concatenate(arrays))
 
+    @staticmethod
+    def _var_names(entry, variable):
+        """NetCDF variables matching a variable or cube name"""
+        if variable in entry["variables"]:
+            return [variable]
+        return [name for name, cube_name in entry["names"].items()
+                if cube_name == variable]
+
+    def _entries(self, pattern):
+        paths = sorted(glob.glob(os.path.expanduser(pattern)))
+        return self.index.entries(paths, max_workers=self.max_workers)
+
 
 class Loader:
     """Unified model formatted loader"""
@@ -238,12 +313,17 @@ class Loader:
     def image(self, state):
         if not self.valid(state):
             return gridded_forecast.empty_image()
-        data = self._input_output(
-            self.pattern,
-            state.variable,
-            state.initial_time,
-            state.valid_time,
-            state.pressure)
+        viewport = geo.snap_viewport(getattr(state, "viewport", None))
+        key = ("unified_model", self.name, self.pattern, state.variable,
+               state.initial_time, state.valid_time, state.pressure, viewport)
+        data = dict(IMAGE_CACHE.load(key,
+                                     self._input_output,
+                                     self.pattern,
+                                     state.variable,
+                                     state.initial_time,
+                                     state.valid_time,
+                                     state.pressure,
+                                     viewport=viewport))
         data.update(gridded_forecast.coordinates(state.valid_time,
                                                  state.initial_time,
                                                  state.pressures,
@@ -272,7 +352,7 @@ class Loader:
                 "y": []
             }
 
-        with xarray.open_dataset(path, engine="h5netcdf") as nc:
+        with forest.handles.open_xarray(path, engine="h5netcdf") as nc:
             data_array = nc[variable]
             print(data_array.shape)
             lons = np.ma.masked_invalid(data_array.longitude)
@@ -293,21 +373,21 @@ class Loader:
             "y": y,
         }
 
-    @lru_cache(maxsize=100)
     def _input_output(self, pattern, variable, initial_time, valid_time,
-                      pressure):
+                      pressure, viewport=None):
         """I/O needed to load an image and its metadata"""
         try:
-            path, pts = self.locator.locate(
-                pattern,
-                variable,
-                initial_time,
-                valid_time,
-                pressure)
+            with _LOCATE_LOCK:
+                path, pts = self.locator.locate(
+                    pattern,
+                    variable,
+                    initial_time,
+                    valid_time,
+                    pressure)
         except SearchFail:
             return gridded_forecast.empty_image()
 
-        data = self.load_image(path, variable, pts)
+        data = self.load_image(path, variable, pts, viewport=viewport)
         data["name"] = [self.name]
         return data
 
@@ -333,12 +413,24 @@ class Loader:
         return any(np.abs(pressures - pressure) < tolerance)
 
     @classmethod
-    def load_image(cls, path, variable, pts):
-        """Load bokeh image glyph data from file using slices"""
+    def load_image(cls, path, variable, pts, viewport=None):
+        """Load bokeh image glyph data from file using slices
+
+        :param viewport: optional tuple from :func:`forest.geo.snap_viewport`
+                         used to read only the visible part of the field
+        """
         try:
-            lons, lats, values, units = cls._load_xarray(path, variable, pts)
+            lons, lats, values, units = cls._load_xarray(path, variable, pts,
+                                                         viewport=viewport)
         except:
             lons, lats, values, units = cls._load_cube(path, variable, pts)
+            windowed = False
+        else:
+            windowed = (viewport is not None) and (lons.ndim == 1)
+
+        if values.size == 0:
+            # Field outside viewport
+            return gridded_forecast.empty_image()
 
         # Units
         if variable in ["precipitation_flux", "stratiform_rainfall_rate"]:
@@ -351,14 +443,11 @@ class Loader:
             values = forest.util.convert_units(values, "K", "Celsius")
             units = "C"
 
-        # Coarsify images
-        threshold = 200 * 200  # Chosen since TMA WRF is 199 x 199
-        if values.size > threshold:
-            fraction = 0.25
-        else:
-            fraction = 1.
-        lons, lats, values = forest.util.coarsify(
-            lons, lats, values, fraction)
+        # Overview level matching screen resolution (windowed reads
+        # are already strided)
+        if not windowed:
+            lons, lats, values = pyramid.overview(
+                lons, lats, values, *pyramid.plot_size(lons, lats, viewport))
 
         # Roll input data into [-180, 180] range
         if np.any(lons > 180.0):
@@ -372,15 +461,30 @@ class Loader:
         return data
 
     @staticmethod
-    def _load_xarray(path, variable, pts):
-        with xarray.open_dataset(path, engine="h5netcdf") as nc:
+    def _load_xarray(path, variable, pts, viewport=None):
+        with forest.handles.open_xarray(path, engine="h5netcdf") as nc:
             data_array = nc[variable][pts]
+            if viewport is not None:
+                data_array = data_array.isel(
+                    Loader._window(data_array, viewport))
             lons = np.ma.masked_invalid(data_array.longitude)
             lats = np.ma.masked_invalid(data_array.latitude)
             values = np.ma.masked_invalid(data_array)
             units = getattr(data_array, 'units', '')
         return lons, lats, values, units
 
+    @staticmethod
+    def _window(data_array, viewport):
+        """Indexers selecting the part of a field inside a viewport"""
+        lons = data_array.longitude
+        lats = data_array.latitude
+        if (lons.ndim != 1) or (lats.ndim != 1):
+            return {}
+        lat_slice, lon_slice = geo.viewport_slices(lons.values,
+                                                   lats.values,
+                                                   viewport)
+        return {lats.dims[0]: lat_slice, lons.dims[0]: lon_slice}
+
     @staticmethod
     def _load_cube(path, variable, pts):
         # TODO: Is this method still needed?
@@ -396,8 +500,236 @@ class Loader:
         return lons, lats, values, str(units)  # Needed for tutorial data
 
 
+class CoordinateIndex:
+    """Time/pressure axes of NetCDF files read once and kept in memory
+
+    Each entry records the initial time of a file, the position of the
+    time and pressure axes for every variable and the values of the
+    related coordinate variables. Entries are keyed by path and
+    invalidated by changes to the file's modification time or size.
+
+    .. note:: A location on disk may be given to persist the index
+              between server restarts, by default it is kept in memory
+    """
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.cursor = self.connection.cursor()
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS coordinate_index (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL,
+                    size INTEGER,
+                    entry TEXT)
+        """)
+        self.connection.commit()
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def entry(self, path):
+        """Coordinate information related to a file
+
+        :returns: dict with keys "initial_time", "variables" and "coordinates"
+        """
+        with self._lock:
+            return self._entry(path)
+
+    def entries(self, paths, max_workers=None):
+        """Coordinate information related to many files
+
+        Headers not already in the index are read in a process pool
+
+        :param max_workers: size of process pool, 0 reads files in
+                            this process
+        :returns: dict mapping path to entry, unreadable files are
+                  left out
+        """
+        result = {}
+        missing = []
+        with self._lock:
+            for path in paths:
+                try:
+                    result[path] = self._cached(path)
+                except OSError:
+                    continue
+                if result[path] is None:
+                    missing.append(path)
+        if (max_workers == 0) or (len(missing) < PARALLEL_THRESHOLD):
+            read = map(_read_quietly, missing)
+            for path, entry in zip(missing, read):
+                result[path] = entry
+        else:
+            # Spawned processes are safe in a multi-threaded server
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     mp_context=context) as executor:
+                read = executor.map(_read_quietly, missing)
+                for path, entry in zip(missing, read):
+                    result[path] = entry
+        with self._lock:
+            for path in missing:
+                if result[path] is None:
+                    continue
+                try:
+                    signature = self._signature(path)
+                except OSError:
+                    continue
+                self._store(path, signature, result[path])
+                self._entries[path] = (signature, result[path])
+        return {path: entry for path, entry in result.items()
+                if entry is not None}
+
+    def _cached(self, path):
+        """Entry from memory or database or None"""
+        signature = self._signature(path)
+        if path in self._entries:
+            cached_signature, entry = self._entries[path]
+            if cached_signature == signature:
+                return entry
+        entry = self._fetch(path, signature)
+        if entry is not None:
+            self._entries[path] = (signature, entry)
+        return entry
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return (stat.st_mtime, stat.st_size)
+
+    def _entry(self, path):
+        entry = self._cached(path)
+        if entry is None:
+            signature = self._signature(path)
+            entry = read_coordinates(path)
+            self._store(path, signature, entry)
+            self._entries[path] = (signature, entry)
+        return entry
+
+    def _fetch(self, path, signature):
+        self.cursor.execute("""
+            SELECT entry
+              FROM coordinate_index
+             WHERE path = :path
+               AND mtime = :mtime
+               AND size = :size
+        """, dict(path=path, mtime=signature[0], size=signature[1]))
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        if "names" not in data:
+            return None  # Written by an earlier version
+        return self._decode(data)
+
+    def _store(self, path, signature, entry):
+        self.cursor.execute("""
+            INSERT OR REPLACE
+              INTO coordinate_index (path, mtime, size, entry)
+            VALUES (:path, :mtime, :size, :entry)
+        """, dict(path=path,
+                  mtime=signature[0],
+                  size=signature[1],
+                  entry=json.dumps(self._encode(entry))))
+        self.connection.commit()
+
+    @staticmethod
+    def _encode(entry):
+        initial_time = entry["initial_time"]
+        if initial_time is not None:
+            initial_time = initial_time.isoformat()
+        coordinates = {}
+        for name, values in entry["coordinates"].items():
+            if values.dtype.kind == "M":
+                coordinates[name] = ["time", [str(v) for v in values]]
+            else:
+                coordinates[name] = ["pressure", values.tolist()]
+        return {
+            "initial_time": initial_time,
+            "variables": entry["variables"],
+            "names": entry["names"],
+            "coordinates": coordinates
+        }
+
+    @staticmethod
+    def _decode(data):
+        initial_time = data["initial_time"]
+        if initial_time is not None:
+            initial_time = dt.datetime.fromisoformat(initial_time)
+        coordinates = {}
+        for name, (kind, values) in data["coordinates"].items():
+            if kind == "time":
+                coordinates[name] = np.array(values, dtype="datetime64[s]")
+            else:
+                coordinates[name] = np.array(values, dtype="d")
+        variables = {
+            variable: {coord: tuple(value) for coord, value in axes.items()}
+            for variable, axes in data["variables"].items()}
+        return {
+            "initial_time": initial_time,
+            "variables": variables,
+            "names": data["names"],
+            "coordinates": coordinates
+        }
+
+
+def _read_quietly(path):
+    try:
+        return read_coordinates(path)
+    except (OSError, KeyError, ValueError, AttributeError):
+        return None
+
+
+def read_coordinates(path):
+    """Read initial time and time/pressure axes from NetCDF header(s)
+
+    Names of data variables are recorded as reported by
+    :meth:`iris.cube.Cube.name`, i.e. standard, long or variable name
+    """
+    variables = {}
+    coordinates = {}
+    with netCDF4.Dataset(path) as dataset:
+        names = disk.cube_names(dataset)
+        try:
+            var = dataset.variables["forecast_reference_time"]
+            values = netCDF4.num2date(var[:], units=var.units)
+            initial_time = forest.util.to_datetime(np.ravel(values)[0])
+        except KeyError:
+            initial_time = None
+        for variable, var in dataset.variables.items():
+            dims = var.dimensions
+            coords = getattr(var, "coordinates", "")
+            axes = {}
+            for coord in ("time", "pressure"):
+                if not disk.has_coord(coord, dims, coords):
+                    continue
+                coord_var = disk.coord_var(coord, dims, coords)
+                if coord_var not in dataset.variables:
+                    continue
+                axes[coord] = (disk.axis(coord, dims, coords), coord_var)
+                if coord_var in coordinates:
+                    continue
+                obj = dataset.variables[coord_var]
+                if coord == "time":
+                    values = np.array(
+                        netCDF4.num2date(obj[:], units=obj.units),
+                        dtype="datetime64[s]")
+                else:
+                    values = np.array(obj[:], dtype="d")
+                coordinates[coord_var] = np.atleast_1d(values)
+            variables[variable] = axes
+    return {
+        "initial_time": initial_time,
+        "variables": variables,
+        "names": names,
+        "coordinates": coordinates
+    }
+
+
 class Locator(object):
-    def __init__(self, paths):
+    def __init__(self, paths, index=None):
+        if index is None:
+            index = CoordinateIndex()
+        self.index = index
         self.paths = paths
         self.spare = []
         self.catalogue = {}
@@ -413,8 +745,8 @@ class Locator(object):
                 self.catalogue[key].append(path)
 
     @classmethod
-    def pattern(cls, text):
-        return cls(sorted(glob.glob(os.path.expanduser(text))))
+    def pattern(cls, text, index=None):
+        return cls(sorted(glob.glob(os.path.expanduser(text))), index=index)
 
     def locate(
             self,
@@ -427,36 +759,26 @@ class Locator(object):
         paths = self.find_paths(initial_time) + self.spare
         paths = fnmatch.filter(paths, pattern)
         for path in paths:
-            with netCDF4.Dataset(path) as dataset:
-                if variable not in dataset.variables:
-                    continue
+            entry = self.index.entry(path)
+            if variable not in entry["variables"]:
+                continue
 
-                var = dataset.variables[variable]
-                dims = var.dimensions
-                coords = getattr(var, "coordinates", "")
-
-                masks = {}
-                for coord, value in [
-                        ("time", valid_time),
-                        ("pressure", pressure)]:
-                    if not disk.has_coord(coord, dims, coords):
-                        continue
-                    if value is None:
-                        # Coordinate present but value not specified
-                        raise SearchFail("Please specify: '{}'".format(coord))
-                        continue
-                    axis = disk.axis(coord, dims, coords)
-                    coord_var = disk.coord_var(coord, dims, coords)
-                    if coord == "time":
-                        obj = dataset.variables[coord_var]
-                        values = netCDF4.num2date(obj[:], units=obj.units)
-                    else:
-                        values = dataset.variables[coord_var][:]
-                    mask = disk.coord_mask(coord, values, value)
-                    if axis not in masks:
-                        masks[axis] = mask
-                    else:
-                        masks[axis] = masks[axis] & mask
+            masks = {}
+            for coord, value in [
+                    ("time", valid_time),
+                    ("pressure", pressure)]:
+                if coord not in entry["variables"][variable]:
+                    continue
+                if value is None:
+                    # Coordinate present but value not specified
+                    raise SearchFail("Please specify: '{}'".format(coord))
+                axis, coord_var = entry["variables"][variable][coord]
+                values = entry["coordinates"][coord_var]
+                mask = disk.coord_mask(coord, values, value)
+                if axis not in masks:
+                    masks[axis] = mask
+                else:
+                    masks[axis] = masks[axis] & mask
 
             # Determine if search was successful
             found = all(mask.any() for mask in masks.values())
@@ -464,12 +786,10 @@ class Locator(object):
                 continue
 
             # Generate multi-dimensional slice from search result
-            slices = []
-            for i in range(max(masks.keys()) + 1):
-                pts = np.where(masks[i])[0][0]
-                slices.append(pts)
-            pts = tuple(slices)
-            return path, pts
+            if len(masks) == 0:
+                return path, ()
+            rank = max(masks.keys()) + 1
+            return path, disk.axes_pts([masks[i] for i in range(rank)])
 
         # Search failure message
         msg = " ".join([str(value) for value in
@@ -503,13 +823,7 @@ class Locator(object):
             return dt.datetime.strptime(groups[0], "%Y%m%dT%H%MZ")
 
     def initial_time_netcdf4(self, path):
-        with netCDF4.Dataset(path) as dataset:
-            try:
-                var = dataset.variables["forecast_reference_time"]
-                result = netCDF4.num2date(var[:], units=var.units)
-            except KeyError:
-                result = None
-        return result
+        return self.index.entry(path)["initial_time"]
 
 
 def read_initial_time(path):
@@ -28,6 +28,12 @@ try:
 except ModuleNotFoundError:
     datashader = None
 
+from forest import regrid
+
+# Width of WebMercator projection in metres
+WORLD_WIDTH = 2 * 20037508.342789244
+
+
 def stretch_image(lons, lats, values,
                   plot_height=None,
                   plot_width=None):
@@ -99,33 +105,18 @@ def datashader_stretch(values, gx, gy, x_range, y_range,
     :param gy: The array of coordinates in projection space.
     :param x_range: The range of the mesh in projection space.
     :param y_range: The range of the mesh in projection space.
-    :return: An xarray of image data representing pixels.
+    :return: A masked array of image data representing pixels.
+
+    .. note:: The quadmesh mapping from grid to canvas is computed once
+              and re-used for every field on the same grid, see
+              :mod:`forest.regrid`
     """
     if plot_height is None:
         plot_height = values.shape[0]
     if plot_width is None:
         plot_width = values.shape[1]
-    canvas = datashader.Canvas(plot_height=plot_height,
-                               plot_width=plot_width,
-                               x_range=x_range,
-                               y_range=y_range)
-    if gx.ndim == 1:
-        # 1D Quadmesh
-        xarr = xarray.DataArray(values, coords=[('y', gy), ('x', gx)], name='Z')
-        image = canvas.quadmesh(xarr)
-    else:
-        # 2D Quadmesh
-        xarr = xarray.DataArray(values,
-                                dims=['Y', 'X'],
-                                coords={
-                                    'Qx': (['Y', 'X'], gx),
-                                    'Qy': (['Y', 'X'], gy)
-                                },
-                                name='Z')
-        image = canvas.quadmesh(xarr, x='Qx', y='Qy')
-    return np.ma.masked_array(image.values,
-                          mask=np.isnan(
-                              image.values))
+    return regrid.regridder(gx, gy, x_range, y_range,
+                            plot_width, plot_height)(values)
 
 def custom_stretch(values, gx, gy):
     if np.ma.is_masked(values):
@@ -179,6 +170,101 @@ def stretch_y(uneven_y):
     return wrapped
 
 
+def snap_viewport(viewport):
+    """Round a viewport outwards to tiles and its pixels to powers of two
+
+    Nearby viewports snap to the same extent and resolution so that
+    images loaded for one can be re-used by the others. The snapped
+    extent is at most twice the size of the original extent
+
+    :param viewport: dict with keys x_start, x_end, y_start, y_end,
+                     width and height or None
+    :returns: tuple (x_start, x_end, y_start, y_end, width, height) or None
+    """
+    if viewport is None:
+        return None
+    keys = ("x_start", "x_end", "y_start", "y_end", "width", "height")
+    if any(viewport.get(key) is None for key in keys):
+        return None
+    x_start, x_end, y_start, y_end, width, height = [
+        viewport[key] for key in keys]
+    if (width <= 0) or (height <= 0):
+        return None
+    if (x_end <= x_start) or (y_end <= y_start):
+        return None
+    span = max(x_end - x_start, y_end - y_start)
+    tile = WORLD_WIDTH / 2 ** (np.floor(np.log2(WORLD_WIDTH / span)) + 2)
+    pixel = min((x_end - x_start) / width, (y_end - y_start) / height)
+    pixel = WORLD_WIDTH / 2 ** np.ceil(np.log2(WORLD_WIDTH / pixel))
+    x_start = np.floor(x_start / tile) * tile
+    x_end = np.ceil(x_end / tile) * tile
+    y_start = np.floor(y_start / tile) * tile
+    y_end = np.ceil(y_end / tile) * tile
+    return (float(x_start),
+            float(x_end),
+            float(y_start),
+            float(y_end),
+            int(round((x_end - x_start) / pixel)),
+            int(round((y_end - y_start) / pixel)))
+
+
+def viewport_slices(lons, lats, viewport):
+    """Index slices of 1D longitude/latitude axes inside a viewport
+
+    The stride of each slice is chosen so that roughly one grid point
+    is read per screen pixel
+
+    :param lons: 1D array of longitudes in either [-180, 180] or [0, 360]
+    :param lats: 1D array of latitudes
+    :param viewport: tuple returned by :func:`snap_viewport`
+    :returns: (latitude slice, longitude slice)
+    """
+    if viewport is None:
+        return slice(None), slice(None)
+    x_start, x_end, y_start, y_end, width, height = viewport
+    (lon_start, lon_end), (lat_start, lat_end) = plate_carree(
+        [x_start, x_end], [y_start, y_end])
+    lons = np.asarray(lons)
+    if (lon_end - lon_start) >= 360.:
+        lon_start, lon_end = -np.inf, np.inf
+    elif np.max(lons) > 180.:
+        # Map viewport onto [0, 360] longitudes
+        lon_start, lon_end = lon_start % 360., lon_end % 360.
+        if lon_start > lon_end:
+            # Viewport crosses the Greenwich meridian
+            lon_start, lon_end = -np.inf, np.inf
+    return (axis_slice(lats, lat_start, lat_end, height),
+            axis_slice(lons, lon_start, lon_end, width))
+
+
+def axis_slice(values, start, end, pixels):
+    """Slice of a monotonic axis covering [start, end] in pixels steps
+
+    >>> axis_slice([0, 1, 2, 3, 4, 5, 6, 7, 8], 2.5, 5.5, 2)
+    slice(2, 7, 2)
+
+    """
+    values = np.asarray(values)
+    n = len(values)
+    if n < 2:
+        return slice(None)
+    if values[0] > values[-1]:
+        # Descending axis
+        reverse = axis_slice(values[::-1], start, end, pixels)
+        i, j, step = reverse.indices(n)
+        return slice(n - j, n - i, step)
+    if (end < values[0]) or (start > values[-1]):
+        return slice(0, 0)
+    i = max(np.searchsorted(values, start, side="right") - 1, 0)
+    j = min(np.searchsorted(values, end, side="left") + 1, n)
+    if (j - i) < 2:
+        # Keep at least two points to define grid spacing
+        i, j = max(min(i, n - 2), 0), max(min(i, n - 2), 0) + 2
+    step = max(int(2 ** np.floor(np.log2(max((j - i) / pixels, 1)))), 1)
+    i = (i // step) * step  # Align strided windows
+    return slice(int(i), int(j), step)
+
+
 def to_180(x):
     y = x.copy()
     y[y > 180.] -= 360.
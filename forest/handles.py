@@ -0,0 +1,190 @@
+"""
+Open file handles
+-----------------
+
+Loaders read a single frame at a time from files that often contain a
+whole day of data. Opening such a file parses its HDF5 meta-data and
+coordinates again for every frame. A :class:`HandlePool` keeps recently
+used files open so that consecutive frames reuse the same handle.
+
+Handles are keyed by path and opener and are re-opened if the file's
+modification time, size or inode changes. Access to each handle is
+serialised with a lock, since HDF5 based readers are not safe to share
+between threads, see :mod:`forest.prefetch` and
+:class:`forest.map_view.RenderPool`
+
+.. autoclass:: HandlePool
+   :members:
+
+.. autofunction:: open_xarray
+
+.. autofunction:: open_netcdf
+
+.. autodata:: POOL
+
+"""
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import netCDF4
+import xarray
+
+
+#: Maximum number of files kept open
+DEFAULT_MAX_HANDLES = 32
+
+
+class _Entry:
+    def __init__(self, signature):
+        self.signature = signature
+        self.handle = None
+        self.users = 0
+        self.evicted = False
+        self.lock = threading.RLock()
+
+    def close(self):
+        with self.lock:
+            if self.handle is not None:
+                try:
+                    self.handle.close()
+                except Exception:
+                    pass
+                self.handle = None
+
+
+class HandlePool:
+    """Least recently used pool of open files
+
+    :param max_handles: number of files kept open
+    """
+    def __init__(self, max_handles=DEFAULT_MAX_HANDLES):
+        self.max_handles = max_handles
+        self.opens = 0
+        self.reuses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @contextmanager
+    def open(self, path, opener, **kwargs):
+        """Borrow an open handle, opening the file if necessary
+
+        The handle must not be closed or used outside the with block
+
+        :param path: file to open
+        :param opener: callable e.g. ``xarray.open_dataset``
+        :param kwargs: keyword arguments passed to opener
+        """
+        if self.max_handles <= 0:
+            with opener(path, **kwargs) as handle:
+                yield handle
+            return
+        key = (os.path.abspath(path), opener, tuple(sorted(kwargs.items())))
+        entry = self._acquire(key, _signature(path))
+        try:
+            with entry.lock:
+                if entry.handle is None:
+                    try:
+                        entry.handle = opener(path, **kwargs)
+                    except Exception:
+                        self._discard(key, entry)
+                        raise
+                    with self._lock:
+                        self.opens += 1
+                yield entry.handle
+        finally:
+            self._release(entry)
+
+    def _acquire(self, key, signature):
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is not None) and (entry.signature != signature):
+                # File changed on disk
+                self.invalidations += 1
+                self._remove(key)
+                entry = None
+            if entry is None:
+                entry = _Entry(signature)
+                self._entries[key] = entry
+                self._evict()
+            else:
+                self._entries.move_to_end(key)
+                self.reuses += 1
+            entry.users += 1
+            return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            close = entry.evicted and (entry.users == 0)
+        if close:
+            entry.close()
+
+    def _discard(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        entry.evicted = True
+        if entry.users == 0:
+            entry.close()
+
+    def _evict(self):
+        while len(self._entries) > max(self.max_handles, 0):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def resize(self, max_handles):
+        """Change number of files kept open, 0 disables pooling"""
+        with self._lock:
+            self.max_handles = max_handles
+            self._evict()
+
+    def clear(self):
+        """Close all idle handles and reset counters"""
+        with self._lock:
+            for key in list(self._entries.keys()):
+                self._remove(key)
+            self.opens = 0
+            self.reuses = 0
+            self.invalidations = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Summary of pool usage"""
+        with self._lock:
+            return {
+                "opens": self.opens,
+                "reuses": self.reuses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "handles": len(self._entries),
+                "max_handles": self.max_handles
+            }
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def open_xarray(path, **kwargs):
+    """Borrow a pooled :func:`xarray.open_dataset` handle"""
+    return POOL.open(path, xarray.open_dataset, **kwargs)
+
+
+def open_netcdf(path):
+    """Borrow a pooled :class:`netCDF4.Dataset` handle"""
+    return POOL.open(path, netCDF4.Dataset)
+
+
+#: Process-wide pool shared by all loaders
+POOL = HandlePool()
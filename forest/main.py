@@ -24,6 +24,11 @@ from forest import (
         navigate,
         parse_args)
 import forest.app
+import forest.cache
+import forest.handles
+import forest.prefetch
+import forest.watch
+import forest.map_view
 import forest.actions
 from forest.barc.toolbar import BARC
 from forest.barc.labbook import BARCLab
@@ -80,6 +85,13 @@ def main(argv=None):
         features = config.features
     data.FEATURE_FLAGS = features
 
+    # Memory budget of images shared between sessions
+    forest.cache.IMAGE_CACHE.resize(config.image_cache_megabytes)
+    forest.handles.POOL.resize(config.max_open_files)
+    forest.prefetch.PREFETCHER.configure(**config.prefetch)
+    forest.map_view.RENDER_POOL.configure(config.render_workers)
+    forest.watch.WATCHER.configure(**config.watch)
+
     # Full screen map
     viewport = config.default_viewport
     x_range, y_range = geo.web_mercator(
@@ -259,6 +271,11 @@ def main(argv=None):
     tap_listener = screen.TapListener()
     tap_listener.connect(store)
 
+    # Connect viewport listener (figures share x/y ranges)
+    viewport_listener = screen.ViewportListener()
+    viewport_listener.connect(store)
+    viewport_listener.add_figure(figures[0])
+
     # Connect figure controls/views
     if config.defaults.figures.ui:
         figure_ui = layers.FigureUI(config.defaults.figures.maximum)
@@ -1,13 +1,55 @@
 from abc import ABC, abstractmethod
 import datetime as dt
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import numpy as np
 import bokeh.models
+import bokeh.plotting
 import forest.data
 from forest import geo, colors
 from forest.old_state import old_state, unique
+from forest.prefetch import PREFETCHER
 from forest.exceptions import FileNotFound, IndexNotFound
 
 
+class RenderPool:
+    """Threads used to load images off the bokeh event loop
+
+    :param max_workers: number of threads, 0 loads images on the
+                        calling thread
+    """
+    def __init__(self, max_workers=0):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_workers > 0
+
+    def configure(self, max_workers):
+        """Change number of threads, 0 disables asynchronous loading"""
+        with self._lock:
+            if (self._executor is not None) and (
+                    max_workers != self.max_workers):
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self.max_workers = max_workers
+
+    def submit(self, method, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="forest-render")
+            return self._executor.submit(method, *args)
+
+
+#: Process-wide pool shared by all image views
+RENDER_POOL = RenderPool()
+
+
 def map_view(loader, color_mapper, use_hover_tool=True, tooltips=None):
     """Convenient method to simplify MapView construction"""
     if forest.data.FEATURE_FLAGS["multiple_colorbars"]:
@@ -82,6 +124,11 @@ class ImageView(AbstractMapView):
                 "image": []})
         self.image_sources = [self.source]
 
+        # Count renders so that late results never replace newer frames
+        self.generation = 0
+        self._future = None
+        self._data = None  # Last data applied to source
+
         self.tooltips = [
             ("Name", "@name"),
             ("Value", "@image @units"),
@@ -98,7 +145,57 @@ class ImageView(AbstractMapView):
     @old_state
     @unique
     def render(self, state):
-        self.source.data = self.loader.image(state)
+        self.generation += 1
+        if not RENDER_POOL.enabled:
+            self._apply(self.generation, state, *self._load(state))
+            return
+
+        # Load image in a thread, apply result on the document's event loop
+        if self._future is not None:
+            self._future.cancel()  # Superseded before it started
+        document = bokeh.plotting.curdoc()
+        callback = partial(self._on_loaded, document, self.generation, state)
+        self._future = RENDER_POOL.submit(self._load, state)
+        self._future.add_done_callback(callback)
+
+    def _on_loaded(self, document, generation, state, future):
+        if future.cancelled() or (generation != self.generation):
+            return
+        document.add_next_tick_callback(
+            partial(self._apply_future, generation, state, future))
+
+    def _apply_future(self, generation, state, future):
+        self._apply(generation, state, *future.result())
+
+    def _load(self, state):
+        """Load image and compare it to the last applied data
+
+        Runs on a render thread. Only the latest generation is applied,
+        so the last applied data can not change before this result is
+        """
+        data = self.loader.image(state)
+        return data, self._same_data(self._data, data)
+
+    def _apply(self, generation, state, data, same):
+        if generation != self.generation:
+            return  # Out-of-order completion of an older request
+        PREFETCHER.schedule(self, self.loader.image, state)
+        if same:
+            # Avoid re-sending shared images to the browser
+            return
+        self._data = data
+        self.source.data = data
+
+    @staticmethod
+    def _same_data(old, new):
+        """Check values of two image dicts
+
+        Arrays are compared by identity, cached images are shared
+        between results so equal images are the same objects
+        """
+        if (old is None) or (set(old.keys()) != set(new.keys())):
+            return False
+        return all(_same_value(old[key], new[key]) for key in new)
 
     def set_hover_properties(self, tooltips, formatters):
         self.tooltips = tooltips
@@ -120,3 +217,17 @@ class ImageView(AbstractMapView):
                     formatters=self.formatters)
             figure.add_tools(tool)
         return renderer
+
+
+def _same_value(old, new):
+    if old is new:
+        return True
+    if isinstance(old, np.ndarray) or isinstance(new, np.ndarray):
+        return False
+    if isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+        return (len(old) == len(new)) and all(
+            _same_value(a, b) for a, b in zip(old, new))
+    try:
+        return bool(old == new)
+    except Exception:
+        return False
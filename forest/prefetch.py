@@ -0,0 +1,197 @@
+"""
+Prefetch
+--------
+
+Stepping forwards or backwards through a forecast loads each frame on
+the bokeh event loop. To hide that latency, views ask a
+:class:`Prefetcher` to load neighbouring valid times and pressure levels
+in background threads after each render. Loaders store their results
+in the shared :data:`forest.cache.IMAGE_CACHE`, so that the next
+key press finds its image ready.
+
+Prefetching is off until :meth:`Prefetcher.configure` is called, see
+``prefetch`` in :class:`forest.config.Config`
+
+.. autoclass:: Prefetcher
+   :members:
+
+.. autofunction:: neighbours
+
+.. autodata:: PREFETCHER
+
+"""
+import bisect
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from forest.db.control import _index, NotFound
+
+
+#: Number of valid times either side of the current time to prefetch
+DEFAULT_DEPTH = 2
+
+#: Number of threads used to prefetch
+DEFAULT_MAX_WORKERS = 2
+
+
+class Prefetcher:
+    """Bounded thread pool that warms caches with neighbouring frames
+
+    :param depth: valid times either side of current time to load,
+                  0 disables prefetching
+    :param max_workers: size of thread pool
+    """
+    def __init__(self, depth=0, max_workers=DEFAULT_MAX_WORKERS):
+        self.depth = depth
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def configure(self, depth=DEFAULT_DEPTH, max_workers=DEFAULT_MAX_WORKERS):
+        """Change depth and thread pool size"""
+        with self._lock:
+            self.depth = depth
+            if (self._executor is not None) and (
+                    max_workers != self.max_workers):
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self.max_workers = max_workers
+
+    @property
+    def queue_depth(self):
+        """Number of scheduled loads that have not finished"""
+        with self._lock:
+            return sum(not future.done()
+                       for futures in self._pending.values()
+                       for future in futures.values())
+
+    def schedule(self, owner, load, state):
+        """Load neighbours of state in background threads
+
+        Pending loads previously scheduled by the same owner that are
+        no longer neighbours of state are cancelled
+
+        :param owner: object requesting prefetch, e.g. a view
+        :param load: callable taking a state, e.g. ``loader.image``
+        :param state: :class:`forest.db.control.State` just rendered
+        """
+        if self.depth <= 0:
+            return
+        states = neighbours(state, self.depth)
+        with self._lock:
+            previous = self._pending.get(id(owner), {})
+            futures = {}
+            for key, future in previous.items():
+                if future.done():
+                    continue
+                if key in states:
+                    futures[key] = future
+                else:
+                    future.cancel()
+            for key, neighbour in states.items():
+                if key not in futures:
+                    futures[key] = self._submit(load, neighbour)
+            self._pending[id(owner)] = futures
+
+    def cancel(self, owner=None):
+        """Cancel pending loads of an owner or of all owners"""
+        with self._lock:
+            if owner is None:
+                owners = list(self._pending.keys())
+            else:
+                owners = [id(owner)]
+            for key in owners:
+                for future in self._pending.pop(key, {}).values():
+                    future.cancel()
+
+    def _submit(self, load, state):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="forest-prefetch")
+        return self._executor.submit(_quietly, load, state)
+
+
+def _quietly(load, state):
+    # Errors resurface when the frame is rendered for real
+    try:
+        load(state)
+    except Exception:
+        pass
+
+
+def neighbours(state, depth):
+    """States of adjacent valid times and pressure levels
+
+    Valid times wrap around in the same way as next/previous buttons
+
+    :returns: dict mapping (valid_time, pressure) to state, nearest first
+    """
+    result = {}
+    times = _sorted(state.valid_times)
+    if (state.valid_time is not None) and (len(times) > 1):
+        i = _search(times, state.valid_time)
+        if i is not None:
+            for step in range(1, depth + 1):
+                for j in (i + step, i - step):
+                    valid_time = times[j % len(times)]
+                    if valid_time == state.valid_time:
+                        continue
+                    result[(valid_time, state.pressure)] = state._replace(
+                        valid_time=valid_time)
+    pressures = _sorted(state.pressures)
+    if (state.pressure is not None) and (len(pressures) > 1):
+        i = _search(pressures, state.pressure)
+        if i is not None:
+            for j in (i + 1, i - 1):
+                if 0 <= j < len(pressures):
+                    pressure = pressures[j]
+                    result[(state.valid_time, pressure)] = state._replace(
+                        pressure=pressure)
+    return result
+
+
+def _sorted(items):
+    """Sorted unique items, memoised per list since states share them"""
+    if items is None:
+        return []
+    with _SORTED_LOCK:
+        entry = _SORTED.get(id(items))
+        if (entry is not None) and (entry[0] is items):
+            _SORTED.move_to_end(id(items))
+            return entry[1]
+    try:
+        result = list(sorted(set(items)))
+    except TypeError:
+        result = []
+    with _SORTED_LOCK:
+        # Keep a reference to items so that its id is not re-used
+        _SORTED[id(items)] = (items, result)
+        while len(_SORTED) > _SORTED_LIMIT:
+            _SORTED.popitem(last=False)
+    return result
+
+
+def _search(items, item):
+    """Position of item in sorted items by bisection or None"""
+    try:
+        i = bisect.bisect_left(items, item)
+        if (i < len(items)) and (items[i] == item):
+            return i
+    except TypeError:
+        pass
+    try:
+        # Floats within tolerance, mixed types
+        return _index(items, item)
+    except (ValueError, NotFound):
+        return None
+
+
+_SORTED = OrderedDict()
+_SORTED_LIMIT = 32
+_SORTED_LOCK = threading.Lock()
+
+
+#: Process-wide prefetcher shared by all sessions
+PREFETCHER = Prefetcher()
@@ -0,0 +1,188 @@
+"""
+Overview pyramids
+-----------------
+
+Large fields are expensive to stretch and send to the browser at
+full resolution when most of their detail is smaller than a screen
+pixel. A :class:`Pyramid` block-averages overview levels of a field
+the first time they are needed and keeps them, so that each render can
+pick the coarsest level that still has at least one grid point per
+pixel without averaging levels no plot asked for.
+
+.. autoclass:: Pyramid
+   :members:
+
+.. autofunction:: overview
+
+.. autofunction:: coarsen
+
+.. autofunction:: choose_factor
+
+.. autofunction:: plot_size
+
+.. autofunction:: block_average
+
+"""
+import threading
+import numpy as np
+from forest import geo
+
+
+#: Block sizes of overview levels, 1 is the source data
+DEFAULT_FACTORS = (1, 2, 4, 8)
+
+#: Pixels used to display a whole field if the viewport is not known
+DEFAULT_PIXELS = 800
+
+# Latitude limit of WebMercator projection
+MAX_LATITUDE = 85.
+
+
+class Pyramid:
+    """Block-averaged overview levels of a gridded field
+
+    Levels are computed on first use
+
+    :param lons: 1D or 2D longitudes
+    :param lats: 1D or 2D latitudes
+    :param values: 2D array or masked array
+    :param factors: block sizes of each level
+    """
+    def __init__(self, lons, lats, values, factors=DEFAULT_FACTORS):
+        self.lons = lons
+        self.lats = lats
+        self.factors = [factor for factor in sorted(set(factors) | {1})
+                        if (factor == 1) or
+                        (min(values.shape[-2:]) >= 2 * factor)]
+        self._levels = {1: (lons, lats, values)}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        """Memory used by levels computed so far"""
+        with self._lock:
+            levels = list(self._levels.values())
+        total = 0
+        for level in levels:
+            for array in level:
+                total += np.asarray(array).nbytes
+        return total
+
+    def factor(self, plot_width, plot_height):
+        """Coarsest factor with at least one grid point per pixel"""
+        _, _, values = self._levels[1]
+        return choose_factor(values.shape, plot_width, plot_height,
+                             self.factors)
+
+    def level(self, factor):
+        """Longitudes, latitudes and values at a given factor"""
+        if factor not in self.factors:
+            raise KeyError(factor)
+        with self._lock:
+            if factor not in self._levels:
+                self._levels[factor] = coarsen(*self._levels[1], factor)
+            return self._levels[factor]
+
+    def select(self, plot_width, plot_height):
+        """Longitudes, latitudes and values suitable for a plot size"""
+        return self.level(self.factor(plot_width, plot_height))
+
+
+def choose_factor(shape, plot_width, plot_height, factors=DEFAULT_FACTORS):
+    """Coarsest block size with at least one grid point per pixel
+
+    :param shape: shape of field, the last two dimensions are averaged
+    """
+    ny, nx = shape[-2:]
+    best = 1
+    for factor in sorted(set(factors) | {1}):
+        if (factor > 1) and (min(ny, nx) < 2 * factor):
+            continue
+        if (-(-nx // factor) >= plot_width) and (
+                -(-ny // factor) >= plot_height):
+            best = factor
+    return best
+
+
+def overview(lons, lats, values, plot_width, plot_height,
+             factors=DEFAULT_FACTORS):
+    """Longitudes, latitudes and values of a single overview level
+
+    Equivalent to ``Pyramid(lons, lats, values).select(...)`` without
+    computing the levels that are not selected, suitable for fields
+    that are only displayed once
+    """
+    factor = choose_factor(values.shape, plot_width, plot_height, factors)
+    return coarsen(lons, lats, values, factor)
+
+
+def coarsen(lons, lats, values, factor):
+    """Longitudes, latitudes and values block-averaged by factor"""
+    if factor == 1:
+        return lons, lats, values
+    return (_coarsen_coord(lons, factor),
+            _coarsen_coord(lats, factor),
+            block_average(values, factor))
+
+
+def plot_size(lons, lats, viewport):
+    """Pixels needed to display a whole field at the viewport resolution
+
+    :param lons: longitudes of field
+    :param lats: latitudes of field
+    :param viewport: tuple returned by :func:`forest.geo.snap_viewport`
+                     or None
+    :returns: (plot_width, plot_height)
+    """
+    if viewport is None:
+        return DEFAULT_PIXELS, DEFAULT_PIXELS
+    x_start, x_end, y_start, y_end, width, height = viewport
+    lats = np.clip([np.nanmin(lats), np.nanmax(lats)],
+                   -MAX_LATITUDE, MAX_LATITUDE)
+    x, y = geo.web_mercator([np.nanmin(lons), np.nanmax(lons)], lats)
+    plot_width = (x[1] - x[0]) * width / (x_end - x_start)
+    plot_height = (y[1] - y[0]) * height / (y_end - y_start)
+    return int(np.ceil(plot_width)), int(np.ceil(plot_height))
+
+
+def block_average(values, factor):
+    """Mean of factor x factor blocks ignoring masked and NaN values
+
+    Partial blocks at the edges are averaged over the points they contain
+
+    >>> block_average(np.arange(16.).reshape(4, 4), 2).tolist()
+    [[2.5, 4.5], [10.5, 12.5]]
+
+    """
+    values = np.ma.masked_invalid(values)
+    dtype = np.result_type(values.dtype, np.float32)
+    array = np.ma.filled(values.astype(dtype), np.nan)
+    return np.ma.masked_invalid(_block_nanmean(array, factor, axes=(-2, -1)))
+
+
+def _coarsen_coord(points, factor):
+    points = np.ma.filled(np.ma.asarray(points, dtype=float), np.nan)
+    if points.ndim == 1:
+        return _block_nanmean(points, factor, axes=(-1,))
+    return _block_nanmean(points, factor, axes=(-2, -1))
+
+
+def _block_nanmean(array, factor, axes):
+    """Mean over blocks of size factor along each axis ignoring NaN"""
+    pad = [(0, 0)] * array.ndim
+    for axis in axes:
+        pad[axis] = (0, -array.shape[axis] % factor)
+    array = np.pad(array, pad, constant_values=np.nan)
+    shape = []
+    for axis, length in enumerate(array.shape):
+        if (axis - array.ndim) in axes:
+            shape += [length // factor, factor]
+        else:
+            shape += [length]
+    blocks = array.reshape(shape)
+    valid = ~np.isnan(blocks)
+    reduce_axes = tuple(range(len(shape)))[-2 * len(axes) + 1::2]
+    total = np.where(valid, blocks, 0).sum(axis=reduce_axes)
+    count = valid.sum(axis=reduce_axes)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count
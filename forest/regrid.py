@@ -0,0 +1,244 @@
+"""
+Regridding
+----------
+
+Stretching a field onto a screen-sized canvas with
+:meth:`datashader.Canvas.quadmesh` repeats the same geometric work for
+every frame, even though the source grid and canvas rarely change
+between valid times, pressures and variables of a dataset.
+
+A :class:`Regridder` asks datashader once which source cells fall
+inside each canvas pixel, stores the answer as a sparse matrix and then
+regrids any field on the same grid with a single sparse product.
+Regridders are shared through a memory-limited cache keyed by grid
+signature and canvas. Grids whose matrix would not fit in the cache
+are stretched by a plain :class:`Quadmesh` instead, since a regridder
+that cannot be kept would be rebuilt for every frame.
+
+Only grids with 1D axes are regridded with a matrix. Quadmesh assigns
+the cells of 2D curvilinear grids, e.g. satellite or rotated pole
+grids, to pixels in ways a block of row and column indices does not
+describe, so those are always stretched by :class:`Quadmesh`.
+
+.. autoclass:: Regridder
+   :members:
+
+.. autoclass:: Quadmesh
+   :members:
+
+.. autofunction:: regridder
+
+.. autofunction:: signature
+
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import scipy.sparse
+from forest.cache import ImageCache
+
+try:
+    import datashader
+    import xarray
+except ModuleNotFoundError:
+    datashader = None
+
+
+#: Memory budget for cached regridders
+DEFAULT_MAX_MEGABYTES = 128
+
+#: Process-wide cache of regridders
+REGRID_CACHE = ImageCache(max_megabytes=DEFAULT_MAX_MEGABYTES)
+
+#: Bytes stored per (pixel, cell) pair, a float32 weight and int32 index
+NNZ_BYTES = 8
+
+# Keys of grids found too large to cache, see regridder
+_OVERSIZED = OrderedDict()
+_OVERSIZED_LIMIT = 256
+_OVERSIZED_LOCK = threading.Lock()
+
+
+class Regridder:
+    """Map values on a source grid to the mean value in each pixel
+
+    Each pixel is the mean of the contiguous block of source cells
+    that datashader's quadmesh assigns to it, NaN and masked values
+    are ignored
+
+    :param gx: 1D x-coordinates in projection space
+    :param gy: 1D y-coordinates in projection space
+    :param x_range: canvas x extent
+    :param y_range: canvas y extent
+    :param plot_width: canvas width in pixels
+    :param plot_height: canvas height in pixels
+    :param max_nnz: largest number of (pixel, cell) pairs to store, if
+                    exceeded :attr:`matrix` is None
+    """
+    def __init__(self, gx, gy, x_range, y_range, plot_width, plot_height,
+                 max_nnz=None):
+        if (np.ndim(gx) != 1) or (np.ndim(gy) != 1):
+            raise ValueError("Regridder needs 1D axes, use Quadmesh for "
+                             "2D grids")
+        self.source_shape = (len(gy), len(gx))
+        self.shape = (plot_height, plot_width)
+        canvas = datashader.Canvas(plot_height=plot_height,
+                                   plot_width=plot_width,
+                                   x_range=x_range,
+                                   y_range=y_range)
+        rows, columns = np.indices(self.source_shape, dtype="f8")
+        bounds = []
+        for index in (rows, columns):
+            for reduction in (datashader.reductions.min,
+                              datashader.reductions.max):
+                bounds.append(_quadmesh(canvas, index, gx, gy, reduction))
+        self.matrix = _block_matrix(self.shape, self.source_shape, *bounds,
+                                    max_nnz=max_nnz)
+
+    @staticmethod
+    def estimate_nnz(source_shape, shape):
+        """Expected (pixel, cell) pairs of a well-behaved grid
+
+        Each cell falls in about one pixel when downsampling and each
+        pixel covers about one cell when upsampling
+        """
+        return max(int(np.prod(source_shape)), int(np.prod(shape)))
+
+    @property
+    def nbytes(self):
+        """Memory used by sparse matrix"""
+        if self.matrix is None:
+            return 0
+        return (self.matrix.data.nbytes +
+                self.matrix.indices.nbytes +
+                self.matrix.indptr.nbytes)
+
+    def __call__(self, values):
+        """Regrid a field to a masked array of pixels"""
+        values = np.ma.masked_invalid(values)
+        valid = ~np.ma.getmaskarray(values)
+        total = self.matrix @ np.where(valid, values.data, 0).ravel()
+        count = self.matrix @ valid.ravel().astype("f4")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            image = total / count
+        image = image.reshape(self.shape)
+        return np.ma.masked_array(image, mask=(count == 0).reshape(self.shape))
+
+
+class Quadmesh:
+    """Stretch each field with its own :meth:`datashader.Canvas.quadmesh`
+
+    Same interface as :class:`Regridder` for 2D grids and for grids
+    too large to cache
+    """
+    def __init__(self, gx, gy, x_range, y_range, plot_width, plot_height):
+        self.gx = gx
+        self.gy = gy
+        self.canvas = datashader.Canvas(plot_height=plot_height,
+                                        plot_width=plot_width,
+                                        x_range=x_range,
+                                        y_range=y_range)
+
+    def __call__(self, values):
+        """Regrid a field to a masked array of pixels"""
+        image = _quadmesh(self.canvas, values, self.gx, self.gy,
+                          datashader.reductions.mean)
+        return np.ma.masked_invalid(image)
+
+
+def regridder(gx, gy, x_range, y_range, plot_width, plot_height):
+    """Cached :class:`Regridder` for a grid and canvas
+
+    Returns a :class:`Quadmesh` for 2D grids or if the regridder's
+    matrix is expected to, or turns out to, exceed the memory budget of
+    :data:`REGRID_CACHE`
+    """
+    args = (gx, gy, x_range, y_range, plot_width, plot_height)
+    if (np.ndim(gx) != 1) or (np.ndim(gy) != 1):
+        return Quadmesh(*args)
+    key = (signature(gx, gy),
+           tuple(float(x) for x in x_range),
+           tuple(float(y) for y in y_range),
+           int(plot_width),
+           int(plot_height))
+    value = REGRID_CACHE.get(key)
+    if value is not None:
+        return value
+    with _OVERSIZED_LOCK:
+        oversized = key in _OVERSIZED
+    source_shape = (len(gy), len(gx))
+    max_nnz = REGRID_CACHE.max_bytes // NNZ_BYTES
+    estimate = Regridder.estimate_nnz(source_shape,
+                                      (int(plot_height), int(plot_width)))
+    if oversized or (estimate > max_nnz):
+        return Quadmesh(*args)
+    value = Regridder(*args, max_nnz=max_nnz)
+    if value.matrix is None:
+        # Bounding blocks of wrapping or unsorted axes overlap,
+        # remember not to compute them again
+        with _OVERSIZED_LOCK:
+            _OVERSIZED[key] = True
+            while len(_OVERSIZED) > _OVERSIZED_LIMIT:
+                _OVERSIZED.popitem(last=False)
+        return Quadmesh(*args)
+    REGRID_CACHE.put(key, value)
+    return value
+
+
+def signature(*arrays):
+    """Digest of array shapes and values used to recognise a grid"""
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ma.asarray(array)
+        digest.update(str(array.shape).encode())
+        array = np.ma.filled(array.astype("f8"), np.nan)
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _quadmesh(canvas, values, gx, gy, reduction):
+    if gx.ndim == 1:
+        xarr = xarray.DataArray(values, coords=[('y', gy), ('x', gx)],
+                                name='Z')
+        image = canvas.quadmesh(xarr, agg=reduction('Z'))
+    else:
+        xarr = xarray.DataArray(values,
+                                dims=['Y', 'X'],
+                                coords={
+                                    'Qx': (['Y', 'X'], gx),
+                                    'Qy': (['Y', 'X'], gy)
+                                },
+                                name='Z')
+        image = canvas.quadmesh(xarr, x='Qx', y='Qy', agg=reduction('Z'))
+    return image.values
+
+
+def _block_matrix(shape, source_shape, row_min, row_max,
+                  column_min, column_max, max_nnz=None):
+    """Sparse matrix relating pixels to blocks of source cells
+
+    :returns: CSR matrix or None if it would hold more than max_nnz values
+    """
+    pixels = np.flatnonzero(np.isfinite(row_min) & np.isfinite(column_min))
+    row_min = row_min.ravel()[pixels].astype(int)
+    row_max = row_max.ravel()[pixels].astype(int)
+    column_min = column_min.ravel()[pixels].astype(int)
+    column_max = column_max.ravel()[pixels].astype(int)
+    n_rows = row_max - row_min + 1
+    n_columns = column_max - column_min + 1
+    sizes = n_rows * n_columns
+    if (max_nnz is not None) and (sizes.sum() > max_nnz):
+        return None
+
+    # Enumerate every (pixel, cell) pair inside each block
+    pixel = np.repeat(pixels, sizes)
+    offset = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes,
+                                                sizes)
+    width = np.repeat(n_columns, sizes)
+    row = np.repeat(row_min, sizes) + offset // width
+    column = np.repeat(column_min, sizes) + offset % width
+    cell = np.ravel_multi_index((row, column), source_shape)
+    return scipy.sparse.csr_matrix(
+        (np.ones(len(cell), dtype="f4"), (pixel, cell)),
+        shape=(shape[0] * shape[1], source_shape[0] * source_shape[1]))
@@ -23,11 +23,13 @@ responsible only for a limited set of actions
 import copy
 import bokeh.events
 import bokeh.models
+import bokeh.plotting
 from forest import rx
 from forest.redux import Action
 from forest.observe import Observable
 
 SET_POSITION = "SET_POSITION"
+SET_VIEWPORT = "SET_VIEWPORT"
 
 def reducer(state, action):
     """Screen specific reducer
@@ -43,6 +45,8 @@ def reducer(state, action):
     state = copy.deepcopy(state)
     if action["kind"] == SET_POSITION:
         state["position"] = action["payload"]
+    elif action["kind"] == SET_VIEWPORT:
+        state["viewport"] = action["payload"]
     return state
 
 def set_position(x, y) -> Action:
@@ -64,6 +68,35 @@ def set_position(x, y) -> Action:
     return {"kind": SET_POSITION, "payload": {"x": x, "y": y}}
 
 
+def set_viewport(x_start, x_end, y_start, y_end, width, height) -> Action:
+    """Action that stores the visible extent of the figures
+
+    .. code-block:: python
+
+        {
+            "kind": "SET_VIEWPORT",
+            "payload": {
+                "x_start": x_start,
+                "x_end": x_end,
+                "y_start": y_start,
+                "y_end": y_end,
+                "width": width,
+                "height": height
+            }
+        }
+
+    :returns: data representing action
+    :rtype: dict
+    """
+    return {"kind": SET_VIEWPORT, "payload": {
+        "x_start": x_start,
+        "x_end": x_end,
+        "y_start": y_start,
+        "y_end": y_end,
+        "width": width,
+        "height": height}}
+
+
 class TapListener(Observable):
     """ Listen for bokeh.events.Tap and update the store. Wired up in main.py"""
 
@@ -77,6 +110,59 @@ class TapListener(Observable):
         self.notify(set_position(event.x, event.y))
 
 
+class ViewportListener(Observable):
+    """Listen to figure range/size changes and update the store
+
+    Range changes arrive continuously while a user pans or zooms, they
+    are debounced so that a single action is emitted once the figure
+    comes to rest. Wired up in main.py
+
+    :param delay: milliseconds to wait for further changes, 0 to
+                  notify immediately
+    """
+    def __init__(self, delay=250):
+        self.delay = delay
+        self.figure = None
+        self._callback = None
+        super().__init__()
+
+    def connect(self, store):
+        self.add_subscriber(store.dispatch)
+
+    def add_figure(self, figure):
+        """Listen to x/y ranges and inner size of figure"""
+        self.figure = figure
+        for attr in ("start", "end"):
+            figure.x_range.on_change(attr, self.on_change)
+            figure.y_range.on_change(attr, self.on_change)
+        for attr in ("inner_width", "inner_height"):
+            figure.on_change(attr, self.on_change)
+
+    def on_change(self, attr, old, new):
+        if self.delay == 0:
+            self.update()
+            return
+        document = bokeh.plotting.curdoc()
+        if self._callback is not None:
+            try:
+                document.remove_timeout_callback(self._callback)
+            except ValueError:
+                # Callback already executed
+                pass
+        self._callback = document.add_timeout_callback(self.update,
+                                                       self.delay)
+
+    def update(self):
+        self._callback = None
+        figure = self.figure
+        self.notify(set_viewport(figure.x_range.start,
+                                 figure.x_range.end,
+                                 figure.y_range.start,
+                                 figure.y_range.end,
+                                 figure.inner_width,
+                                 figure.inner_height))
+
+
 class MarkDraw:
     """
     Subscribe to forest state, update marker position when position state
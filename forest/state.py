@@ -211,6 +211,29 @@ class Position:
     y: float = -1e9  # South pole
 
 
+@dataclass
+class Viewport:
+    """Figure extent in WebMercator coordinates and its size in pixels
+
+    Loaders use the viewport to read only the part of a field that
+    is visible at a resolution matched to the screen. Unknown values
+    are represented by None, in which case full fields are loaded
+
+    :param x_start: left edge of figure
+    :param x_end: right edge of figure
+    :param y_start: bottom edge of figure
+    :param y_end: top edge of figure
+    :param width: number of pixels across figure
+    :param height: number of pixels up figure
+    """
+    x_start: float = None
+    x_end: float = None
+    y_start: float = None
+    y_end: float = None
+    width: int = None
+    height: int = None
+
+
 @dataclass
 class Tools:
     """Flags to specify active tools
@@ -272,6 +295,8 @@ class State:
     :type tools: Tools
     :param position: Used by tools to determine geographic position
     :type position: Position
+    :param viewport: Visible extent used by loaders to subset fields
+    :type viewport: Viewport
     :param presets: Save colorbar settings for later re-use
     :type presets: Presets
     :param borders: Cartopy coastline, lakes and border settings
@@ -296,6 +321,7 @@ class State:
     tile: Tile = field(default_factory=Tile)
     tools: Tools = field(default_factory=Tools)
     position: Position = field(default_factory=Position)
+    viewport: Viewport = field(default_factory=Viewport)
     presets: Presets = field(default_factory=Presets)
     borders: Borders = field(default_factory=Borders)
     bokeh: Bokeh = field(default_factory=Bokeh)
@@ -314,6 +340,8 @@ class State:
             self.tools = Tools(**self.tools)
         if isinstance(self.position, dict):
             self.position = Position(**self.position)
+        if isinstance(self.viewport, dict):
+            self.viewport = Viewport(**self.viewport)
         if isinstance(self.layers, dict):
             self.layers = Layers(**self.layers)
         if isinstance(self.presets, dict):
@@ -0,0 +1,138 @@
+"""
+Background sync
+---------------
+
+Synchronising a dataset globs a remote file system and indexes new
+files, which can take minutes when a model run lands. Run on the bokeh
+server loop this freezes every connected session, so a
+:class:`SyncWorker` runs syncs in a background thread instead. Each
+sync opens its own SQLite connection to write to the database.
+
+Workers can also subscribe to a :class:`forest.watch.Catalogue` so that
+new files are synchronised as soon as they appear rather than at the
+next periodic callback.
+
+Once a sync has inserted files, the dataset's ``refresh`` method, if
+any, is called on the server loop so that sessions see the new files.
+
+.. autoclass:: SyncWorker
+   :members:
+
+.. autoclass:: SyncStatus
+   :members:
+
+"""
+import datetime as dt
+import threading
+import traceback
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+
+@dataclass
+class SyncStatus:
+    """Progress of the most recent sync of a dataset"""
+    running: bool = False
+    done: int = 0
+    total: int = 0
+    inserted: int = 0
+    error: str = None
+    finished: dt.datetime = None
+
+
+class SyncWorker:
+    """Run dataset syncs one at a time in a background thread
+
+    :param loop: tornado IOLoop used to call ``dataset.refresh``,
+                 if None refresh is called from the worker thread
+    """
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.status = {}
+        self._futures = {}
+        self._requested = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="forest-sync")
+
+    def submit(self, dataset):
+        """Schedule a sync unless one is already pending for dataset
+
+        A dataset submitted while it is being synced is synced again
+        once the current sync finishes
+
+        :returns: future or None if dataset is already being synced
+        """
+        key = id(dataset)
+        with self._lock:
+            future = self._futures.get(key)
+            if (future is not None) and (not future.done()):
+                self._requested.add(key)
+                return None
+            self.status.setdefault(key, SyncStatus())
+            future = self._executor.submit(self._run, key, dataset)
+            self._futures[key] = future
+            return future
+
+    def progress(self, dataset):
+        """Copy of the :class:`SyncStatus` of a dataset"""
+        with self._lock:
+            status = self.status.get(id(dataset), SyncStatus())
+            return SyncStatus(**vars(status))
+
+    def _run(self, key, dataset):
+        try:
+            return self._sync(key, dataset)
+        finally:
+            with self._lock:
+                again = key in self._requested
+                self._requested.discard(key)
+                if again:
+                    try:
+                        self._futures[key] = self._executor.submit(
+                            self._run, key, dataset)
+                    except RuntimeError:
+                        pass  # Worker has been shut down
+
+    def _sync(self, key, dataset):
+        self._update(key, running=True, done=0, total=0, inserted=0,
+                     error=None)
+
+        def progress(done, total):
+            self._update(key, done=done, total=total)
+
+        try:
+            inserted = dataset.sync(progress=progress)
+        except Exception as error:
+            # Keep the worker alive for the next periodic callback
+            traceback.print_exc()
+            self._update(key, running=False, error=str(error),
+                         finished=dt.datetime.now())
+            return 0
+        inserted = inserted or 0
+        self._update(key, running=False, inserted=inserted,
+                     finished=dt.datetime.now())
+        if (inserted > 0) and hasattr(dataset, "refresh"):
+            if self.loop is None:
+                dataset.refresh()
+            else:
+                self.loop.add_callback(dataset.refresh)
+        return inserted
+
+    def _update(self, key, **kwargs):
+        with self._lock:
+            status = self.status.setdefault(key, SyncStatus())
+            for name, value in kwargs.items():
+                setattr(status, name, value)
+
+    def subscribe(self, dataset, catalogue):
+        """Sync dataset whenever files are added to a catalogue"""
+        def on_change(added, removed):
+            if len(added) > 0:
+                self.submit(dataset)
+        catalogue.subscribe(on_change)
+
+    def shutdown(self, wait=True):
+        """Stop accepting work and optionally wait for running syncs"""
+        self._executor.shutdown(wait=wait)
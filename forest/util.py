@@ -1,4 +1,3 @@
-import glob
 import os
 import re
 import datetime as dt
@@ -14,44 +13,6 @@ except ImportError:
     pass
 
 
-def timeout_cache(interval):
-    def decorator(f):
-        cache = {}
-        call_time = {}
-        def wrapped(x):
-            nonlocal cache
-            nonlocal call_time
-            now = dt.datetime.now()
-            if x not in cache:
-                cache[x] = f(x)
-                call_time[x] = now
-                return cache[x]
-            else:
-                if (now - call_time[x]) > interval:
-                    cache[x] = f(x)
-                    call_time[x] = now
-                    return cache[x]
-                else:
-                    return cache[x]
-        return wrapped
-    return decorator
-
-
-_timeout_globs = {}
-
-
-def cached_glob(interval):
-    """Glob file system at most once every interval"""
-    global _timeout_globs
-    if interval not in _timeout_globs:
-        _timeout_globs[interval] = timeout_cache(interval)(_glob)
-    return _timeout_globs[interval]
-
-
-def _glob(pattern):
-    return sorted(glob.glob(os.path.expanduser(pattern)))
-
-
 def coarsify(lons, lats, values, fraction):
     values = scipy.ndimage.zoom(values, fraction)
     data = np.ma.masked_array(values, np.isnan(values))
@@ -0,0 +1,443 @@
+"""
+File system watchers
+--------------------
+
+Drivers used to re-glob their patterns on fixed timers, so new files
+appeared late and every refresh listed whole directories again. A
+:class:`Catalogue` keeps an incremental, sorted list of the paths that
+match a pattern and tells subscribers which paths were added or removed.
+
+Catalogues are kept up to date by a backend chosen per pattern:
+
+* ``inotify`` events via `watchdog <https://pypi.org/project/watchdog/>`_
+  for local file systems
+* ``poll`` rescans at a fixed interval, suitable for network mounts
+  that do not deliver events, e.g. NFS or goofys
+
+Rescans only list directories whose modification time changed. Until
+:meth:`Watcher.configure` is called catalogues are not watched and
+rescan on access once they are older than ``max_age``, see ``watch``
+in :class:`forest.config.Config`
+
+.. autoclass:: Catalogue
+   :members:
+
+.. autoclass:: Watcher
+   :members:
+
+.. autodata:: WATCHER
+
+"""
+import bisect
+import datetime as dt
+import fnmatch
+import glob
+import os
+import re
+import threading
+import time
+
+try:
+    import watchdog.observers
+except ModuleNotFoundError:
+    watchdog = None
+
+
+#: Seconds between rescans of polled catalogues
+DEFAULT_INTERVAL = 60
+
+#: Backend used by :meth:`Watcher.configure`
+DEFAULT_METHOD = "auto"
+
+METHODS = ("auto", "inotify", "poll", "none")
+
+#: Seconds a new file's size must be unchanged before inotify adds it
+SETTLE_INTERVAL = 1
+
+# File system types that do not deliver inotify events for remote changes
+NETWORK_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smbfs", "smb3", "lustre",
+                       "gpfs", "afs", "ceph", "fuse")
+
+_MAGIC = re.compile(r"[*?[]")
+
+
+class Catalogue:
+    """Sorted paths matching a glob pattern
+
+    :param pattern: glob pattern, ``~`` is expanded, None matches nothing
+    :param max_age: datetime.timedelta after which an unwatched catalogue
+                    is rescanned on access, None rescans once
+    """
+    def __init__(self, pattern, max_age=None):
+        self.pattern = os.path.expanduser(pattern or "")
+        self.max_age = max_age
+        self.watched = False
+        self.scanned = None
+        self._paths = []
+        self._listings = {}
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self._scan_lock = threading.Lock()
+
+    @property
+    def paths(self):
+        """Sorted paths, rescanned first if unwatched and out of date"""
+        self.refresh()
+        with self._lock:
+            return list(self._paths)
+
+    @property
+    def root(self):
+        """Deepest directory of pattern without wildcards"""
+        directory = os.path.dirname(self.pattern)
+        if directory == "":
+            return os.curdir
+        parts = []
+        for part in directory.split(os.sep):
+            if _MAGIC.search(part):
+                break
+            parts.append(part)
+        return os.sep.join(parts) or os.sep
+
+    @property
+    def recursive(self):
+        """True if directories of pattern contain wildcards"""
+        return _MAGIC.search(os.path.dirname(self.pattern)) is not None
+
+    def refresh(self):
+        """Rescan if unwatched and older than max_age"""
+        with self._lock:
+            if self.scanned is None:
+                stale = True
+            elif self.watched or (self.max_age is None):
+                stale = False
+            else:
+                stale = (dt.datetime.now() - self.scanned) > self.max_age
+        if stale:
+            self.rescan()
+
+    def match(self, path):
+        """Check a path against pattern using glob semantics"""
+        parts = path.split(os.sep)
+        patterns = self.pattern.split(os.sep)
+        if len(parts) != len(patterns):
+            return False
+        return all(fnmatch.fnmatchcase(part, pattern)
+                   for part, pattern in zip(parts, patterns))
+
+    def rescan(self):
+        """List directories that changed since the last scan"""
+        with self._scan_lock:
+            self._rescan()
+
+    def _rescan(self):
+        directory_pattern, name_pattern = os.path.split(self.pattern)
+        if _MAGIC.search(directory_pattern):
+            directories = glob.glob(directory_pattern)
+        else:
+            directories = [directory_pattern]
+        listings = {}
+        for directory in directories:
+            try:
+                mtime = os.stat(directory or os.curdir).st_mtime_ns
+            except OSError:
+                continue
+            previous = self._listings.get(directory)
+            if (previous is not None) and (previous[0] == mtime) and (
+                    not _recent(mtime)):
+                listings[directory] = previous
+            else:
+                paths = glob.glob(os.path.join(_escape(directory),
+                                               name_pattern))
+                listings[directory] = (mtime, set(paths))
+        found = set()
+        for _, paths in listings.values():
+            found |= paths
+        with self._lock:
+            self._listings = listings
+            self.scanned = dt.datetime.now()
+            current = set(self._paths)
+        self.update(added=found - current, removed=current - found)
+
+    def add(self, path):
+        """Notify catalogue that a file was created"""
+        if self.match(path):
+            self.update(added=[path])
+
+    def remove(self, path):
+        """Notify catalogue that a file was deleted"""
+        self.update(removed=[path])
+
+    def update(self, added=(), removed=()):
+        """Insert and delete paths, notifying subscribers of changes"""
+        with self._lock:
+            inserted, deleted = [], []
+            for path in sorted(set(removed)):
+                i = bisect.bisect_left(self._paths, path)
+                if (i < len(self._paths)) and (self._paths[i] == path):
+                    del self._paths[i]
+                    deleted.append(path)
+            for path in sorted(set(added)):
+                i = bisect.bisect_left(self._paths, path)
+                if (i == len(self._paths)) or (self._paths[i] != path):
+                    self._paths.insert(i, path)
+                    inserted.append(path)
+            subscribers = list(self._subscribers)
+        if inserted or deleted:
+            for callback in subscribers:
+                callback(inserted, deleted)
+
+    def subscribe(self, callback):
+        """Call callback(added, removed) with lists of changed paths"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def follow(self, callback):
+        """Subscribe callback and replay current paths as additions
+
+        Paths are listed and the callback subscribed under the same
+        lock, so that every path is reported exactly once
+        """
+        self.refresh()
+        with self._lock:
+            self._subscribers.append(callback)
+            callback(list(self._paths), [])
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers.remove(callback)
+
+
+def _escape(directory):
+    # Directories found by glob may contain wildcard characters
+    return _MAGIC.sub(r"[\g<0>]", directory)
+
+
+def _recent(mtime_ns, seconds=2):
+    # Coarse timestamps may hide changes made within the same tick
+    return (time.time() - mtime_ns / 1e9) < seconds
+
+
+class PollingBackend:
+    """Rescan catalogues in a background thread"""
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.catalogues = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        name="forest-watch-poll",
+                                        daemon=True)
+        self._thread.start()
+
+    def watch(self, catalogue):
+        catalogue.watched = True
+        self.catalogues.append(catalogue)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for catalogue in list(self.catalogues):
+                try:
+                    catalogue.rescan()
+                except Exception:
+                    # A flaky mount should not stop other catalogues
+                    pass
+
+    def stop(self):
+        self._stop.set()
+        for catalogue in self.catalogues:
+            catalogue.watched = False
+
+
+class InotifyBackend:
+    """Update catalogues from watchdog file system events"""
+    def __init__(self):
+        self.catalogues = []
+        self.observer = watchdog.observers.Observer()
+        self.observer.daemon = True
+        self.observer.start()
+
+    def watch(self, catalogue):
+        self.observer.schedule(_Handler(catalogue), catalogue.root,
+                               recursive=catalogue.recursive)
+        catalogue.watched = True
+        self.catalogues.append(catalogue)
+
+    def stop(self):
+        self.observer.stop()
+        for catalogue in self.catalogues:
+            catalogue.watched = False
+
+
+class _Handler:
+    """Duck-typed watchdog event handler
+
+    Files are added once they are complete. Writers that close a file
+    deliver a ``closed`` event and renamed files are complete, other
+    new files are added once their size is unchanged for ``settle``
+    seconds, since observers other than inotify do not report closes
+    """
+    def __init__(self, catalogue, settle=SETTLE_INTERVAL):
+        self.catalogue = catalogue
+        self.settle = settle
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def dispatch(self, event):
+        if event.is_directory:
+            if event.event_type in ("created", "moved", "deleted"):
+                # Directory contents do not generate their own events
+                self.catalogue.rescan()
+        elif event.event_type == "closed":
+            self._discard(event.src_path)
+            self.catalogue.add(event.src_path)
+        elif event.event_type in ("created", "modified"):
+            self._defer(event.src_path)
+        elif event.event_type == "deleted":
+            self._discard(event.src_path)
+            self.catalogue.remove(event.src_path)
+        elif event.event_type == "moved":
+            self._discard(event.src_path)
+            self.catalogue.remove(event.src_path)
+            self.catalogue.add(event.dest_path)
+
+    def _defer(self, path):
+        """Add path once its size stops changing"""
+        if not self.catalogue.match(path):
+            return
+        with self._lock:
+            self._pending[path] = None
+            self._schedule()
+
+    def _discard(self, path):
+        with self._lock:
+            self._pending.pop(path, None)
+
+    def _schedule(self):
+        if (self._timer is None) and self._pending:
+            self._timer = threading.Timer(self.settle, self._settled)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _settled(self):
+        ready = []
+        with self._lock:
+            self._timer = None
+            for path, size in list(self._pending.items()):
+                try:
+                    current = os.stat(path).st_size
+                except FileNotFoundError:
+                    del self._pending[path]
+                    continue
+                if current == size:
+                    del self._pending[path]
+                    ready.append(path)
+                else:
+                    self._pending[path] = current
+            self._schedule()
+        if ready:
+            self.catalogue.update(added=ready)
+
+
+class Watcher:
+    """Shared catalogues and the backends that keep them up to date"""
+    def __init__(self):
+        self.method = "none"
+        self.interval = DEFAULT_INTERVAL
+        self._catalogues = {}
+        self._backends = {}
+        self._lock = threading.Lock()
+
+    def configure(self, method=DEFAULT_METHOD, interval=DEFAULT_INTERVAL):
+        """Choose how catalogues are watched
+
+        :param method: one of 'auto', 'inotify', 'poll' or 'none', auto
+                       uses inotify for local file systems if watchdog is
+                       installed and polling otherwise
+        :param interval: seconds between rescans of polled catalogues
+        """
+        if method not in METHODS:
+            raise ValueError("unknown watch method: '{}'".format(method))
+        with self._lock:
+            if (method, interval) == (self.method, self.interval):
+                return
+            self._stop()
+            self.method = method
+            self.interval = interval
+            for catalogue in self._catalogues.values():
+                self._watch(catalogue)
+
+    def catalogue(self, pattern, max_age=None):
+        """Shared :class:`Catalogue` of a pattern"""
+        key = os.path.expanduser(pattern or "")
+        with self._lock:
+            catalogue = self._catalogues.get(key)
+            if catalogue is None:
+                catalogue = Catalogue(key, max_age=max_age)
+                self._catalogues[key] = catalogue
+                self._watch(catalogue)
+            elif (max_age is not None) and (
+                    (catalogue.max_age is None) or
+                    (max_age < catalogue.max_age)):
+                catalogue.max_age = max_age
+        return catalogue
+
+    def stop(self):
+        """Stop all backends, catalogues rescan on access again"""
+        with self._lock:
+            self._stop()
+            self.method = "none"
+
+    def _stop(self):
+        for backend in self._backends.values():
+            backend.stop()
+        self._backends = {}
+
+    def _watch(self, catalogue):
+        method = self.method
+        if method == "none":
+            return
+        if method in ("auto", "inotify"):
+            if ((watchdog is None) or
+                    (not os.path.isabs(catalogue.pattern)) or
+                    (not os.path.isdir(catalogue.root))):
+                method = "poll"
+            elif (method == "auto") and is_network(catalogue.root):
+                method = "poll"
+            else:
+                method = "inotify"
+        catalogue.rescan()
+        self._backend(method).watch(catalogue)
+
+    def _backend(self, method):
+        if method not in self._backends:
+            if method == "inotify":
+                self._backends[method] = InotifyBackend()
+            else:
+                self._backends[method] = PollingBackend(self.interval)
+        return self._backends[method]
+
+
+def is_network(path, mounts="/proc/mounts"):
+    """Guess whether path is on a network file system"""
+    try:
+        with open(mounts) as stream:
+            lines = stream.readlines()
+    except OSError:
+        return False
+    path = os.path.abspath(path)
+    best, fs_type = "", ""
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        mount_point = fields[1]
+        if (path == mount_point or
+                path.startswith(mount_point.rstrip(os.sep) + os.sep)):
+            if len(mount_point) > len(best):
+                best, fs_type = mount_point, fields[2]
+    return fs_type.split(".")[0] in NETWORK_FILESYSTEMS
+
+
+#: Process-wide watcher shared by all drivers
+WATCHER = Watcher()
@@ -104,6 +104,7 @@ setuptools.setup(
             'console_scripts': [
                 'forest=forest.cli.main:main',
                 'forestdb=forest.db.main:main',
+                'forestdb-migrate=forest.db.migrate:main',
                 'forest-tutorial=forest.tutorial.main:main'
             ]
         })
@@ -0,0 +1,68 @@
+import pytest
+import numpy as np
+import forest.cache
+import forest.pyramid
+
+
+def image(n):
+    return {"image": [np.zeros((n, n), dtype="f")]}
+
+
+def test_image_cache_load_counts_misses_and_hits():
+    cache = forest.cache.ImageCache()
+    calls = []
+
+    def method(n):
+        calls.append(n)
+        return image(n)
+
+    cache.load("key", method, 2)
+    cache.load("key", method, 2)
+    assert calls == [2]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_image_cache_evicts_least_recently_used():
+    cache = forest.cache.ImageCache(max_megabytes=1)
+    n = 300  # 300 * 300 * 4 bytes ~ 0.34 MB
+    cache.put("a", image(n))
+    cache.put("b", image(n))
+    cache.get("a")
+    cache.put("c", image(n))
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_image_cache_ignores_empty_payloads():
+    cache = forest.cache.ImageCache()
+    cache.put("key", {"image": []})
+    assert "key" not in cache
+
+
+def test_image_cache_ignores_payloads_larger_than_budget():
+    cache = forest.cache.ImageCache(max_megabytes=0.1)
+    cache.put("key", image(1000))
+    assert len(cache) == 0
+
+
+def test_image_cache_resize():
+    cache = forest.cache.ImageCache()
+    cache.put("a", image(300))
+    cache.put("b", image(300))
+    cache.resize(0.5)
+    assert len(cache) == 1
+    assert "b" in cache
+
+
+@pytest.mark.parametrize("value,expect", [
+    (None, 0),
+    ({"x": [0.]}, 0),
+    (np.zeros(10, dtype="f"), 40),
+    (np.ma.masked_array(np.zeros(10, dtype="f"), mask=np.zeros(10, dtype=bool)), 50),
+    ({"image": [np.zeros(10, dtype="d")]}, 80),
+    (forest.pyramid.Pyramid(np.zeros(2), np.zeros(2), np.zeros((2, 2))), 64),
+])
+def test_nbytes(value, expect):
+    assert forest.cache.nbytes(value) == expect
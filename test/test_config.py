@@ -157,6 +157,34 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(group.locator, "file_system")
 
 
+def test_config_datasets_given_driver_settings(tmpdir):
+    cache_directory = str(tmpdir / "cache")
+    config = forest.config.Config({
+        "files": [{"label": "Lightning",
+                   "pattern": str(tmpdir / "*.txt"),
+                   "file_type": "earth_networks",
+                   "cache_directory": cache_directory,
+                   "max_megabytes": 64}]
+    })
+    assert config.file_groups[0].cache_directory == cache_directory
+    dataset, = config.datasets
+    assert dataset.loader.cache_directory == cache_directory
+    assert dataset.aggregator.max_bytes == 64 * 1024 ** 2
+
+
+def test_config_datasets_given_index_directory(tmpdir):
+    index_directory = str(tmpdir / "index")
+    config = forest.config.Config({
+        "files": [{"label": "NearCast",
+                   "pattern": str(tmpdir / "*.GRIB2"),
+                   "file_type": "nearcast",
+                   "index_directory": index_directory}]
+    })
+    dataset, = config.datasets
+    assert dataset.index_directory == index_directory
+    assert dataset.loader.index_directory == index_directory
+
+
 def test_config_parser_given_yaml(tmpdir):
     config_file = str(tmpdir / "test-config.yml")
     content = """
@@ -210,6 +238,55 @@ def test_config_parser_use_web_map_tiles(data, expect):
     assert config.use_web_map_tiles == expect
 
 
+@pytest.mark.parametrize("data,expect", [
+    ({}, 512),
+    ({"image_cache": {}}, 512),
+    ({"image_cache": {"max_megabytes": 64}}, 64),
+])
+def test_config_parser_image_cache_megabytes(data, expect):
+    config = forest.config.Config(data)
+    assert config.image_cache_megabytes == expect
+
+
+@pytest.mark.parametrize("data,expect", [
+    ({}, {"depth": 2, "max_workers": 2}),
+    ({"prefetch": {"depth": 0}}, {"depth": 0, "max_workers": 2}),
+    ({"prefetch": {"depth": 4, "max_workers": 1}},
+     {"depth": 4, "max_workers": 1}),
+])
+def test_config_parser_prefetch(data, expect):
+    config = forest.config.Config(data)
+    assert config.prefetch == expect
+
+
+@pytest.mark.parametrize("data,expect", [
+    ({}, 32),
+    ({"open_files": {"max_handles": 0}}, 0),
+])
+def test_config_parser_max_open_files(data, expect):
+    config = forest.config.Config(data)
+    assert config.max_open_files == expect
+
+
+@pytest.mark.parametrize("data,expect", [
+    ({}, 4),
+    ({"render": {"max_workers": 0}}, 0),
+])
+def test_config_parser_render_workers(data, expect):
+    config = forest.config.Config(data)
+    assert config.render_workers == expect
+
+
+@pytest.mark.parametrize("data,expect", [
+    ({}, {"method": "auto", "interval": 60}),
+    ({"watch": {"method": "poll", "interval": 5}},
+     {"method": "poll", "interval": 5}),
+])
+def test_config_parser_watch(data, expect):
+    config = forest.config.Config(data)
+    assert config.watch == expect
+
+
 @pytest.mark.parametrize("data,expect", [
     ({}, False),
     ({"features": {"example": True}}, True),
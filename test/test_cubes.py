@@ -0,0 +1,104 @@
+import os
+import datetime as dt
+import pytest
+from unittest.mock import Mock, patch
+import numpy as np
+import iris
+import iris.coords
+import iris.cube
+import forest.watch
+from forest import cubes
+from forest.drivers import gridded_forecast
+
+
+@pytest.fixture(autouse=True)
+def watcher():
+    with patch("forest.watch.WATCHER", forest.watch.Watcher()):
+        yield
+
+
+def make_cube(hours, name="air_temperature"):
+    units = "hours since 2020-01-01 00:00:00"
+    time = iris.coords.DimCoord(hours, "time", units=units)
+    frt = iris.coords.AuxCoord(0, "forecast_reference_time", units=units)
+    lat = iris.coords.DimCoord([0., 1.], "latitude", units="degrees")
+    lon = iris.coords.DimCoord([0., 1., 2.], "longitude", units="degrees")
+    return iris.cube.Cube(
+        np.zeros((len(hours), 2, 3)), name, units="K",
+        dim_coords_and_dims=[(time, 0), (lat, 1), (lon, 2)],
+        aux_coords_and_dims=[(frt, ())])
+
+
+def save(cube, path):
+    iris.save(cube, path)
+    return path
+
+
+def test_name_cubes_given_duplicate_names():
+    cube_1 = Mock(**{"name.return_value": "foo"})
+    cube_2 = Mock(**{"name.return_value": "foo"})
+    cube_3 = Mock(**{"name.return_value": "bar"})
+    result = cubes.name_cubes([cube_1, cube_2, cube_3], lambda cube: True)
+    assert result == {"foo (1)": cube_1, "foo (2)": cube_2, "bar": cube_3}
+
+
+def test_name_cubes_filters_invalid_cubes():
+    cube = Mock(**{"name.return_value": "foo"})
+    assert cubes.name_cubes([cube], lambda cube: False) == {}
+
+
+def test_cube_catalogue_given_no_files(tmpdir):
+    catalogue = cubes.CubeCatalogue(str(tmpdir / "*.nc"))
+    assert dict(catalogue) == {}
+
+
+def test_cube_catalogue_merges_files_like_iris_load(tmpdir):
+    save(make_cube([0]), str(tmpdir / "file_0.nc"))
+    save(make_cube([1]), str(tmpdir / "file_1.nc"))
+    pattern = str(tmpdir / "*.nc")
+    catalogue = cubes.CubeCatalogue(pattern)
+    expect = cubes.name_cubes(iris.load(pattern), lambda cube: True)
+    assert list(catalogue.keys()) == list(expect.keys())
+    for name, cube in expect.items():
+        assert catalogue[name].summary() == cube.summary()
+
+
+def test_cube_catalogue_loads_files_once(tmpdir):
+    save(make_cube([0]), str(tmpdir / "file.nc"))
+    catalogue = cubes.CubeCatalogue(str(tmpdir / "*.nc"))
+    for _ in range(3):
+        catalogue["air_temperature"]
+    assert catalogue.loads == 1
+
+
+def test_cube_catalogue_given_new_file_only_loads_new_file(tmpdir):
+    save(make_cube([0]), str(tmpdir / "file_0.nc"))
+    catalogue = cubes.CubeCatalogue(str(tmpdir / "*.nc"))
+    assert list(catalogue) == ["air_temperature"]
+    save(make_cube([1], name="relative_humidity"), str(tmpdir / "file_1.nc"))
+    catalogue.refresh()
+    assert list(catalogue) == ["air_temperature", "relative_humidity"]
+    assert catalogue.loads == 2
+
+
+def test_cube_catalogue_refresh_reloads_modified_file(tmpdir):
+    path = save(make_cube([0]), str(tmpdir / "file.nc"))
+    catalogue = cubes.CubeCatalogue(str(tmpdir / "*.nc"))
+    assert list(catalogue) == ["air_temperature"]
+    save(make_cube([0], name="relative_humidity"), path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    catalogue.refresh()
+    assert list(catalogue) == ["relative_humidity"]
+
+
+def test_gridded_forecast_navigator_and_loader_share_cubes(tmpdir):
+    save(make_cube([0, 1]), str(tmpdir / "file.nc"))
+    dataset = gridded_forecast.Dataset(label="label",
+                                       pattern=str(tmpdir / "*.nc"))
+    navigator = dataset.navigator()
+    loader = dataset.image_loader()
+    assert navigator.variables(None) == ["air_temperature"]
+    assert len(navigator.valid_times(None, "air_temperature", None)) == 2
+    assert loader._cubes is navigator._cubes
+    assert dataset._cubes.loads == 1
@@ -4,6 +4,7 @@ import datetime as dt
 import cftime
 import numpy as np
 import re
+import sqlite3
 
 import forest.db.database as database
 import forest.mark
@@ -206,3 +207,70 @@ def test_Database_valid_times_given_datetime_like_objects(initial_time):
 ])
 def test_sanitize_datetime_like_objects(time):
     assert forest.mark.sanitize_time(time) == "2020-01-01 00:00:00"
+
+
+def _populate(db):
+    for path, initial_time in [
+            ("a/file-0.nc", dt.datetime(2020, 1, 1)),
+            ("a/file-1.nc", dt.datetime(2020, 1, 2)),
+            ("b/file-0.nc", dt.datetime(2020, 1, 1))]:
+        db.insert_file_name(path, initial_time)
+        db.insert_times(path, "air_temperature",
+                        [initial_time + dt.timedelta(hours=1)])
+        db.insert_pressures(path, "air_temperature", [1000.])
+
+
+def test_Database_creates_indexes():
+    db = database.Database.connect(":memory:")
+    db.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    result = {name for name, in db.cursor.fetchall()}
+    assert {name for name, _ in database.INDEXES} <= result
+
+
+def test_Database_insert_dataset_links_existing_and_new_files():
+    db = database.Database.connect(":memory:")
+    db.insert_file_name("a/file-0.nc")
+    db.insert_dataset("a/*.nc")
+    db.insert_file_name("a/file-1.nc")
+    db.insert_file_name("b/file-0.nc")
+    db.cursor.execute("""
+        SELECT file.name
+          FROM dataset_to_file AS df
+          JOIN file ON file.id = df.file_id
+         ORDER BY file.name
+    """)
+    assert db.cursor.fetchall() == [("a/file-0.nc",), ("a/file-1.nc",)]
+
+
+@pytest.mark.parametrize("method, args", [
+    ("files", ()),
+    ("variables", ()),
+    ("initial_times", ()),
+    ("valid_times", ("air_temperature", dt.datetime(2020, 1, 1))),
+    ("pressures", ("air_temperature", dt.datetime(2020, 1, 1))),
+])
+def test_Database_registered_dataset_matches_glob(method, args):
+    pattern = "a/*.nc"
+    db = database.Database.connect(":memory:")
+    _populate(db)
+    expect = getattr(db, method)(pattern, *args)
+    db.insert_dataset(pattern)
+    result = getattr(db, method)(pattern, *args)
+    assert len(expect) > 0
+    assert expect == result
+
+
+def test_Database_queries_given_registered_dataset_use_equality():
+    pattern = "a/*.nc"
+    db = database.Database.connect(":memory:")
+    db.insert_dataset(pattern)
+    query = database.Database.valid_times_query(
+        pattern, None, None, indexed=pattern in db.datasets)
+    assert "GLOB" not in query
+    assert "d.pattern = :pattern" in query
+
+
+def test_registered_datasets_given_database_without_dataset_table():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE file (id INTEGER PRIMARY KEY)")
+    assert database.registered_datasets(connection.cursor()) == set()
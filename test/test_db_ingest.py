@@ -0,0 +1,158 @@
+import datetime as dt
+import pytest
+import netCDF4
+import forest.db
+import forest.db.ingest as ingest
+
+
+UNITS = "hours since 1970-01-01 00:00:00"
+
+
+def write_file(path, reference_time=dt.datetime(2019, 1, 1)):
+    times = [reference_time + dt.timedelta(hours=i) for i in range(3)]
+    pressures = [1000., 850.]
+    with netCDF4.Dataset(path, "w") as dataset:
+        dataset.createDimension("time", len(times))
+        dataset.createDimension("pressure", len(pressures))
+        dataset.createDimension("x", 2)
+        obj = dataset.createVariable("forecast_reference_time", "d", ())
+        obj.units = UNITS
+        obj[:] = netCDF4.date2num(reference_time, UNITS)
+        obj = dataset.createVariable("time", "d", ("time",))
+        obj.units = UNITS
+        obj[:] = netCDF4.date2num(times, UNITS)
+        obj = dataset.createVariable("pressure", "d", ("pressure",))
+        obj[:] = pressures
+        obj = dataset.createVariable("x", "f", ("x",))
+        obj[:] = [0, 1]
+        obj = dataset.createVariable(
+            "air_temperature", "f", ("time", "pressure", "x"))
+        obj.um_stash_source = "m01s16i203"
+        obj.coordinates = "forecast_reference_time"
+        obj = dataset.createVariable("precipitation_flux", "f", ("time", "x"))
+        obj.um_stash_source = "m01s04i203"
+        obj.coordinates = "forecast_reference_time"
+
+
+def dump(database):
+    tables = {}
+    for table, query in [
+            ("file", "SELECT name, reference FROM file"),
+            ("variable", """
+                SELECT variable.name, time_axis, pressure_axis, file.name
+                  FROM variable
+                  JOIN file ON file.id = variable.file_id"""),
+            ("time", """
+                SELECT variable.name, time.i, time.value
+                  FROM variable_to_time AS vt
+                  JOIN variable ON variable.id = vt.variable_id
+                  JOIN time ON time.id = vt.time_id"""),
+            ("pressure", """
+                SELECT variable.name, pressure.i, pressure.value
+                  FROM variable_to_pressure AS vp
+                  JOIN variable ON variable.id = vp.variable_id
+                  JOIN pressure ON pressure.id = vp.pressure_id""")]:
+        database.cursor.execute(query)
+        tables[table] = sorted(database.cursor.fetchall())
+    return tables
+
+
+def test_read_header(tmpdir):
+    path = str(tmpdir / "file.nc")
+    write_file(path)
+    header = ingest.read_header(path)
+    assert header["reference"] == "2019-01-01 00:00:00"
+    assert [v["name"] for v in header["variables"]] == [
+        "air_temperature", "precipitation_flux"]
+    variable = header["variables"][0]
+    assert variable["time_axis"] == 0
+    assert variable["pressure_axis"] == 1
+    assert variable["times"] == [
+        "2019-01-01 00:00:00",
+        "2019-01-01 01:00:00",
+        "2019-01-01 02:00:00"]
+    assert variable["pressures"] == [1000., 850.]
+    variable = header["variables"][1]
+    assert variable["pressure_axis"] is None
+    assert variable["pressures"] == []
+
+
+def test_ingest_matches_insert_netcdf(tmpdir):
+    pytest.importorskip("iris")
+    path = str(tmpdir / "file.nc")
+    write_file(path)
+    expect = forest.db.Database.connect(":memory:")
+    expect.insert_netcdf(path)
+    result = forest.db.Database.connect(":memory:")
+    assert ingest.ingest(result, [path]) == 1
+    assert dump(result) == dump(expect)
+
+
+def test_ingest_given_scalar_time_coordinate(tmpdir):
+    path = str(tmpdir / "file.nc")
+    with netCDF4.Dataset(path, "w") as dataset:
+        dataset.createDimension("x", 2)
+        obj = dataset.createVariable("time", "d", ())
+        obj.units = UNITS
+        obj[:] = netCDF4.date2num(dt.datetime(2019, 1, 1), UNITS)
+        obj = dataset.createVariable("air_temperature", "f", ("x",))
+        obj.coordinates = "time"
+    database = forest.db.Database.connect(":memory:")
+    ingest.ingest(database, [path])
+    assert dump(database)["variable"] == [
+        ("air_temperature", None, None, path)]
+    assert dump(database)["time"] == [
+        ("air_temperature", 0, "2019-01-01 00:00:00")]
+
+
+def test_ingest_batches_files_into_transactions(tmpdir):
+    paths = []
+    for i in range(5):
+        path = str(tmpdir / "file-{}.nc".format(i))
+        write_file(path, dt.datetime(2019, 1, 1, i))
+        paths.append(path)
+    database = forest.db.Database.connect(":memory:")
+    calls = []
+    insert_headers = database.insert_headers
+
+    def spy(headers):
+        calls.append(len(headers))
+        return insert_headers(headers)
+
+    database.insert_headers = spy
+    assert ingest.ingest(database, paths, batch_size=2) == 5
+    assert calls == [2, 2, 1]
+    assert database.files() == sorted(paths)
+
+
+def test_ingest_reads_headers_in_process_pool(tmpdir):
+    paths = []
+    for i in range(ingest.PARALLEL_THRESHOLD):
+        path = str(tmpdir / "file-{}.nc".format(i))
+        write_file(path, dt.datetime(2019, 1, 1, i))
+        paths.append(path)
+    serial = forest.db.Database.connect(":memory:")
+    ingest.ingest(serial, paths, max_workers=0)
+    parallel = forest.db.Database.connect(":memory:")
+    ingest.ingest(parallel, paths, max_workers=2)
+    assert dump(parallel) == dump(serial)
+    assert len(dump(parallel)["file"]) == ingest.PARALLEL_THRESHOLD
+
+
+def test_ingest_reports_unreadable_files(tmpdir):
+    good = str(tmpdir / "good.nc")
+    bad = str(tmpdir / "missing.nc")
+    write_file(good)
+    database = forest.db.Database.connect(":memory:")
+    errors = []
+    count = ingest.ingest(database, [bad, good],
+                          on_error=lambda path, e: errors.append(path))
+    assert count == 1
+    assert errors == [bad]
+    assert database.files() == [good]
+
+
+def test_ingest_raises_errors_by_default(tmpdir):
+    database = forest.db.Database.connect(":memory:")
+    with pytest.raises(OSError):
+        ingest.ingest(database, [str(tmpdir / "missing.nc")])
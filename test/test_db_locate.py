@@ -122,3 +122,16 @@ class TestLocator(unittest.TestCase):
             pattern, variable, initial_time, valid_time, pressure)
         expect = ("file_000.nc", (0, 0))
         self.assertEqual(expect, result)
+
+
+def test_locator_file_names_given_registered_dataset():
+    database = db.Database.connect(":memory:")
+    for path in ["a/file.nc", "b/file.nc"]:
+        database.insert_file_name(path, "2020-01-01 00:00:00")
+        database.insert_time(path, "variable", "2020-01-01 00:00:00", 0)
+    database.insert_dataset("a/*.nc")
+    locator = db.Locator(database.connection)
+    assert locator.datasets == {"a/*.nc"}
+    result = locator.file_names("a/*.nc", "variable",
+                                "2020-01-01 00:00:00", "2020-01-01 00:00:00")
+    assert result == ["a/file.nc"]
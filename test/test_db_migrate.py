@@ -0,0 +1,38 @@
+import datetime as dt
+import sqlite3
+import forest.db
+import forest.db.migrate as migrate
+
+
+def test_main_registers_patterns_and_prints_benchmark(tmpdir, capsys):
+    path = str(tmpdir / "file.db")
+    with forest.db.Database.connect(path) as database:
+        database.insert_file_name("a/file.nc", dt.datetime(2020, 1, 1))
+        database.insert_times("a/file.nc", "air_temperature",
+                              [dt.datetime(2020, 1, 1, 1)])
+
+    migrate.main(["--database", path, "--pattern", "a/*.nc", "--benchmark"])
+
+    connection = sqlite3.connect(path)
+    rows = connection.execute("SELECT pattern FROM dataset").fetchall()
+    connection.close()
+    assert rows == [("a/*.nc",)]
+    out = capsys.readouterr().out
+    for name in ["valid_times", "pressures", "locate"]:
+        assert name + ":" in out
+
+
+def test_benchmark_locate_uses_indexes():
+    database = forest.db.Database.connect(":memory:")
+    for i in range(3):
+        path = "a/file-{}.nc".format(i)
+        database.insert_file_name(path, dt.datetime(2020, 1, 1, i))
+        database.insert_times(path, "air_temperature",
+                              [dt.datetime(2020, 1, 1, i + 1)])
+    migrate.migrate(database, ["a/*.nc"])
+    results = {r["name"]: r for r in migrate.benchmark(database, "a/*.nc")}
+    plan = " ".join(results["locate"]["plan"])
+    assert "GLOB" not in forest.db.Locator.file_names_query(indexed=True)
+    assert "USING" in plan
+    assert "SCAN f " not in plan + " "
+
@@ -5,7 +5,11 @@ import datetime as dt
 import bokeh.models
 import netCDF4
 import numpy as np
+import pandas as pd
+import forest.cache
 import forest.drivers
+import forest.geo
+import forest.pyramid
 from forest.drivers import eida50
 from forest.exceptions import FileNotFound, IndexNotFound
 
@@ -182,6 +186,32 @@ def test_loader_image(tmpdir):
     assert expect == result
 
 
+def test_loader_image_averages_only_selected_level(tmpdir, monkeypatch):
+    path = str(tmpdir / "file_20190417.nc")
+    with netCDF4.Dataset(path, "w") as dataset:
+        _eida50(dataset, TIMES, LONS, LATS)
+    monkeypatch.setattr(forest.cache, "IMAGE_CACHE",
+                        forest.cache.ImageCache())
+    monkeypatch.setattr(eida50, "IMAGE_CACHE", forest.cache.IMAGE_CACHE)
+    factors = []
+    block_average = forest.pyramid.block_average
+
+    def spy(values, factor):
+        factors.append(factor)
+        return block_average(values, factor)
+
+    monkeypatch.setattr(forest.pyramid, "block_average", spy)
+    loader = eida50.Loader(eida50.Locator(path, eida50.Database()))
+    time = dt.datetime(2019, 4, 17, 12)
+    x_start, x_end = forest.geo.web_mercator([-19, 53], [0, 0])[0]
+    viewport = (x_start, x_end, -1e7, 1e7, 45, 10)
+    loader._image(time, viewport)
+    loader._image(time, viewport)
+    assert factors == [4]
+    loader._image(time)
+    assert factors == [4]
+
+
 def test_loader_longitudes(tmpdir):
     path = str(tmpdir / "eida50_20190417.nc")
     with netCDF4.Dataset(path, "w") as dataset:
@@ -301,3 +331,97 @@ def test_database_insert_times_supported_types(value, expect):
     database = forest.drivers.eida50.Database()
     database.insert_times([value], "file.nc")
     assert database.fetch_times() == [expect]
+
+
+def _time_index(database=None, axes=None):
+    if database is None:
+        database = eida50.Database()
+    axes = axes or {}
+
+    def load_time_axis(path):
+        return np.array(axes[path], dtype="datetime64[s]")
+
+    return eida50.TimeIndex(database, load_time_axis,
+                            eida50.Locator.parse_date)
+
+
+def test_time_index_find_file():
+    index = _time_index()
+    index.on_change(["eida50_20200103.nc", "eida50_20200101.nc",
+                     "eida50_20200102.nc"], [])
+    assert index.find_file(dt.datetime(2020, 1, 2, 12)) == "eida50_20200102.nc"
+    assert index.find_file(dt.datetime(2020, 1, 1)) == "eida50_20200101.nc"
+    with pytest.raises(FileNotFound):
+        index.find_file(dt.datetime(2019, 12, 31))
+
+
+def test_time_index_merges_large_batches():
+    dates = pd.date_range("2020-01-01", periods=100, freq="15min")
+    paths = ["eida50_{:%Y%m%dT%H%MZ}.nc".format(date) for date in dates]
+    index = _time_index()
+    index.on_change(paths[50:60], [])
+    index.on_change(paths[::-1], [])
+    assert len(index) == 100
+    assert index._paths == paths
+    index.on_change([], paths[:40])
+    assert index._paths == paths[40:]
+    assert index.find_file(dates[60]) == paths[60]
+
+
+def test_time_index_remove_path():
+    index = _time_index()
+    index.on_change(["eida50_20200101.nc", "eida50_20200102.nc"], [])
+    index.on_change([], ["eida50_20200102.nc"])
+    assert len(index) == 1
+    assert index.find_file(dt.datetime(2020, 1, 3)) == "eida50_20200101.nc"
+
+
+def test_time_index_times_combines_axes_and_file_names():
+    path = "eida50_20200101.nc"
+    axes = {path: [dt.datetime(2020, 1, 1, 0, 15), dt.datetime(2020, 1, 1)]}
+    index = _time_index(axes=axes)
+    index.on_change([path, "eida50_20200102.nc"], [])
+    np.testing.assert_array_equal(
+        index.times(),
+        np.array(["2020-01-01", "2020-01-02"], dtype="datetime64[s]"))
+    index.insert_axis(path)
+    np.testing.assert_array_equal(
+        index.times(),
+        np.array(["2020-01-01 00:00", "2020-01-01 00:15", "2020-01-02"],
+                 dtype="datetime64[s]"))
+
+
+def test_time_index_loads_unparsed_files_into_database():
+    path = "unparsed.nc"
+    axes = {path: [dt.datetime(2020, 1, 1)]}
+    database = eida50.Database()
+    index = _time_index(database, axes)
+    index.on_change([path], [])
+    np.testing.assert_array_equal(
+        index.times(), np.array(["2020-01-01"], dtype="datetime64[s]"))
+    assert database.fetch_paths() == [path]
+
+
+def test_time_index_reads_axes_persisted_in_database(tmpdir):
+    path = "eida50_20200101.nc"
+    times = [dt.datetime(2020, 1, 1), dt.datetime(2020, 1, 1, 0, 15)]
+    database_path = str(tmpdir / "eida50.db")
+    with eida50.Database(database_path) as database:
+        _time_index(database, {path: times}).insert_axis(path)
+    with eida50.Database(database_path) as database:
+        index = _time_index(database)
+        np.testing.assert_array_equal(
+            index.axis(path), np.array(times, dtype="datetime64[s]"))
+
+
+def test_locator_find_given_index(tmpdir):
+    pattern = str(tmpdir / "eida50_*.nc")
+    for date in [dt.datetime(2019, 4, 17), dt.datetime(2019, 4, 18)]:
+        path = str(tmpdir / "eida50_{:%Y%m%d}.nc".format(date))
+        with netCDF4.Dataset(path, "w") as dataset:
+            _eida50(dataset, [date + dt.timedelta(minutes=15 * i)
+                              for i in range(4)])
+    locator = eida50.Locator(pattern, eida50.Database())
+    path, index = locator.find(None, dt.datetime(2019, 4, 18, 0, 30))
+    assert path == str(tmpdir / "eida50_20190418.nc")
+    assert index == 2
@@ -1,6 +1,8 @@
 import pytest
 import datetime as dt
 import bokeh.models
+import netCDF4
+import numpy as np
 import forest.drivers
 import forest.drivers.gpm
 
@@ -25,3 +27,77 @@ def test_locator_find_paths(paths, date, expect):
     window_size = dt.timedelta(days=1)
     locator = forest.drivers.gpm.Locator()
     assert list(locator.find_paths(paths, date, window_size)) == expect
+
+
+def write_gpm(path, date):
+    with netCDF4.Dataset(path, "w") as dataset:
+        dataset.createDimension("time", 48)
+        dataset.createDimension("longitude", 4)
+        dataset.createDimension("latitude", 3)
+        var = dataset.createVariable("time", "f8", ("time",))
+        var.units = "minutes since {:%Y-%m-%d %H:%M:%S}".format(date)
+        var[:] = np.arange(48) * 30
+        var = dataset.createVariable("longitude", "f4", ("longitude",))
+        var[:] = [30, 31, 32, 33]
+        var = dataset.createVariable("latitude", "f4", ("latitude",))
+        var[:] = [-1, 0, 1]
+        var = dataset.createVariable("precipitation_flux", "f4",
+                                     ("time", "latitude", "longitude"))
+        var[:] = np.arange(48)[:, None, None] * np.ones((48, 3, 4))
+
+
+@pytest.fixture
+def gpm_files(tmpdir):
+    paths = []
+    for day in (1, 2):
+        path = str(tmpdir / "gpm_imerg_202001{:02d}.nc".format(day))
+        write_gpm(path, dt.datetime(2020, 1, day))
+        paths.append(path)
+    return str(tmpdir / "gpm_imerg_*.nc"), paths
+
+
+def test_locator_find(gpm_files):
+    pattern, paths = gpm_files
+    locator = forest.drivers.gpm.Locator(pattern)
+    assert locator.find(dt.datetime(2020, 1, 2, 1, 30)) == (paths[1], 3)
+    assert locator.find(dt.datetime(2020, 1, 1, 23, 30)) == (paths[0], 47)
+    assert locator.find(dt.datetime(2020, 1, 1, 0, 15)) is None
+    assert locator.find(dt.datetime(2020, 1, 5)) is None
+
+
+def test_locator_shares_coordinates(gpm_files):
+    pattern, paths = gpm_files
+    locator = forest.drivers.gpm.Locator(pattern)
+    lons_0, lats_0 = locator.coordinates(paths[0])
+    lons_1, lats_1 = locator.coordinates(paths[1])
+    assert lons_0 is lons_1
+    assert lats_0 is lats_1
+
+
+def test_locator_on_change_removes_files(gpm_files):
+    pattern, paths = gpm_files
+    locator = forest.drivers.gpm.Locator(pattern)
+    assert list(locator.timestamps().values()) == paths
+    locator.on_change([], [paths[0]])
+    assert list(locator.timestamps().values()) == paths[1:]
+
+
+def test_navigator_valid_times(gpm_files):
+    pattern, paths = gpm_files
+    locator = forest.drivers.gpm.Locator(pattern)
+    navigator = forest.drivers.gpm.Navigator(pattern, locator)
+    assert navigator.valid_times() == [dt.datetime(2020, 1, 1),
+                                       dt.datetime(2020, 1, 2)]
+    result = navigator.valid_times(valid_times=[],
+                                   valid_time=dt.datetime(2020, 1, 1))
+    assert len(result) == 49
+
+
+def test_loader_load_image(gpm_files):
+    pattern, paths = gpm_files
+    locator = forest.drivers.gpm.Locator(pattern)
+    loader = forest.drivers.gpm._Loader(pattern, locator)
+    data = loader._load_image(dt.datetime(2020, 1, 1, 1))
+    assert np.nanmax(data["image"][0]) == 2
+    data = loader._load_image(dt.datetime(2021, 1, 1))
+    assert data == loader.empty_image
@@ -3,11 +3,13 @@ import pytest
 import unittest.mock
 from unittest.mock import Mock, sentinel, patch
 import bokeh.models
+import numpy as np
 import pandas as pd
 import pandas.testing as pdt
 import pygrib
 import forest.drivers
 import forest.map_view
+import forest.watch
 from forest.drivers import nearcast
 
 
@@ -24,15 +26,27 @@ def test_dataset_map_view():
     assert map_view.tooltips == forest.drivers.nearcast.NEARCAST_TOOLTIPS
 
 
-def make_open(names):
-    # Simulate pygrib.open(path).select() -> messages
-    def _open(path):
-        messages = unittest.mock.Mock()
-        messages.select.return_value = [
-            {"name": name} for name in names
-        ]
-        return messages
-    return _open
+@patch("forest.watch.WATCHER", forest.watch.Watcher())
+def test_dataset_shares_locator(tmpdir):
+    pattern = str(tmpdir / "NEARCAST_*_LAKEVIC_LATLON.GRIB2")
+    dataset = nearcast.Dataset(pattern=pattern)
+    navigators = [dataset.navigator() for _ in range(3)]
+    for navigator in navigators:
+        assert navigator.locator is dataset.loader.locator
+        navigator.pressures(None, "variable", "2020-01-01 00:00:00")
+    assert dataset.locator.catalogue._subscribers == [
+        dataset.locator.on_change]
+
+
+def make_index(names):
+    records = [{"name": name,
+                "level": 0,
+                "valid": "2020-01-01 00:00:00",
+                "units": "K",
+                "layer": "0.0-0.0",
+                "offset": 0,
+                "length": 0} for name in names]
+    return nearcast.GribIndex("some.grib", records)
 
 
 @pytest.mark.parametrize("names,expect", [
@@ -44,7 +58,8 @@ def test_navigator_variables(monkeypatch, names, expect):
     navigator = nearcast.Navigator(pattern)
     navigator.locator = unittest.mock.Mock()
     navigator.locator.find.return_value = ["some.grib"]
-    monkeypatch.setattr(pygrib, "open", make_open(names))
+    monkeypatch.setattr(nearcast, "read_index",
+                        lambda path, directory=None: make_index(names))
     assert navigator.variables(pattern) == expect
 
 
@@ -57,7 +72,8 @@ def test_navigator_initial_times_given_large_number_of_files():
                           freq="30min")
     paths = [f"NEARCAST_{time:%Y%m%d_%H%M}_LAKEVIC_LATLON.GRIB2"
              for time in times]
-    with unittest.mock.patch("forest.drivers.nearcast.glob") as glob:
+    with unittest.mock.patch("forest.watch.WATCHER", forest.watch.Watcher()), \
+            unittest.mock.patch("forest.watch.glob") as glob:
         glob.glob.return_value = paths
         navigator = nearcast.Navigator(pattern)
         result = pd.to_datetime(navigator.initial_times(pattern, variable))
@@ -65,10 +81,11 @@ def test_navigator_initial_times_given_large_number_of_files():
         pdt.assert_index_equal(expect, result)
 
 
-@patch("forest.drivers.nearcast.pg")
-@patch("forest.drivers.nearcast.glob")
-def test_navigator_valid_times_given_large_number_of_files(glob, pygrib):
-    """should only open one file to find valid dates"""
+@patch("forest.watch.WATCHER", forest.watch.Watcher())
+@patch("forest.drivers.nearcast.read_index")
+@patch("forest.watch.glob")
+def test_navigator_valid_times_given_large_number_of_files(glob, read_index):
+    """should only index one file to find valid dates"""
     pattern = "pattern"
     initial_time = "2020-01-01 03:30:00"
     times = pd.date_range("2020-01-01 00:00:00",
@@ -78,20 +95,137 @@ def test_navigator_valid_times_given_large_number_of_files(glob, pygrib):
              for time in times]
 
     glob.glob.return_value = paths
-    messages = Mock()
-    messages.select.return_value = [{
-        "validityDate": 20200101,
-        "validityTime": 330
-    }]
-    pygrib.index.return_value = messages
+    read_index.return_value = nearcast.GribIndex("file.grib", [{
+        "name": "variable",
+        "level": 0,
+        "valid": "2020-01-01 03:30:00",
+        "units": "K",
+        "layer": "0.0-0.0",
+        "offset": 0,
+        "length": 0
+    }])
 
-    navigator = nearcast.Navigator(sentinel.pattern)
+    navigator = nearcast.Navigator(pattern)
     result = navigator.valid_times(sentinel.pattern_not_used,
-                                   sentinel.variable,
+                                   "variable",
                                    initial_time)
 
-    glob.glob.assert_called_once_with(sentinel.pattern)
-    pygrib.index.assert_called_once_with(
-        "NEARCAST_20200101_0330_LAKEVIC_LATLON.GRIB2", "name")
-    messages.select.assert_called_once_with(name=sentinel.variable)
+    glob.glob.assert_called_once_with(pattern)
+    read_index.assert_called_once_with(
+        "NEARCAST_20200101_0330_LAKEVIC_LATLON.GRIB2", None)
     assert result == [dt.datetime(2020, 1, 1, 3, 30)]
+
+
+def grib_message(edition, body):
+    """Minimal GRIB indicator section, body and end section"""
+    length = 16 + len(body) + 4
+    if edition == 1:
+        header = b"GRIB" + length.to_bytes(3, "big") + bytes([1])
+        header += bytes(8)
+    else:
+        header = b"GRIB" + bytes([0, 0, 0, 2]) + length.to_bytes(8, "big")
+    return header + body + b"7777"
+
+
+def test_scan_finds_messages_and_skips_padding(tmpdir):
+    first = grib_message(2, b"abc")
+    second = grib_message(1, b"defgh")
+    path = str(tmpdir / "file.grib")
+    with open(path, "wb") as stream:
+        stream.write(first + b"padding" + second)
+    with open(path, "rb") as stream:
+        result = nearcast.scan(stream)
+    assert result == [(0, len(first)),
+                      (len(first) + 7, len(second))]
+
+
+def test_scan_given_empty_file(tmpdir):
+    path = str(tmpdir / "file.grib")
+    open(path, "wb").close()
+    with open(path, "rb") as stream:
+        assert nearcast.scan(stream) == []
+
+
+def fake_message(raw):
+    """Decode meta-data encoded in body of grib_message"""
+    name, level, time = raw[16:-4].decode().split(",")
+    return {
+        "name": name,
+        "validityDate": 20200101,
+        "validityTime": int(time),
+        "scaledValueOfFirstFixedSurface": int(level),
+        "scaleFactorOfFirstFixedSurface": 1,
+        "scaledValueOfSecondFixedSurface": 9,
+        "scaleFactorOfSecondFixedSurface": 1,
+        "units": "K",
+        "raw": raw
+    }
+
+
+@pytest.fixture
+def grib_file(tmpdir):
+    path = str(tmpdir / "NEARCAST_20200101_0000_LAKEVIC_LATLON.GRIB2")
+    with open(path, "wb") as stream:
+        for body in (b"A,8,0", b"A,8,30", b"B,7,0"):
+            stream.write(grib_message(2, body))
+    return path
+
+
+@patch("forest.drivers.nearcast.pg")
+def test_read_index(pg, grib_file):
+    pg.fromstring.side_effect = fake_message
+    index = nearcast.read_index(grib_file)
+    assert index.variables() == ["A", "B"]
+    assert index.valid_times("A") == [dt.datetime(2020, 1, 1, 0, 0),
+                                      dt.datetime(2020, 1, 1, 0, 30)]
+    assert index.pressures("B") == [7]
+    record = index.find("A", "8", "2020-01-01 00:30:00")
+    assert record["layer"] == "0.8-0.9"
+    assert index.message(record)["validityTime"] == 30
+    assert index.find("A", 7, "2020-01-01 00:30:00") is None
+
+
+@patch("forest.drivers.nearcast.pg")
+def test_read_index_saves_index_to_directory(pg, grib_file, tmpdir):
+    pg.fromstring.side_effect = fake_message
+    directory = str(tmpdir / "index")
+    expect = nearcast.read_index(grib_file, directory).records
+    nearcast._read_index.cache_clear()
+    pg.fromstring.reset_mock()
+    result = nearcast.read_index(grib_file, directory).records
+    pg.fromstring.assert_not_called()
+    assert result == expect
+
+
+@patch("forest.drivers.nearcast.pg")
+def test_read_index_given_modified_file(pg, grib_file):
+    pg.fromstring.side_effect = fake_message
+    assert nearcast.read_index(grib_file).variables() == ["A", "B"]
+    with open(grib_file, "ab") as stream:
+        stream.write(grib_message(2, b"C,1,0"))
+    assert nearcast.read_index(grib_file).variables() == ["A", "B", "C"]
+
+
+@patch("forest.drivers.nearcast.pg")
+def test_nearcast_get_grib2_data_reads_one_message(pg, grib_file):
+    message = Mock()
+    message.latlons.return_value = (np.zeros((2, 3)), np.zeros((2, 3)))
+    pg.fromstring.side_effect = fake_message
+    loader = nearcast.NearCast("")
+    nearcast.read_index(grib_file)
+    pg.fromstring.reset_mock(side_effect=True)
+    pg.fromstring.return_value = message
+    result = loader.get_grib2_data(grib_file, "2020-01-01 00:30:00", "A", 8)
+    pg.fromstring.assert_called_once_with(
+        grib_message(2, b"A,8,30"))
+    assert result["valid"] == "00:30 UTC"
+    assert result["layer"] == "0.8-0.9"
+    assert result["data"] == message.values
+
+
+def test_nearcast_get_grib2_data_given_missing_message(grib_file):
+    loader = nearcast.NearCast("")
+    with patch("forest.drivers.nearcast.pg") as pg:
+        pg.fromstring.side_effect = fake_message
+        with pytest.raises(ValueError):
+            loader.get_grib2_data(grib_file, "2020-01-01 00:00:00", "C", 8)
@@ -1,6 +1,11 @@
+import os
 import datetime as dt
 import pytest
 import bokeh.models
+import numpy as np
+import xarray
+import forest.geo
+import forest.handles
 import forest.drivers
 from forest.drivers import saf
 
@@ -82,3 +87,122 @@ def test_file_name_locator(paths, date, expect):
     locator = saf.Locator(pattern, )
     frequency = dt.timedelta(minutes=15)
     assert list(locator.find_paths(paths, date, frequency)) == expect
+
+
+def write_saf(path, value):
+    lons, lats = np.meshgrid(np.linspace(0, 10, 6), np.linspace(0, 5, 4))
+    lons[0, 0] = np.nan
+    lats[0, 0] = np.nan
+    ct = np.full(lons.shape, value, dtype="f4")
+    ct[1, 1] = np.nan
+    dataset = xarray.Dataset({
+        "ct": (("ny", "nx"), ct, {"long_name": "Cloud Type",
+                                  "units": "1"})
+    }, coords={
+        "lon": (("ny", "nx"), lons),
+        "lat": (("ny", "nx"), lats),
+    })
+    dataset.to_netcdf(path)
+
+
+@pytest.fixture
+def saf_files(tmpdir):
+    paths = []
+    for minute, value in ((0, 1.), (15, 2.)):
+        path = str(tmpdir /
+                   "S_NWC_CT_MSG4_GuineaCoast-VISIR_20191021T13{:02d}00Z.nc"
+                   .format(minute))
+        write_saf(path, value)
+        paths.append(path)
+    return str(tmpdir / "S_NWC_CT_*.nc"), paths
+
+
+def test_locator_find_file(saf_files):
+    pattern, paths = saf_files
+    locator = saf.Locator(pattern)
+    frequency = dt.timedelta(minutes=15)
+    assert locator.find_file(dt.datetime(2019, 10, 21, 13, 20),
+                             frequency) == paths[1]
+    assert locator.find_file(dt.datetime(2019, 10, 21, 13, 0),
+                             frequency) == paths[0]
+    assert locator.find_file(dt.datetime(2019, 10, 21, 12, 59),
+                             frequency) is None
+    assert locator.find_file(dt.datetime(2019, 10, 21, 13, 30),
+                             frequency) is None
+
+
+def test_locator_indexes_each_file_once(saf_files):
+    pattern, paths = saf_files
+    locator = saf.Locator(pattern)
+    locator.sync()
+    assert [path for _, path in locator._index] == paths
+    os.remove(paths[1])
+    locator.catalogue.rescan()
+    assert locator.find_file(dt.datetime(2019, 10, 21, 13, 20),
+                             dt.timedelta(minutes=15)) is None
+
+
+def test_locator_ignores_files_without_dates(saf_files, tmpdir):
+    pattern, paths = saf_files
+    path = str(tmpdir / "S_NWC_CT_undated.nc")
+    write_saf(path, 3.)
+    locator = saf.Locator(pattern)
+    locator.sync()
+    assert [path for _, path in locator._index] == paths
+    os.remove(path)
+    locator.catalogue.rescan()
+    assert [path for _, path in locator._index] == paths
+
+
+def test_locator_geometry_shared_by_region(saf_files):
+    pattern, paths = saf_files
+    locator = saf.Locator(pattern)
+    assert locator.geometry(paths[0]) is locator.geometry(paths[1])
+
+
+@pytest.mark.parametrize("path,expect", [
+    ("S_NWC_CTTH_MSG4_GuineaCoast-VISIR_20191021T134500Z.nc",
+     "MSG4_GuineaCoast-VISIR"),
+    ("/data/other.nc", "/data/other.nc"),
+])
+def test_locator_geometry_name(path, expect):
+    assert saf.Locator.geometry_name(path) == expect
+
+
+def test_loader_load_image(saf_files):
+    pattern, paths = saf_files
+    loader = saf.Loader(saf.Locator(pattern))
+    data = loader._load_image("Cloud Type", dt.datetime(2019, 10, 21, 13, 20))
+    with xarray.open_dataset(paths[1]) as nc:
+        expect = forest.geo.stretch_image(
+            np.ma.masked_invalid(nc["lon"].values),
+            np.ma.masked_invalid(nc["lat"].values),
+            np.ma.masked_invalid(nc["ct"].values))
+    for key in ("x", "y", "dw", "dh"):
+        np.testing.assert_allclose(data[key], expect[key])
+    np.testing.assert_array_equal(data["image"][0], expect["image"][0])
+    assert data["name"] == ["Cloud Type"]
+    assert data["units"] == ["1"]
+
+
+def test_loader_load_image_opens_file_once(saf_files, monkeypatch):
+    pattern, paths = saf_files
+    loader = saf.Loader(saf.Locator(pattern))
+    loader._load_image("Cloud Type", dt.datetime(2019, 10, 21, 13, 20))
+    opened = []
+    open_xarray = forest.handles.open_xarray
+
+    def spy(path):
+        opened.append(path)
+        return open_xarray(path)
+
+    monkeypatch.setattr(forest.handles, "open_xarray", spy)
+    loader._load_image("Cloud Type", dt.datetime(2019, 10, 21, 13, 20))
+    assert opened == [paths[1]]
+
+
+def test_loader_load_image_given_unknown_variable(saf_files):
+    pattern, paths = saf_files
+    loader = saf.Loader(saf.Locator(pattern))
+    data = loader._load_image("Unknown", dt.datetime(2019, 10, 21, 13, 20))
+    assert data["image"] == []
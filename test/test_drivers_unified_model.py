@@ -1,7 +1,11 @@
 import pytest
+import glob
+import unittest.mock
 import datetime as dt
 import bokeh.models
+import numpy as np
 import forest.drivers
+import forest.geo
 from forest.drivers import unified_model
 import forest.db
 import sqlite3
@@ -105,6 +109,34 @@ def test_load_image(tmpdir):
     assert data["image"][0].shape == (2, 2)
 
 
+def test_load_image_given_viewport(tmpdir):
+    path = str(tmpdir / "file.nc")
+    variable = "air_temperature"
+    lons, lats = np.arange(0, 10, 1.), np.arange(0, 10, 1.)
+    with netCDF4.Dataset(path, "w") as dataset:
+        insert_lonlat(dataset, lons, lats)
+        var = dataset.createVariable(variable, "f", ("latitude", "longitude"))
+        var[:] = np.arange(100).reshape(10, 10)
+    x, y = forest.geo.web_mercator([2.5, 4.5], [2.5, 4.5])
+    viewport = (x[0], x[1], y[0], y[1], 100, 100)
+    data = unified_model.Loader.load_image(path, variable, (),
+                                           viewport=viewport)
+    assert data["image"][0].shape == (4, 4)
+
+
+def test_load_image_given_viewport_outside_field(tmpdir):
+    path = str(tmpdir / "file.nc")
+    variable = "air_temperature"
+    with netCDF4.Dataset(path, "w") as dataset:
+        insert_lonlat(dataset, [0, 1], [0, 1])
+        var = dataset.createVariable(variable, "f", ("latitude", "longitude"))
+    x, y = forest.geo.web_mercator([50, 60], [50, 60])
+    viewport = (x[0], x[1], y[0], y[1], 100, 100)
+    data = unified_model.Loader.load_image(path, variable, (),
+                                           viewport=viewport)
+    assert data["image"] == []
+
+
 def test_iris_load(tmpdir):
     path = str(tmpdir / "file.nc")
     variable = "air_temperature"
@@ -116,6 +148,135 @@ def test_iris_load(tmpdir):
     assert names == [variable]
 
 
+def test_coordinate_index_entry(tmpdir):
+    path = str(tmpdir / "file.nc")
+    variable = "air_temperature"
+    times = [dt.datetime(1970, 1, 1), dt.datetime(1970, 1, 1, 3)]
+    with netCDF4.Dataset(path, "w") as dataset:
+        insert_lonlat(dataset, [0, 1], [0, 1])
+        insert_times(dataset, times)
+        dataset.createVariable(variable, "f", ("time", "longitude", "latitude"))
+    index = unified_model.CoordinateIndex()
+    entry = index.entry(path)
+    assert entry["variables"][variable] == {"time": (0, "time")}
+    assert entry["coordinates"]["time"].tolist() == times
+
+
+def test_coordinate_index_persists_entries(tmpdir):
+    path = str(tmpdir / "file.nc")
+    index_path = str(tmpdir / "index.db")
+    variable = "air_temperature"
+    times = [dt.datetime(2020, 1, 1)]
+    with netCDF4.Dataset(path, "w") as dataset:
+        insert_lonlat(dataset, [0, 1], [0, 1])
+        insert_times(dataset, times)
+        dataset.createVariable(variable, "f", ("time", "longitude", "latitude"))
+    unified_model.CoordinateIndex(index_path).entry(path)
+    with unittest.mock.patch.object(unified_model, "read_coordinates") as read:
+        entry = unified_model.CoordinateIndex(index_path).entry(path)
+    read.assert_not_called()
+    assert entry["coordinates"]["time"].tolist() == times
+
+
+def test_coordinate_index_given_modified_file(tmpdir):
+    path = str(tmpdir / "file.nc")
+    index = unified_model.CoordinateIndex()
+    with netCDF4.Dataset(path, "w") as dataset:
+        insert_lonlat(dataset, [0, 1], [0, 1])
+    assert "air_temperature" not in index.entry(path)["variables"]
+    with netCDF4.Dataset(path, "a") as dataset:
+        dataset.createVariable("air_temperature", "f", ("longitude", "latitude"))
+    assert "air_temperature" in index.entry(path)["variables"]
+
+
+def test_locator_locate_reads_header_once(tmpdir):
+    path = str(tmpdir / "file.nc")
+    variable = "air_temperature"
+    times = [dt.datetime(1970, 1, 1), dt.datetime(1970, 1, 1, 3)]
+    with netCDF4.Dataset(path, "w") as dataset:
+        insert_lonlat(dataset, [0, 1], [0, 1])
+        insert_times(dataset, times)
+        dataset.createVariable(variable, "f", ("time", "longitude", "latitude"))
+    locator = unified_model.Locator([path])
+    with unittest.mock.patch.object(unified_model, "read_coordinates") as read:
+        for time in times:
+            locator.locate(path, variable, times[0], time)
+    read.assert_not_called()
+    assert locator.locate(path, variable, times[0], times[1]) == (path, (1,))
+
+
+def write_forecast(path, initial_time, times, variable="air_temperature"):
+    units = "hours since 1970-01-01 00:00:00"
+    with netCDF4.Dataset(path, "w") as dataset:
+        insert_lonlat(dataset, [0, 1], [0, 1])
+        dataset.createDimension("time", len(times))
+        var = dataset.createVariable("forecast_reference_time", "d", ())
+        var.units = units
+        var[:] = netCDF4.date2num(initial_time, units=units)
+        var = dataset.createVariable("time", "d", ("time",))
+        var.units = units
+        var[:] = netCDF4.date2num(times, units=units)
+        var = dataset.createVariable("air_temp", "f",
+                                     ("time", "longitude", "latitude"))
+        var.standard_name = variable
+        var.coordinates = "forecast_reference_time"
+
+
+@pytest.fixture
+def forecasts(tmpdir):
+    runs = {
+        dt.datetime(2020, 1, 1): [dt.datetime(2020, 1, 1, h)
+                                  for h in (0, 3)],
+        dt.datetime(2020, 1, 2): [dt.datetime(2020, 1, 2, h)
+                                  for h in (0, 3, 6)],
+    }
+    for initial_time, times in runs.items():
+        path = str(tmpdir / "file_{:%Y%m%d}.nc".format(initial_time))
+        write_forecast(path, initial_time, times)
+    return str(tmpdir / "file_*.nc"), runs
+
+
+def test_navigator_variables_uses_cube_names(forecasts):
+    pattern, _ = forecasts
+    navigator = unified_model.Navigator(pattern)
+    assert navigator.variables(pattern) == ["air_temperature"]
+
+
+def test_navigator_initial_times(forecasts):
+    pattern, runs = forecasts
+    navigator = unified_model.Navigator(pattern)
+    assert navigator.initial_times(pattern, None) == list(runs.keys())
+
+
+@pytest.mark.parametrize("variable", ["air_temperature", "air_temp"])
+def test_navigator_valid_times_given_initial_time(forecasts, variable):
+    pattern, runs = forecasts
+    navigator = unified_model.Navigator(pattern)
+    for initial_time, times in runs.items():
+        result = navigator.valid_times(pattern, variable, initial_time)
+        assert result.astype(dt.datetime).tolist() == times
+
+
+def test_navigator_reads_headers_once(forecasts):
+    pattern, runs = forecasts
+    navigator = unified_model.Navigator(pattern)
+    navigator.variables(pattern)
+    with unittest.mock.patch.object(unified_model, "read_coordinates") as read:
+        navigator.initial_times(pattern, None)
+        navigator.valid_times(pattern, "air_temperature", None)
+        navigator.pressures(pattern, "air_temperature", None)
+    read.assert_not_called()
+
+
+def test_coordinate_index_entries_in_process_pool(forecasts):
+    pattern, runs = forecasts
+    paths = sorted(glob.glob(pattern))
+    index = unified_model.CoordinateIndex()
+    with unittest.mock.patch.object(unified_model, "PARALLEL_THRESHOLD", 1):
+        entries = index.entries(paths, max_workers=2)
+    assert [entries[path]["initial_time"] for path in paths] == list(runs)
+
+
 def insert_times(dataset, times):
     if "time" not in dataset.dimensions:
         dataset.createDimension("time", len(times))
@@ -136,3 +297,57 @@ def insert_lonlat(dataset, lons, lats):
     var[:] = lons
     var = dataset.createVariable("latitude", "f", ("latitude",))
     var[:] = lats
+
+
+def test_sync_inserts_new_files_and_reports_progress(forecasts, tmpdir):
+    pattern, runs = forecasts
+    database_path = str(tmpdir / "database.db")
+    forest.db.Database.connect(database_path).close()
+    sync = unified_model.Sync(database_path, pattern, str(tmpdir))
+    calls = []
+    assert sync(progress=lambda *args: calls.append(args)) == len(runs)
+    assert calls == [(len(runs), len(runs))]
+    assert sync() == 0
+
+
+def test_sync_records_malformed_files_and_continues(forecasts, tmpdir,
+                                                   monkeypatch):
+    pattern, runs = forecasts
+    database_path = str(tmpdir / "database.db")
+    forest.db.Database.connect(database_path).close()
+    bad_path = str(tmpdir / "file_20200101.nc")
+    read_header = forest.db.ingest.read_header
+
+    def fake_read_header(path):
+        if path == bad_path:
+            raise KeyError("malformed")
+        return read_header(path)
+
+    monkeypatch.setattr(forest.db.ingest, "read_header", fake_read_header)
+    sync = unified_model.Sync(database_path, pattern, str(tmpdir))
+    assert sync() == len(runs) - 1
+    connection = sqlite3.connect(database_path)
+    health_db = forest.db.health.HealthDB(connection)
+    assert health_db.error_files(pattern) == [bad_path]
+    connection.close()
+    assert sync() == 0
+
+
+def test_dataset_refresh_finds_synced_files(forecasts, tmpdir):
+    pattern, runs = forecasts
+    database_path = str(tmpdir / "database.db")
+    forest.db.Database.connect(database_path).close()
+    dataset = unified_model.Dataset(pattern=pattern,
+                                    locator="database",
+                                    database_path=database_path,
+                                    directory=str(tmpdir))
+    initial_time = dt.datetime(2020, 1, 1)
+    valid_time = dt.datetime(2020, 1, 1, 3)
+    assert dataset.locator.file_names(
+        pattern, "air_temp", initial_time, valid_time) == []
+    dataset.sync()
+    dataset.refresh()
+    assert pattern in dataset.database.datasets
+    assert dataset.locator.file_names(
+        pattern, "air_temp", initial_time, valid_time) == [
+            str(tmpdir / "file_20200101.nc")]
@@ -2,11 +2,12 @@ import pytest
 from unittest.mock import sentinel, Mock
 import bokeh.palettes
 import pandas as pd
-import pandas.testing as pdt
 import datetime as dt
 import numpy as np
 import glob
+import os
 import forest.drivers
+import forest.geo
 from forest.drivers import earth_networks
 
 
@@ -41,6 +42,20 @@ def test_dataset():
     assert isinstance(dataset, forest.drivers.earth_networks.Dataset)
 
 
+def test_dataset_map_views_share_aggregator():
+    dataset = earth_networks.Dataset(pattern="*.txt", max_megabytes=64)
+    views = [dataset.map_view() for _ in range(2)]
+    assert views[0].aggregator is views[1].aggregator is dataset.aggregator
+    assert dataset.aggregator.loader is dataset.loader
+    assert dataset.aggregator.max_bytes == 64 * 1024 ** 2
+
+
+def test_dataset_default_max_megabytes():
+    dataset = earth_networks.Dataset(pattern="*.txt", max_megabytes=None)
+    expect = earth_networks.DEFAULT_MAX_MEGABYTES * 1024 ** 2
+    assert dataset.aggregator.max_bytes == expect
+
+
 def get_navigator(settings):
     dataset = forest.drivers.get_dataset("earth_networks", settings)
     return dataset.navigator()
@@ -63,39 +78,52 @@ def test_navigator_variables():
     ])
 
 
-def test_view_render_density():
-    locator = Mock(specs=["find"])
-    loader = Mock(specs=["load"])
-    loader.load.return_value = pd.DataFrame({
-        "flash_type": [],
-        "longitude": [],
-        "latitude": [],
-    })
-    view = earth_networks.View(loader, locator)
+def flash_files(tmpdir):
+    """Two cloud-ground flashes and one intra-cloud flash"""
+    path = str(tmpdir / "flash_20190417T0000.txt")
+    write_csv(path, ["0,20190417T000500.000,+01.0,+031.0",
+                     "0,20190417T001000.000,+01.0,+031.0",
+                     "1,20190417T001500.000,+02.0,+032.0"])
+    locator = Mock(specs=["find_period"])
+    locator.find_period.return_value = [path]
+    return earth_networks.Loader(), locator
+
+
+def test_view_render_density(tmpdir):
+    view = earth_networks.View(*flash_files(tmpdir))
     view.render({
         "variable": "Strike density (cloud-ground)",
-        "valid_time": "1970-01-01T00:00:00Z"
+        "valid_time": "2019-04-17T00:00:00"
     })
     expect = bokeh.palettes.all_palettes["Spectral"][8]
     assert view.color_mappers["image"].palette == expect
+    image = view.sources["image"].data["image"][0]
+    assert image.sum() == 2
+    assert image.count() == 1
 
 
-def test_view_render_time_since_flash():
-    locator = Mock(specs=["find"])
-    loader = Mock(specs=["load"])
-    loader.load.return_value = pd.DataFrame({
-        "date": [],
-        "flash_type": [],
-        "longitude": [],
-        "latitude": [],
-    })
-    view = earth_networks.View(loader, locator)
+def test_view_render_time_since_flash(tmpdir):
+    view = earth_networks.View(*flash_files(tmpdir))
     view.render({
         "variable": "Time since flash (cloud-ground)",
-        "valid_time": "1970-01-01T00:00:00Z"
+        "valid_time": "2019-04-17T00:00:00"
     })
     expect = bokeh.palettes.all_palettes["RdGy"][8]
     assert view.color_mappers["image"].palette == expect
+    image = view.sources["image"].data["image"][0]
+    assert image.count() == 1
+    assert image.max() == 600
+
+
+def test_view_scatter(tmpdir):
+    view = earth_networks.View(*flash_files(tmpdir))
+    view.render({
+        "variable": "Lightning",
+        "valid_time": "2019-04-17T00:00:00"
+    })
+    data = view.sources["scatter"].data
+    assert list(data["time_since_flash"]) == [300., 600., 900.]
+    assert list(data["flash_type"]) == ["CG", "CG", "IC"]
 
 
 @pytest.mark.parametrize("variable, expect", [
@@ -131,10 +159,251 @@ def test_view_formatters(variable, expect):
     assert earth_networks.View.formatters(variable) == expect
 
 
-def test_view_since_flash():
-    view = earth_networks.View(Mock(), Mock())
-    strike_times = ["2020-01-01T00:00:00Z", "2020-01-01T01:00:00Z"]
-    period_start = "2020-01-01T00:00:00Z"
-    result = view.since_flash(strike_times, period_start)
-    expect = pd.Series([0., 3600.])
-    pdt.assert_series_equal(result, expect)
+def write_csv(path, lines):
+    with open(path, "w") as stream:
+        stream.write("\n".join(lines) + "\n")
+
+
+def test_loader_sorts_by_date_and_categorises_flash_type(tmpdir):
+    path = str(tmpdir / "sample.txt")
+    write_csv(path, [
+        "0,20190417T000002.000,+02.0,+031.0",
+        "1,20190417T000001.000,+03.0,+032.0",
+        "9,20190417T000003.000,+04.0,+033.0",
+    ])
+    frame = earth_networks.Loader().load(path)
+    assert frame["flash_type"].tolist() == ["IC", "CG", "Keep alive"]
+    assert frame["latitude"].tolist() == [3., 2., 4.]
+    assert frame["date"].is_monotonic_increasing
+
+
+def test_loader_cache_directory(tmpdir):
+    path = str(tmpdir / "flash_20190417T0000.txt")
+    cache_directory = str(tmpdir / "cache")
+    write_csv(path, ["0,20190417T000500.000,+01.0,+031.0"])
+    loader = earth_networks.Loader(cache_directory=cache_directory)
+    frame = loader.load(path)
+    cache_path = loader.cache_path(path)
+    assert os.path.dirname(cache_path) == cache_directory
+    assert os.path.exists(cache_path)
+    assert frame["latitude"].tolist() == [1.]
+    table = np.load(cache_path)
+    assert table.dtype == earth_networks.DTYPE
+
+
+def test_loader_cache_directory_converts_modified_files(tmpdir):
+    path = str(tmpdir / "flash_20190417T0000.txt")
+    cache_directory = str(tmpdir / "cache")
+    write_csv(path, ["0,20190417T000500.000,+01.0,+031.0"])
+    loader = earth_networks.Loader(cache_directory=cache_directory)
+    loader.load(path)
+    write_csv(path, ["0,20190417T000500.000,+01.0,+031.0",
+                     "1,20190417T000600.000,+02.0,+031.0"])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert len(loader.load(path)) == 2
+    assert os.listdir(cache_directory) == [
+        os.path.basename(loader.cache_path(path))]
+
+
+def test_loader_cache_directory_converts_older_files(tmpdir):
+    path = str(tmpdir / "flash_20190417T0000.txt")
+    cache_directory = str(tmpdir / "cache")
+    write_csv(path, ["0,20190417T000500.000,+01.0,+031.0"])
+    loader = earth_networks.Loader(cache_directory=cache_directory)
+    loader.load(path)
+    stat = os.stat(path)
+    write_csv(path, ["0,20190417T000500.000,+01.0,+031.0",
+                     "1,20190417T000600.000,+02.0,+031.0"])
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+    assert len(loader.load(path)) == 2
+
+
+def test_loader_cache_directory_given_same_file_names(tmpdir):
+    cache_directory = str(tmpdir / "cache")
+    paths = []
+    for directory, latitude in [("a", "+01.0"), ("b", "+02.0")]:
+        tmpdir.mkdir(directory)
+        path = str(tmpdir / directory / "flash_20190417T0000.txt")
+        write_csv(path, ["0,20190417T000500.000,{},+031.0".format(latitude)])
+        paths.append(path)
+    loader = earth_networks.Loader(cache_directory=cache_directory)
+    assert loader.load(paths[0])["latitude"].tolist() == [1.]
+    assert loader.load(paths[1])["latitude"].tolist() == [2.]
+    other = earth_networks.Loader(cache_directory=cache_directory)
+    assert other.load(paths[0])["latitude"].tolist() == [1.]
+
+
+@pytest.mark.parametrize("minutes,window,expect", [
+    pytest.param(0, 60, [0, 1, 2], id="whole hour"),
+    pytest.param(5, 10, [0, 1], id="overlap previous file"),
+    pytest.param(10, 10, [1], id="aligned"),
+    pytest.param(50, 60, [2], id="after last file"),
+    pytest.param(-60, 30, [], id="before first file"),
+])
+def test_locator_find_period(tmpdir, minutes, window, expect):
+    paths = [str(tmpdir / "flash_20190417T00{:02d}.txt".format(minute))
+             for minute in (0, 10, 20)]
+    for path in paths:
+        write_csv(path, [])
+    locator = earth_networks.TimestampLocator(str(tmpdir / "*.txt"))
+    date = dt.datetime(2019, 4, 17) + dt.timedelta(minutes=minutes)
+    result = locator.find_period(date, dt.timedelta(minutes=window))
+    assert result == [paths[i] for i in expect]
+
+
+def test_locator_find_period_across_days():
+    locator = earth_networks.TimestampLocator(None)
+    paths = ["flash_20190416T2350.txt", "flash_20190418T0010.txt"]
+    locator.on_change(paths, [])
+    result = locator.find_period(dt.datetime(2019, 4, 18),
+                                 dt.timedelta(minutes=60))
+    assert result == paths
+
+
+def test_locator_on_change():
+    locator = earth_networks.TimestampLocator(None)
+    locator.on_change(["flash_20190417T0010.txt",
+                       "flash_20190417T0000.txt"], [])
+    assert locator.find(dt.datetime(2019, 4, 17, 0, 10)) == [
+        "flash_20190417T0010.txt"]
+    locator.on_change([], ["flash_20190417T0010.txt"])
+    assert locator.find(dt.datetime(2019, 4, 17, 0, 10)) == []
+    assert list(locator.valid_times()) == [pd.Timestamp("2019-04-17")]
+    locator.on_change([], ["flash_20190417T0000.txt"])
+    assert locator.valid_times() == []
+
+
+def test_locator_keeps_whole_archive():
+    locator = earth_networks.TimestampLocator(None)
+    start = dt.datetime(2019, 1, 1)
+    dates = [start + dt.timedelta(hours=i) for i in range(2000)]
+    locator.on_change(["flash_{:%Y%m%dT%H%M}.txt".format(date)
+                       for date in dates], [])
+    assert len(locator.valid_times()) == 2000
+    assert locator.find(start) == ["flash_20190101T0000.txt"]
+
+
+@pytest.mark.parametrize("start,end,expect", [
+    pytest.param((0, 0), (0, 15), [(0, 5), (5, 10), (10, 15)],
+                 id="aligned"),
+    pytest.param((0, 2), (0, 11), [(2, 5), (5, 10), (10, 11)],
+                 id="unaligned"),
+    pytest.param((0, 58), (1, 3), [(58, 60), (60, 63)], id="hour boundary"),
+])
+def test_aggregator_intervals(start, end, expect):
+    def date(hours, minutes):
+        return dt.datetime(2019, 4, 17, hours, minutes)
+    aggregator = earth_networks.Aggregator(Mock(), Mock())
+    result = aggregator.intervals(date(*start), date(*end))
+    minute = dt.timedelta(minutes=1)
+    assert result == [(date(0, 0) + a * minute, date(0, 0) + b * minute)
+                      for a, b in expect]
+
+
+def aggregator_fixture(tmpdir):
+    paths = [str(tmpdir / "flash_20190417T0000.txt"),
+             str(tmpdir / "flash_20190417T0030.txt")]
+    write_csv(paths[0], [
+        "0,20190417T000100.000,+00.0,+030.0",
+        "1,20190417T001200.000,+00.0,+030.0",
+        "0,20190417T002200.000,-05.0,+035.0",
+    ])
+    write_csv(paths[1], [
+        "0,20190417T003100.000,+00.0,+030.0",
+        "1,20190417T005900.000,-05.0,+035.0",
+    ])
+    locator = earth_networks.TimestampLocator(None)
+    locator.on_change(paths, [])
+    loader = earth_networks.Loader()
+    return earth_networks.Aggregator(loader, locator)
+
+
+def test_aggregator_window_count(tmpdir):
+    aggregator = aggregator_fixture(tmpdir)
+    agg = aggregator.window(dt.datetime(2019, 4, 17),
+                            dt.timedelta(minutes=60))
+    assert agg.values.sum() == 5
+    assert agg.values.max() == 3
+    agg = aggregator.window(dt.datetime(2019, 4, 17),
+                            dt.timedelta(minutes=60), flash_type="CG")
+    assert agg.values.sum() == 3
+
+
+def test_aggregator_window_latest(tmpdir):
+    aggregator = aggregator_fixture(tmpdir)
+    start = dt.datetime(2019, 4, 17)
+    agg = aggregator.window(start, dt.timedelta(minutes=30),
+                            metric="latest")
+    expect = (dt.datetime(2019, 4, 17, 0, 22) -
+              dt.datetime(1970, 1, 1)).total_seconds()
+    assert np.nanmax(agg.values) == expect
+    assert np.sum(np.isfinite(agg.values)) == 2
+
+
+def test_aggregator_reuses_sub_interval_grids(tmpdir):
+    aggregator = aggregator_fixture(tmpdir)
+    aggregator.loader = Mock(wraps=aggregator.loader)
+    aggregator.window(dt.datetime(2019, 4, 17), dt.timedelta(minutes=60))
+    calls = aggregator.loader.load_table.call_count
+    aggregator.window(dt.datetime(2019, 4, 17, 0, 15),
+                      dt.timedelta(minutes=60))
+    assert aggregator.loader.load_table.call_count == calls + 3
+
+
+def test_aggregator_evicts_least_recently_used_grids(tmpdir):
+    aggregator = aggregator_fixture(tmpdir)
+    grid = aggregator.grid(dt.datetime(2019, 4, 17),
+                           dt.datetime(2019, 4, 17, 0, 5))
+    aggregator.max_bytes = 2 * grid.nbytes
+    starts = [dt.datetime(2019, 4, 17, 0, minute) for minute in (5, 0, 10)]
+    for start in starts:
+        aggregator.grid(start, start + aggregator.interval)
+    assert aggregator._nbytes <= aggregator.max_bytes
+    assert [key[0] for key in aggregator._grids] == starts[1:]
+
+
+def test_morton():
+    result = earth_networks._morton([0, 1, 0, 1, 2, 3], [0, 0, 1, 1, 0, 3])
+    assert result.tolist() == [0, 1, 2, 3, 4, 15]
+
+
+@pytest.mark.parametrize("x_range,y_range", [
+    pytest.param((-1e6, 1e6), (-1e6, 1e6), id="small box"),
+    pytest.param((-2e7, 2e7), (-2e7, 2e7), id="whole world"),
+    pytest.param((5e6, 6e6), (5e6, 6e6), id="empty box"),
+])
+@pytest.mark.parametrize("start,stop", [
+    pytest.param(100, 900, id="long period"),
+    pytest.param(100, 110, id="short period"),
+])
+def test_morton_index_query(x_range, y_range, start, stop):
+    random = np.random.RandomState(0)
+    x = random.uniform(-4e6, 4e6, 1000)
+    y = random.uniform(-4e6, 4e6, 1000)
+    index = earth_networks.MortonIndex(x, y)
+    rows = index.query(x_range, y_range, start, stop)
+    inside = ((x >= x_range[0]) & (x <= x_range[1]) &
+              (y >= y_range[0]) & (y <= y_range[1]))
+    expect = np.flatnonzero(inside)
+    expect = expect[(expect >= start) & (expect < stop)]
+    assert set(expect) <= set(rows)
+    assert np.all(np.diff(rows) > 0)
+    assert np.all((rows >= start) & (rows < stop))
+
+
+def test_aggregator_window_given_viewport(tmpdir):
+    aggregator = aggregator_fixture(tmpdir)
+    (x_start, x_end), (y_start, y_end) = forest.geo.web_mercator(
+        (29, 31), (-1, 1))
+    viewport = (x_start, x_end, y_start, y_end, 64, 32)
+    agg = aggregator.window(dt.datetime(2019, 4, 17),
+                            dt.timedelta(minutes=60), viewport=viewport)
+    assert agg.shape == (32, 64)
+    assert agg.values.sum() == 3
+
+
+def test_aggregator_extent_limits_pixels():
+    aggregator = earth_networks.Aggregator(Mock(), Mock())
+    extent = aggregator.extent((0, 1, 0, 1, 8192, 4096))
+    assert extent == ((0, 1), (0, 1), 2048, 1024)
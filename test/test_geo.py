@@ -0,0 +1,52 @@
+import pytest
+import numpy as np
+from forest import geo
+
+
+def test_snap_viewport_given_none():
+    assert geo.snap_viewport(None) is None
+
+
+def test_snap_viewport_given_missing_values():
+    viewport = {"x_start": 0, "x_end": 1, "y_start": None, "y_end": 1,
+                "width": 100, "height": 100}
+    assert geo.snap_viewport(viewport) is None
+
+
+def test_snap_viewport_nearby_viewports_share_result():
+    viewport = {"x_start": 1e5, "x_end": 2e5, "y_start": 1e5, "y_end": 2e5,
+                "width": 500, "height": 500}
+    shifted = dict(viewport, x_start=1.01e5, x_end=2.01e5)
+    assert geo.snap_viewport(viewport) == geo.snap_viewport(shifted)
+
+
+def test_snap_viewport_contains_viewport():
+    viewport = {"x_start": 1e5, "x_end": 2e5, "y_start": 1e5, "y_end": 2e5,
+                "width": 500, "height": 500}
+    x_start, x_end, y_start, y_end, width, height = geo.snap_viewport(
+        viewport)
+    assert x_start <= 1e5 < 2e5 <= x_end
+    assert y_start <= 1e5 < 2e5 <= y_end
+    assert width >= 500
+    assert height >= 500
+
+
+@pytest.mark.parametrize("values,start,end,pixels,expect", [
+    ([0, 1, 2, 3, 4], 1.5, 2.5, 10, slice(1, 4, 1)),
+    ([0, 1, 2, 3, 4], -10, 10, 10, slice(0, 5, 1)),
+    ([0, 1, 2, 3, 4], 10, 20, 10, slice(0, 0)),
+    ([4, 3, 2, 1, 0], 1.5, 2.5, 10, slice(1, 4, 1)),
+    (np.arange(100), 0, 99, 10, slice(0, 100, 8)),
+])
+def test_axis_slice(values, start, end, pixels, expect):
+    assert geo.axis_slice(values, start, end, pixels) == expect
+
+
+def test_viewport_slices_given_0_360_longitudes():
+    lons = np.arange(0, 360, 1.)
+    lats = np.arange(-90, 91, 1.)
+    x, y = geo.web_mercator([350, 355], [10, 20])
+    viewport = (x[0], x[1], y[0], y[1], 1000, 1000)
+    lat_slice, lon_slice = geo.viewport_slices(lons, lats, viewport)
+    assert lons[lon_slice][0] <= 350 and lons[lon_slice][-1] >= 355
+    assert lats[lat_slice][0] <= 10 and lats[lat_slice][-1] >= 20
@@ -2,12 +2,32 @@ from datetime import datetime
 from unittest.mock import Mock, call, patch, sentinel
 import unittest
 
+import dask.array
 import iris
+import iris.coords
+import iris.cube
 import numpy as np
 
+import forest.geo
+from forest.cache import ImageCache
 from forest.drivers import ghrsstl4
 
 
+def make_cube():
+    """Lazy 10 degree global SST field"""
+    time = iris.coords.DimCoord([0], 'time',
+                                units='hours since 2020-01-01 00:00:00')
+    lat = iris.coords.DimCoord(np.arange(-85., 90., 10.), 'latitude',
+                               units='degrees')
+    lon = iris.coords.DimCoord(np.arange(-175., 180., 10.), 'longitude',
+                               units='degrees')
+    data = dask.array.from_array(np.arange(18 * 36.).reshape(1, 18, 36),
+                                 chunks=(1, 6, 6))
+    return iris.cube.Cube(data, 'sea_surface_temperature', units='K',
+                          dim_coords_and_dims=[(time, 0), (lat, 1),
+                                               (lon, 2)])
+
+
 class Test_empty_image(unittest.TestCase):
     def test(self):
         result = ghrsstl4.empty_image()
@@ -128,11 +148,8 @@ class Test_load(unittest.TestCase):
 
 
 class Test_ImageLoader(unittest.TestCase):
-    @patch('forest.drivers.ghrsstl4._load')
-    def test_init(self, load):
-        load.return_value = sentinel.cubes
-        result = ghrsstl4.ImageLoader(sentinel.label, sentinel.pattern)
-        load.assert_called_once_with(sentinel.pattern)
+    def test_init(self):
+        result = ghrsstl4.ImageLoader(sentinel.label, sentinel.cubes)
         self.assertEqual(result._label, sentinel.label)
         self.assertEqual(result._cubes, sentinel.cubes)
 
@@ -158,49 +175,83 @@ class Test_ImageLoader(unittest.TestCase):
         original_cube.extract.assert_called_once_with(sentinel.constraint)
         self.assertEqual(result, sentinel.empty_image)
 
+    @patch('forest.drivers.ghrsstl4.IMAGE_CACHE', ImageCache())
     @patch('forest.drivers.ghrsstl4.coordinates')
     @patch('forest.geo.stretch_image')
-    @patch('iris.Constraint')
-    @patch('forest.drivers.ghrsstl4._to_datetime')
-    def test_image(self, to_datetime, constraint, stretch_image, coordinates):
-        # To avoid re-testing the constructor, just make a fake ImageLoader
-        # instance.
-        cube = Mock()
-        cube.coord.side_effect = [Mock(points=sentinel.longitudes),
-                                  Mock(points=sentinel.latitudes)]
-        cube.units.__str__ = lambda self: 'my-units'
-        original_cube = Mock()
-        original_cube.extract.return_value = cube
-        image_loader = Mock(_cubes={'foo': original_cube}, _label='my-label')
-
-        to_datetime.return_value = sentinel.valid_datetime
-        constraint.return_value = sentinel.constraint
+    def test_image(self, stretch_image, coordinates):
+        cube = make_cube()
+        image_loader = ghrsstl4.ImageLoader('my-label', {'foo': cube})
         stretch_image.return_value = {'stretched_image': True}
         coordinates.return_value = {'coordinates': True}
 
-        result = ghrsstl4.ImageLoader.image(
-            image_loader, Mock(variable='foo', valid_time=sentinel.valid,
-                               initial_time=sentinel.initial,
-                               pressures=sentinel.pressures,
-                               pressure=sentinel.pressure))
-
-        self.assertEqual(cube.coord.mock_calls, [call('longitude'),
-                                                 call('latitude')])
-        stretch_image.assert_called_once_with(sentinel.longitudes,
-                                              sentinel.latitudes, cube.data)
-        coordinates.assert_called_once_with(sentinel.valid, sentinel.initial,
+        result = image_loader.image(
+            Mock(variable='foo', valid_time=datetime(2020, 1, 1),
+                 initial_time=sentinel.initial,
+                 pressures=sentinel.pressures,
+                 pressure=sentinel.pressure,
+                 viewport=None))
+
+        (lons, lats, values), _ = stretch_image.call_args
+        np.testing.assert_array_equal(lons, cube.coord('longitude').points)
+        np.testing.assert_array_equal(lats, cube.coord('latitude').points)
+        np.testing.assert_array_equal(values, cube[0].data)
+        coordinates.assert_called_once_with(datetime(2020, 1, 1),
+                                            sentinel.initial,
                                             sentinel.pressures,
                                             sentinel.pressure)
         self.assertEqual(result, {'stretched_image': True, 'coordinates': True,
-                                  'name': ['my-label'], 'units': ['my-units']})
+                                  'name': ['my-label'], 'units': ['K']})
+
+    @patch('forest.drivers.ghrsstl4.IMAGE_CACHE', ImageCache())
+    @patch('forest.geo.stretch_image')
+    def test_image_reads_viewport_window(self, stretch_image):
+        cube = make_cube()
+        image_loader = ghrsstl4.ImageLoader('my-label', {'foo': cube})
+        stretch_image.return_value = {}
+        x, y = forest.geo.web_mercator([10, 20], [10, 20])
+        viewport = {'x_start': x[0], 'x_end': x[1],
+                    'y_start': y[0], 'y_end': y[1],
+                    'width': 4, 'height': 4}
+
+        image_loader.image(Mock(variable='foo',
+                                valid_time=datetime(2020, 1, 1),
+                                initial_time=datetime(2020, 1, 1),
+                                pressures=[], pressure=None,
+                                viewport=viewport))
+
+        (lons, lats, values), _ = stretch_image.call_args
+        self.assertTrue(0 < len(lons) < 36)
+        self.assertTrue(0 < len(lats) < 18)
+        self.assertTrue(lons.min() <= 10 and lons.max() >= 20)
+        self.assertEqual(values.shape, (len(lats), len(lons)))
+        self.assertTrue(cube.has_lazy_data())
+
+    @patch('forest.drivers.ghrsstl4.IMAGE_CACHE', ImageCache())
+    def test_image_outside_field(self):
+        cube = make_cube()[:, :2, :2]
+        image_loader = ghrsstl4.ImageLoader('my-label', {'foo': cube})
+        x, y = forest.geo.web_mercator([150, 160], [60, 70])
+        viewport = {'x_start': x[0], 'x_end': x[1],
+                    'y_start': y[0], 'y_end': y[1],
+                    'width': 4, 'height': 4}
+        result = image_loader.image(Mock(variable='foo',
+                                         valid_time=datetime(2020, 1, 1),
+                                         viewport=viewport))
+        self.assertEqual(result, ghrsstl4.empty_image())
+
+
+class Test_window(unittest.TestCase):
+    def test_whole_field_given_no_viewport(self):
+        lons = np.linspace(-180, 180, 3600)
+        lats = np.linspace(-90, 90, 1800)
+        lat_slice, lon_slice = ghrsstl4.window(lons, lats, None)
+        self.assertEqual(len(lons[lon_slice]), 900)
+        self.assertEqual(len(lats[lat_slice]), 900)
 
 
 class Test_Navigator(unittest.TestCase):
-    @patch('forest.drivers.ghrsstl4._load')
-    def test_init(self, load):
-        load.return_value = sentinel.cubes
-        result = ghrsstl4.Navigator(sentinel.paths)
-        load.assert_called_once_with(sentinel.paths)
+    def test_init(self):
+        result = ghrsstl4.Navigator(sentinel.cubes)
         self.assertEqual(result._cubes, sentinel.cubes)
 
     def test_variables(self):
@@ -0,0 +1,128 @@
+import os
+import threading
+import netCDF4
+import pytest
+import forest.handles
+from forest.handles import HandlePool
+
+
+def write(path, values=(1, 2, 3)):
+    with netCDF4.Dataset(path, "w") as dataset:
+        dataset.createDimension("x", len(values))
+        var = dataset.createVariable("x", "f", ("x",))
+        var[:] = values
+
+
+def test_pool_reuses_open_handle(tmpdir):
+    path = str(tmpdir / "file.nc")
+    write(path)
+    pool = HandlePool()
+    with pool.open(path, netCDF4.Dataset) as first:
+        pass
+    with pool.open(path, netCDF4.Dataset) as second:
+        assert second.variables["x"][:].tolist() == [1, 2, 3]
+    assert first is second
+    assert pool.stats()["opens"] == 1
+    assert pool.stats()["reuses"] == 1
+
+
+def test_pool_reopens_modified_file(tmpdir):
+    path = str(tmpdir / "file.nc")
+    write(path)
+    pool = HandlePool()
+    with pool.open(path, netCDF4.Dataset) as first:
+        pass
+    write(str(tmpdir / "new.nc"), values=(4, 5, 6, 7))
+    os.replace(str(tmpdir / "new.nc"), path)
+    with pool.open(path, netCDF4.Dataset) as second:
+        assert second.variables["x"][:].tolist() == [4, 5, 6, 7]
+    assert not first.isopen()
+    assert pool.stats()["invalidations"] == 1
+    assert pool.stats()["opens"] == 2
+
+
+def test_pool_evicts_least_recently_used(tmpdir):
+    paths = [str(tmpdir / "file-{}.nc".format(i)) for i in range(3)]
+    for path in paths:
+        write(path)
+    pool = HandlePool(max_handles=2)
+    handles = []
+    for path in paths:
+        with pool.open(path, netCDF4.Dataset) as handle:
+            handles.append(handle)
+    assert len(pool) == 2
+    assert not handles[0].isopen()
+    assert handles[2].isopen()
+    assert pool.stats()["evictions"] == 1
+
+
+def test_pool_defers_closing_handles_in_use(tmpdir):
+    paths = [str(tmpdir / "file-{}.nc".format(i)) for i in range(2)]
+    for path in paths:
+        write(path)
+    pool = HandlePool(max_handles=1)
+    with pool.open(paths[0], netCDF4.Dataset) as handle:
+        with pool.open(paths[1], netCDF4.Dataset):
+            pass
+        assert handle.isopen()
+    assert not handle.isopen()
+
+
+def test_pool_given_max_handles_zero_closes_files(tmpdir):
+    path = str(tmpdir / "file.nc")
+    write(path)
+    pool = HandlePool(max_handles=0)
+    with pool.open(path, netCDF4.Dataset) as handle:
+        pass
+    assert not handle.isopen()
+    assert len(pool) == 0
+
+
+def test_pool_given_missing_file(tmpdir):
+    pool = HandlePool()
+    with pytest.raises(OSError):
+        with pool.open(str(tmpdir / "missing.nc"), netCDF4.Dataset):
+            pass
+    assert len(pool) == 0
+
+
+def test_pool_does_not_keep_failed_opens(tmpdir):
+    path = str(tmpdir / "file.nc")
+    with open(path, "w") as stream:
+        stream.write("not netcdf")
+    pool = HandlePool()
+    with pytest.raises(OSError):
+        with pool.open(path, netCDF4.Dataset):
+            pass
+    assert len(pool) == 0
+
+
+def test_pool_serialises_access_to_a_handle(tmpdir):
+    path = str(tmpdir / "file.nc")
+    write(path)
+    pool = HandlePool()
+    active = []
+    overlaps = []
+
+    def read():
+        for _ in range(20):
+            with pool.open(path, netCDF4.Dataset) as dataset:
+                active.append(1)
+                overlaps.append(len(active))
+                dataset.variables["x"][:]
+                active.pop()
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(overlaps) == 1
+    assert pool.stats()["opens"] == 1
+
+
+def test_open_xarray(tmpdir):
+    path = str(tmpdir / "file.nc")
+    write(path)
+    with forest.handles.open_xarray(path) as dataset:
+        assert dataset["x"].values.tolist() == [1, 2, 3]
@@ -7,6 +7,16 @@ import forest
 from forest import main
 
 
+@pytest.fixture(autouse=True)
+def reset_thread_pools():
+    """main() configures process-wide pools, restore library defaults"""
+    yield
+    forest.map_view.RENDER_POOL.configure(0)
+    forest.prefetch.PREFETCHER.configure(depth=0)
+    forest.watch.WATCHER.stop()
+    forest.handles.POOL.resize(forest.handles.DEFAULT_MAX_HANDLES)
+
+
 def test_main_given_rdt_files(tmp_path):
     rdt_file = tmp_path / "file_202001010000.json"
     with rdt_file.open("w") as stream:
@@ -0,0 +1,124 @@
+import datetime as dt
+import threading
+import unittest.mock
+import pytest
+import numpy as np
+import bokeh.models
+import forest.map_view
+from forest import db
+
+
+def image(value):
+    return {"x": [0], "y": [0], "dw": [1], "dh": [1],
+            "image": [np.full((2, 2), value)]}
+
+
+class Loader:
+    """Loader that blocks until released"""
+    def __init__(self):
+        self.events = {}
+
+    def image(self, state):
+        self.events.setdefault(state.valid_time, threading.Event()).wait(5)
+        return image(state.valid_time.hour)
+
+    def release(self, valid_time):
+        self.events.setdefault(valid_time, threading.Event()).set()
+
+
+class Document:
+    def __init__(self):
+        self.callbacks = []
+
+    def add_next_tick_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def run(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+def loaded(view):
+    """Semaphore released once view handled each background result"""
+    semaphore = threading.Semaphore(0)
+    on_loaded = view._on_loaded
+
+    def wrapper(*args):
+        on_loaded(*args)
+        semaphore.release()
+
+    view._on_loaded = wrapper
+    return semaphore
+
+
+@pytest.fixture
+def render_pool():
+    pool = forest.map_view.RenderPool(max_workers=2)
+    with unittest.mock.patch("forest.map_view.RENDER_POOL", pool):
+        yield pool
+    pool.configure(0)
+
+
+@pytest.fixture
+def document():
+    document = Document()
+    with unittest.mock.patch("bokeh.plotting.curdoc", return_value=document):
+        yield document
+
+
+def test_image_view_render_synchronous():
+    loader = unittest.mock.Mock()
+    loader.image.return_value = image(1)
+    view = forest.map_view.ImageView(loader, bokeh.models.LinearColorMapper())
+    view.render({"valid_time": dt.datetime(2020, 1, 1, 1)})
+    assert view.source.data["image"][0][0, 0] == 1
+
+
+def test_image_view_render_applies_result_on_next_tick(render_pool,
+                                                       document):
+    loader = Loader()
+    view = forest.map_view.ImageView(loader, bokeh.models.LinearColorMapper())
+    done = loaded(view)
+    view.render({"valid_time": dt.datetime(2020, 1, 1, 1)})
+    loader.release(dt.datetime(2020, 1, 1, 1))
+    assert done.acquire(timeout=5)
+    assert view.source.data["image"] == []
+    document.run()
+    assert view.source.data["image"][0][0, 0] == 1
+
+
+def test_image_view_render_drops_out_of_order_results(render_pool,
+                                                      document):
+    loader = Loader()
+    view = forest.map_view.ImageView(loader, bokeh.models.LinearColorMapper())
+    done = loaded(view)
+    view.render({"valid_time": dt.datetime(2020, 1, 1, 1)})
+    view.render({"valid_time": dt.datetime(2020, 1, 1, 2)})
+    loader.release(dt.datetime(2020, 1, 1, 2))
+    assert done.acquire(timeout=5)
+    document.run()
+    loader.release(dt.datetime(2020, 1, 1, 1))
+    assert done.acquire(timeout=5)
+    document.run()
+    assert view.generation == 2
+    assert view.source.data["image"][0][0, 0] == 2
+
+
+def test_image_view_skips_identical_images():
+    cached = image(1)
+    loader = unittest.mock.Mock()
+    loader.image.return_value = cached
+    view = forest.map_view.ImageView(loader, bokeh.models.LinearColorMapper())
+    view.render({"valid_time": dt.datetime(2020, 1, 1, 1)})
+    view.source.data = {"x": [], "y": [], "dw": [], "dh": [], "image": []}
+    loader.image.return_value = dict(cached)
+    view.render({"valid_time": dt.datetime(2020, 1, 1, 2)})
+    assert view.source.data["image"] == []
+
+
+def test_image_view_compares_arrays_by_identity():
+    old = image(1)
+    assert forest.map_view.ImageView._same_data(old, dict(old))
+    assert not forest.map_view.ImageView._same_data(old, image(1))
+    assert not forest.map_view.ImageView._same_data(None, old)
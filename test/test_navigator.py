@@ -68,11 +68,10 @@ def test_Navigator_pressures():
 
 
 @patch('forest.drivers.gridded_forecast.Navigator')
-@patch('forest.drivers.gridded_forecast._load')
-@patch('forest.drivers.gridded_forecast.glob.glob')
-def test_drivers__get_dataset_from__griddedforecast(glob, _load, navigator_cls):
+@patch('forest.drivers.gridded_forecast.CubeCatalogue')
+def test_drivers__get_dataset_from__griddedforecast(catalogue_cls, navigator_cls):
     navigator_cls.return_value = sentinel.navigator
-    _load.return_value = sentinel.cubes
+    catalogue_cls.return_value = sentinel.cubes
 
     dataset = forest.drivers.gridded_forecast.Dataset("gridded_forecast", sentinel.settings)
     navigator = dataset.navigator()
@@ -0,0 +1,95 @@
+import datetime as dt
+import threading
+import pytest
+from forest import db, prefetch
+
+
+def state(valid_time=None, valid_times=None, pressure=None, pressures=None):
+    return db.State(valid_time=valid_time,
+                    valid_times=valid_times,
+                    pressure=pressure,
+                    pressures=pressures)
+
+
+TIMES = [dt.datetime(2020, 1, 1, hour) for hour in range(6)]
+
+
+def test_neighbours_valid_times_nearest_first():
+    result = prefetch.neighbours(state(TIMES[2], TIMES), 2)
+    assert [s.valid_time for s in result.values()] == [
+        TIMES[3], TIMES[1], TIMES[4], TIMES[0]]
+
+
+def test_neighbours_valid_times_wrap_around():
+    result = prefetch.neighbours(state(TIMES[5], TIMES), 1)
+    assert [s.valid_time for s in result.values()] == [TIMES[0], TIMES[4]]
+
+
+def test_neighbours_pressures():
+    result = prefetch.neighbours(state(TIMES[0], [TIMES[0]],
+                                       850., [1000., 850., 500.]), 2)
+    assert [s.pressure for s in result.values()] == [1000., 500.]
+
+
+def test_neighbours_given_unknown_time():
+    result = prefetch.neighbours(state("2020", TIMES), 2)
+    assert result == {}
+
+
+def test_neighbours_given_no_times():
+    assert prefetch.neighbours(state(), 2) == {}
+
+
+def test_neighbours_sorts_each_list_once():
+    times = list(TIMES)
+    assert prefetch._sorted(times) is prefetch._sorted(times)
+    assert prefetch._sorted(list(reversed(TIMES))) == TIMES
+
+
+def test_neighbours_given_float_pressure_within_tolerance():
+    result = prefetch.neighbours(state(TIMES[0], [TIMES[0]],
+                                       850.0000001, [1000., 850., 500.]), 2)
+    assert [s.pressure for s in result.values()] == [1000., 500.]
+
+
+def test_prefetcher_disabled_by_default():
+    calls = []
+    prefetcher = prefetch.Prefetcher()
+    prefetcher.schedule(object(), calls.append, state(TIMES[2], TIMES))
+    assert calls == []
+    assert prefetcher.queue_depth == 0
+
+
+def test_prefetcher_loads_neighbours():
+    loaded = []
+    done = threading.Event()
+
+    def load(s):
+        loaded.append(s.valid_time)
+        if len(loaded) == 2:
+            done.set()
+
+    prefetcher = prefetch.Prefetcher(depth=1, max_workers=1)
+    prefetcher.schedule(object(), load, state(TIMES[2], TIMES))
+    assert done.wait(timeout=5)
+    assert sorted(loaded) == [TIMES[1], TIMES[3]]
+
+
+def test_prefetcher_cancels_stale_loads():
+    times = [dt.datetime(2020, 1, 1, hour) for hour in range(12)]
+    release = threading.Event()
+    loaded = []
+
+    def load(s):
+        release.wait(timeout=5)
+        loaded.append(s.valid_time)
+
+    owner = object()
+    prefetcher = prefetch.Prefetcher(depth=1, max_workers=1)
+    prefetcher.schedule(owner, load, state(times[2], times))
+    assert prefetcher.queue_depth == 2
+    prefetcher.schedule(owner, load, state(times[8], times))
+    release.set()
+    prefetcher._executor.shutdown(wait=True)
+    assert prefetcher.queue_depth == 0
+    assert sorted(loaded) == [times[3], times[7], times[9]]
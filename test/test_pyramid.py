@@ -0,0 +1,102 @@
+import pytest
+import numpy as np
+from forest import pyramid, geo
+
+
+def test_block_average_ignores_masked_values():
+    values = np.ma.masked_array([[1., 2.], [3., 100.]],
+                                mask=[[False, False], [False, True]])
+    result = pyramid.block_average(values, 2)
+    np.testing.assert_array_almost_equal(result, [[2.]])
+
+
+def test_block_average_partial_blocks():
+    values = np.ones((3, 5))
+    result = pyramid.block_average(values, 2)
+    assert result.shape == (2, 3)
+    np.testing.assert_array_equal(result, 1.)
+
+
+def test_block_average_all_nan_block_is_masked():
+    values = np.full((2, 2), np.nan)
+    result = pyramid.block_average(values, 2)
+    assert result.mask.all()
+
+
+def test_pyramid_levels():
+    lons, lats = np.arange(16.), np.arange(8.)
+    values = np.zeros((8, 16))
+    levels = pyramid.Pyramid(lons, lats, values)
+    assert levels.factors == [1, 2, 4]
+    lons, lats, values = levels.level(4)
+    np.testing.assert_array_equal(lons, [1.5, 5.5, 9.5, 13.5])
+    np.testing.assert_array_equal(lats, [1.5, 5.5])
+    assert values.shape == (2, 4)
+
+
+@pytest.mark.parametrize("plot_width,plot_height,expect", [
+    (1, 1, 4),
+    (4, 2, 4),
+    (5, 2, 2),
+    (8, 4, 2),
+    (16, 8, 1),
+    (100, 100, 1),
+])
+def test_pyramid_factor(plot_width, plot_height, expect):
+    levels = pyramid.Pyramid(np.arange(16.), np.arange(8.),
+                             np.zeros((8, 16)))
+    assert levels.factor(plot_width, plot_height) == expect
+
+
+@pytest.mark.parametrize("plot_width,plot_height", [
+    (1, 1), (5, 2), (7, 3), (16, 8), (100, 100),
+])
+def test_overview_matches_pyramid_select(plot_width, plot_height):
+    lons, lats = np.arange(15.), np.arange(7.)
+    values = np.arange(105.).reshape(7, 15)
+    expect = pyramid.Pyramid(lons, lats, values).select(plot_width,
+                                                        plot_height)
+    result = pyramid.overview(lons, lats, values, plot_width, plot_height)
+    for a, b in zip(result, expect):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_pyramid_nbytes():
+    values = np.zeros((8, 8))
+    levels = pyramid.Pyramid(np.arange(8.), np.arange(8.), values,
+                             factors=(1, 2))
+    assert levels.nbytes == (2 * 8 + 64) * 8
+    levels.level(2)
+    assert levels.nbytes == (2 * 8 + 64 + 2 * 4 + 16) * 8
+
+
+def test_pyramid_computes_levels_once_on_first_use(monkeypatch):
+    factors = []
+    block_average = pyramid.block_average
+
+    def spy(values, factor):
+        factors.append(factor)
+        return block_average(values, factor)
+
+    monkeypatch.setattr(pyramid, "block_average", spy)
+    levels = pyramid.Pyramid(np.arange(16.), np.arange(8.),
+                             np.zeros((8, 16)))
+    assert factors == []
+    levels.select(4, 2)
+    levels.select(4, 2)
+    assert factors == [4]
+    with pytest.raises(KeyError):
+        levels.level(8)
+
+
+def test_plot_size_given_no_viewport():
+    result = pyramid.plot_size([0, 1], [0, 1], None)
+    assert result == (pyramid.DEFAULT_PIXELS, pyramid.DEFAULT_PIXELS)
+
+
+def test_plot_size_given_viewport_twice_field_size():
+    x, y = geo.web_mercator([-10, 30], [-10, 30])
+    viewport = (x[0], x[1], y[0], y[1], 400, 400)
+    result = pyramid.plot_size([0, 20], [0, 20], viewport)
+    assert result[0] == 200
+    assert 190 < result[1] < 210
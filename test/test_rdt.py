@@ -6,7 +6,10 @@ import os
 import glob
 import json
 import numpy as np
+import netCDF4
 import forest.drivers
+import forest.geo
+import forest.watch
 from forest.drivers import rdt
 from forest import (
         locate)
@@ -26,7 +29,8 @@ def test_dataset_navigator_valid_times():
     settings = {"pattern": pattern}
     dataset = forest.drivers.get_dataset("rdt", settings)
     navigator = dataset.navigator()
-    with patch("forest.drivers.rdt.glob") as glob:
+    with patch("forest.watch.WATCHER", forest.watch.Watcher()), \
+            patch("forest.watch.glob") as glob:
         glob.glob.return_value = ["rdt_202001010000.json"]
         assert navigator.valid_times() == [dt.datetime(2020, 1, 1)]
 
@@ -42,10 +46,8 @@ def test_loader(tmpdir):
     with open(path, "w") as stream:
         stream.write(content)
     loader = rdt.Loader(path)
-    json_texts = loader.load_date(dt.datetime(2020, 1, 1))
-    polygons = json_texts[0]
-    result = json.loads(polygons)
-    assert result == {"features": []}
+    polygons = loader.load_date(dt.datetime(2020, 1, 1))[0]
+    assert polygons == {"xs": [], "ys": []}
 
 
 @pytest.mark.parametrize("state", [
@@ -108,3 +110,149 @@ def test_in_bounds_given_point_outside_bounds():
     result = locate.in_bounds(bounds, time)
     expect = [False]
     np.testing.assert_array_equal(expect, result)
+
+
+@pytest.fixture
+def rdt_netcdf(tmpdir):
+    path = str(tmpdir / "S_NWC_RDT-CW_MSG1_EAfrica-VISIR_20200101T000000Z.nc")
+    fill = -999.
+    with netCDF4.Dataset(path, "w") as dataset:
+        dataset.createDimension("recNUM", 2)
+        dataset.createDimension("nlevel", 2)
+        dataset.createDimension("nbptcont", 4)
+        dataset.createDimension("nbpttraj", 3)
+        for name in ("LatContour", "LonContour"):
+            var = dataset.createVariable(
+                name, "f4", ("recNUM", "nlevel", "nbptcont"),
+                fill_value=fill)
+            offset = 30. if name == "LonContour" else 0.
+            values = np.full((2, 2, 4), fill)
+            values[0, :, :] = offset + np.array([0., 1., 1., 0.])
+            values[1, :, :3] = offset + np.array([2., 3., 2.])
+            var[:] = values
+        for name, offset in (("LatG", 0.5), ("LonG", 30.5)):
+            var = dataset.createVariable(name, "f4", ("recNUM", "nlevel"))
+            var[:] = offset + np.array([[0., 0.], [2., 2.]])
+        for name, offset in (("LatTrajCellCG", 0.), ("LonTrajCellCG", 30.)):
+            var = dataset.createVariable(name, "f4", ("recNUM", "nbpttraj"),
+                                         fill_value=fill)
+            var[:] = offset + np.array([[0., .1, fill - offset],
+                                        [2., 2.1, 2.2]])
+        var = dataset.createVariable("DTimeTraj", "i4",
+                                     ("recNUM", "nbpttraj"))
+        var[:] = [[0, 900, 0], [0, 900, 1800]]
+        for name in ("BTempTraj", "BTminTraj", "BaseAreaTraj",
+                     "TopAreaTraj", "CoolingRateTraj", "ExpanRateTraj",
+                     "SpeedTraj", "DirTraj"):
+            var = dataset.createVariable(name, "f4", ("recNUM", "nbpttraj"))
+            var[:] = [[1., 2., 3.], [4., 5., 6.]]
+        for name, values in (("MvtSpeed", [10., 0.]),
+                             ("MvtDirection", [90., 0.]),
+                             ("NumIdCell", [1, 2]),
+                             ("NumIdBirth", [1, 2]),
+                             ("PhaseLife", [2, 3]),
+                             ("CTPressure", [20000., 30000.])):
+            dtype = "i4" if isinstance(values[0], int) else "f4"
+            var = dataset.createVariable(name, dtype, ("recNUM",))
+            var[:] = values
+    return path
+
+
+def test_read_netcdf_polygons(rdt_netcdf):
+    polygons, _, _, _ = rdt.read_netcdf(rdt_netcdf)
+    expect = json.loads(rdt.getRDT(rdt_netcdf, 0, "Polygon"))
+    assert len(polygons["xs"]) == len(expect["features"])
+    for i, feature in enumerate(expect["features"]):
+        x, y = np.array(feature["geometry"]["coordinates"][0]).T
+        np.testing.assert_allclose(polygons["xs"][i], x)
+        np.testing.assert_allclose(polygons["ys"][i], y)
+        for key, value in feature["properties"].items():
+            if key != "CTPressure":
+                assert polygons[key][i] == value, key
+    assert polygons["PhaseLife"] == ["Growing", "Mature"]
+    assert list(polygons["CTPressure"]) == [200, 300]
+
+
+def test_read_netcdf_tail_points(rdt_netcdf):
+    _, _, tail_points, _ = rdt.read_netcdf(rdt_netcdf)
+    expect = rdt.getRDT(rdt_netcdf, 0, "Tail_Points")
+    for key in ("x", "y", "NumIdCell"):
+        np.testing.assert_allclose(tail_points[key],
+                                   np.array(expect[key], dtype="f8"))
+    np.testing.assert_allclose(tail_points["DTimeTraj"],
+                               [0, 900, 0, 900, 1800])
+
+
+def test_read_netcdf_tail_lines(rdt_netcdf):
+    _, tail_lines, _, _ = rdt.read_netcdf(rdt_netcdf)
+    expect = rdt.getRDT(rdt_netcdf, 0, "Tail_Lines")
+    for i in range(2):
+        np.testing.assert_allclose(tail_lines["xs"][i], expect["xs"][i])
+        np.testing.assert_allclose(tail_lines["ys"][i], expect["ys"][i])
+    assert len(tail_lines["DTimeTraj"][0]) == 2
+    assert len(tail_lines["DTimeTraj"][1]) == 3
+
+
+def test_read_netcdf_centre_points(rdt_netcdf):
+    _, _, _, centre_points = rdt.read_netcdf(rdt_netcdf)
+    expect = rdt.getRDT(rdt_netcdf, 0, "Centre_Point")
+    for key in ("x1", "y1", "x2", "y2", "xs", "ys", "Arrowxs", "Arrowys",
+                "MvtSpeed", "NumIdCell"):
+        result = np.array(centre_points[key], dtype="f8")
+        np.testing.assert_allclose(
+            result, np.array(expect[key], dtype="f8").reshape(result.shape))
+
+
+def test_view_render_netcdf(rdt_netcdf):
+    view = rdt.View(rdt.Loader(rdt_netcdf))
+    view.render({"valid_time": dt.datetime(2020, 1, 1)})
+    assert len(view.source.data["xs"]) == 2
+    assert len(view.tail_point_source.data["x"]) == 5
+
+
+SAMPLE_JSON = os.path.join(os.path.dirname(__file__),
+                           "sample/RDT_features_eastafrica_201904171245.json")
+
+
+def test_read_json():
+    with open(SAMPLE_JSON) as stream:
+        features = json.load(stream)["features"]
+    polygons, tail_lines, tail_points, centre_points = rdt.read_json(
+        SAMPLE_JSON)
+    properties = features[0]["properties"]
+    lons, lats = np.array(features[0]["geometry"]["coordinates"][0]).T
+    x, y = forest.geo.web_mercator(lons, lats)
+    np.testing.assert_allclose(polygons["xs"][0], x)
+    np.testing.assert_allclose(polygons["ys"][0], y)
+    assert len(polygons["xs"]) == len(features)
+    assert polygons["PhaseLife"][0] == rdt.fieldValueLUT(
+        "PhaseLife", properties["PhaseLife"])
+    assert polygons["CTPressure"][0] == properties["CTPressure"] / 100
+    x, y = forest.geo.web_mercator(properties["LonTrajCellCG"],
+                                   properties["LatTrajCellCG"])
+    np.testing.assert_allclose(tail_lines["xs"][0], x)
+    npts = sum(len(np.atleast_1d(feature["properties"]["LonTrajCellCG"]))
+               for feature in features)
+    assert len(tail_points["x"]) == npts
+    assert len(tail_points["NumIdCell"]) == npts
+    x, y = forest.geo.web_mercator(properties["LonG"], properties["LatG"])
+    np.testing.assert_allclose(centre_points["x1"][0], x[0])
+    assert len(centre_points["Arrowxs"][0]) == 3
+    assert centre_points["MvtSpeed"][0] == rdt.descale_rdt(
+        "MvtSpeed", properties["MvtSpeed"])[0]
+
+
+def test_loader_caches_files(tmpdir):
+    path = str(tmpdir / "rdt_202001010000.json")
+    with open(path, "w") as stream:
+        json.dump({"features": []}, stream)
+    loader = rdt.Loader(path)
+    with patch("forest.drivers.rdt.read_json",
+               wraps=rdt.read_json) as read_json:
+        loader.load(path)
+        loader.load(path)
+        assert read_json.call_count == 1
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        loader.load(path)
+        assert read_json.call_count == 2
@@ -0,0 +1,144 @@
+import pytest
+import numpy as np
+import xarray
+import datashader
+from forest import regrid
+
+
+def quadmesh(values, gx, gy, x_range, y_range, plot_width, plot_height):
+    canvas = datashader.Canvas(plot_height=plot_height,
+                               plot_width=plot_width,
+                               x_range=x_range,
+                               y_range=y_range)
+    if gx.ndim == 1:
+        xarr = xarray.DataArray(values, coords=[('y', gy), ('x', gx)],
+                                name='Z')
+        return canvas.quadmesh(xarr).values
+    xarr = xarray.DataArray(values, dims=['Y', 'X'],
+                            coords={'Qx': (['Y', 'X'], gx),
+                                    'Qy': (['Y', 'X'], gy)},
+                            name='Z')
+    return canvas.quadmesh(xarr, x='Qx', y='Qy').values
+
+
+def rotated_grid(n, degrees):
+    """Square n by n grid rotated about its centre"""
+    angle = np.deg2rad(degrees)
+    x, y = np.meshgrid(np.linspace(-1, 1, n), np.linspace(-1, 1, n))
+    return (x * np.cos(angle) - y * np.sin(angle),
+            x * np.sin(angle) + y * np.cos(angle))
+
+
+@pytest.mark.parametrize("plot_width,plot_height", [
+    (40, 20),   # Upsample
+    (5, 3),     # Downsample
+    (10, 6),    # Same size
+    (7, 13),    # Mixed
+])
+@pytest.mark.parametrize("curvilinear", [False, True])
+def test_regridder_matches_quadmesh(curvilinear, plot_width, plot_height):
+    if curvilinear:
+        gx, gy = rotated_grid(60, 30)
+        values = np.random.RandomState(0).uniform(size=(60, 60))
+        x_range, y_range = (-1.4, 1.4), (-1.4, 1.4)
+    else:
+        gx = np.linspace(0, 10, 10)
+        gy = np.linspace(0, 5, 6)
+        values = np.arange(60, dtype="f8").reshape(6, 10)
+        x_range, y_range = (0, 10), (0, 5)
+    expect = quadmesh(values, gx, gy, x_range, y_range,
+                      plot_width, plot_height)
+    result = regrid.regridder(gx, gy, x_range, y_range,
+                              plot_width, plot_height)(values)
+    np.testing.assert_array_almost_equal(np.ma.filled(result, np.nan),
+                                         expect)
+
+
+def test_regridder_given_2d_grid():
+    gx, gy = rotated_grid(4, 30)
+    with pytest.raises(ValueError):
+        regrid.Regridder(gx, gy, (-1, 1), (-1, 1), 2, 2)
+    result = regrid.regridder(gx, gy, (-1, 1), (-1, 1), 2, 2)
+    assert isinstance(result, regrid.Quadmesh)
+
+
+def test_regridder_ignores_masked_values():
+    gx, gy = np.arange(4.), np.arange(4.)
+    values = np.ma.masked_array(np.ones((4, 4)), mask=np.zeros((4, 4)))
+    values[0, 0] = 5.
+    values[0, 1] = np.ma.masked
+    values[1, 0] = np.nan
+    result = regrid.Regridder(gx, gy, (-0.5, 3.5), (-0.5, 3.5), 2, 2)(values)
+    np.testing.assert_array_almost_equal(result, [[3., 1.], [1., 1.]])
+
+
+def test_regridder_masks_pixels_outside_grid():
+    gx, gy = np.array([0., 1.]), np.array([0., 1.])
+    values = np.ones((2, 2))
+    result = regrid.Regridder(gx, gy, (10, 11), (10, 11), 2, 2)(values)
+    assert result.mask.all()
+
+
+def test_regridder_is_cached():
+    gx, gy = np.array([0., 1., 2.]), np.array([0., 1.])
+    first = regrid.regridder(gx, gy, (0, 2), (0, 1), 4, 4)
+    second = regrid.regridder(gx.copy(), gy.copy(), (0, 2), (0, 1), 4, 4)
+    third = regrid.regridder(gx, gy, (0, 2), (0, 1), 8, 8)
+    assert first is second
+    assert first is not third
+
+
+def test_signature_depends_on_values_and_shape():
+    a = np.zeros(4)
+    assert regrid.signature(a) == regrid.signature(a.copy())
+    assert regrid.signature(a) != regrid.signature(a + 1)
+    assert regrid.signature(a) != regrid.signature(a.reshape(2, 2))
+
+
+def test_regridder_falls_back_to_quadmesh_given_small_budget(monkeypatch):
+    monkeypatch.setattr(regrid, "REGRID_CACHE",
+                        regrid.ImageCache(max_megabytes=1e-6))
+    gx = np.linspace(0, 10, 10)
+    gy = np.linspace(0, 5, 6)
+    values = np.arange(60, dtype="f8").reshape(6, 10)
+    result = regrid.regridder(gx, gy, (0, 10), (0, 5), 5, 3)
+    assert isinstance(result, regrid.Quadmesh)
+    expect = quadmesh(values, gx, gy, (0, 10), (0, 5), 5, 3)
+    np.testing.assert_array_almost_equal(
+        np.ma.filled(result(values), np.nan), expect)
+
+
+def test_regridder_remembers_oversized_blocks(monkeypatch):
+    monkeypatch.setattr(regrid, "_OVERSIZED", regrid.OrderedDict())
+    gx = np.linspace(0, 10, 10)
+    gy = np.linspace(0, 5, 6)
+    max_nnz = regrid.REGRID_CACHE.max_bytes // regrid.NNZ_BYTES
+    monkeypatch.setattr(regrid.Regridder, "estimate_nnz",
+                        staticmethod(lambda *args: 0))
+    calls = []
+
+    def block_matrix(*args, max_nnz=None):
+        calls.append(max_nnz)
+        return None
+
+    monkeypatch.setattr(regrid, "_block_matrix", block_matrix)
+    for _ in range(2):
+        result = regrid.regridder(gx, gy, (0, 10), (0, 5), 3, 3)
+        assert isinstance(result, regrid.Quadmesh)
+    assert calls == [max_nnz]
+
+
+def test_block_matrix_given_max_nnz():
+    bounds = [np.array([[0.]]), np.array([[1.]]),
+              np.array([[0.]]), np.array([[1.]])]
+    assert regrid._block_matrix((1, 1), (2, 2), *bounds, max_nnz=3) is None
+    matrix = regrid._block_matrix((1, 1), (2, 2), *bounds, max_nnz=4)
+    assert matrix.nnz == 4
+
+
+def test_signature_depends_on_every_value_of_2d_grids():
+    a = np.zeros((1000, 1000))
+    b = a.copy()
+    b[501, 501] = 1
+    assert regrid.signature(a) == regrid.signature(a.copy())
+    assert regrid.signature(a) != regrid.signature(b)
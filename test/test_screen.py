@@ -56,3 +56,22 @@ def test_position_draw_mark():
     pos = {"x": 0, "y": 0}
     marker.place_marker(pos)
 
+
+
+def test_viewport_reducer():
+    action = screen.set_viewport(0, 1, 2, 3, 4, 5)
+    state = screen.reducer({}, action)
+    assert state == {"viewport": {"x_start": 0, "x_end": 1,
+                                  "y_start": 2, "y_end": 3,
+                                  "width": 4, "height": 5}}
+
+
+def test_viewport_listener_emits_action():
+    listener = unittest.mock.Mock()
+    figure = bokeh.plotting.figure(x_range=(0, 1), y_range=(2, 3))
+    viewport_listener = screen.ViewportListener(delay=0)
+    viewport_listener.add_subscriber(listener)
+    viewport_listener.add_figure(figure)
+    figure.x_range.start = -1
+    listener.assert_called_once_with(screen.set_viewport(
+        -1, 1, 2, 3, figure.inner_width, figure.inner_height))
@@ -0,0 +1,117 @@
+import threading
+import time
+import forest.sync
+import forest.app_hooks
+import forest.watch
+
+
+class FakeDataset:
+    def __init__(self, inserted=1, error=None):
+        self.inserted = inserted
+        self.error = error
+        self.refreshed = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def sync(self, progress=None):
+        self.release.wait()
+        if self.error is not None:
+            raise self.error
+        progress(self.inserted, self.inserted)
+        return self.inserted
+
+    def refresh(self):
+        self.refreshed += 1
+
+
+def test_worker_runs_sync_and_refreshes_dataset():
+    worker = forest.sync.SyncWorker()
+    dataset = FakeDataset(inserted=3)
+    assert worker.submit(dataset).result() == 3
+    status = worker.progress(dataset)
+    assert status.running is False
+    assert (status.done, status.total, status.inserted) == (3, 3, 3)
+    assert status.finished is not None
+    assert dataset.refreshed == 1
+
+
+def test_worker_does_not_refresh_if_nothing_inserted():
+    worker = forest.sync.SyncWorker()
+    dataset = FakeDataset(inserted=0)
+    worker.submit(dataset).result()
+    assert dataset.refreshed == 0
+
+
+def test_worker_skips_dataset_already_being_synced():
+    worker = forest.sync.SyncWorker()
+    dataset = FakeDataset()
+    dataset.release.clear()
+    future = worker.submit(dataset)
+    assert worker.submit(dataset) is None
+    dataset.release.set()
+    future.result()
+    assert worker.submit(dataset) is not None
+
+
+def test_worker_records_errors():
+    worker = forest.sync.SyncWorker()
+    dataset = FakeDataset(error=OSError("S3 object unavailable"))
+    assert worker.submit(dataset).result() == 0
+    status = worker.progress(dataset)
+    assert status.running is False
+    assert status.error == "S3 object unavailable"
+
+
+def test_worker_refreshes_on_loop():
+    class Loop:
+        def __init__(self):
+            self.callbacks = []
+
+        def add_callback(self, callback):
+            self.callbacks.append(callback)
+
+    loop = Loop()
+    worker = forest.sync.SyncWorker(loop=loop)
+    dataset = FakeDataset()
+    worker.submit(dataset).result()
+    assert dataset.refreshed == 0
+    assert loop.callbacks == [dataset.refresh]
+
+
+def test_dataset_sync_callback_submits_syncable_datasets():
+    worker = forest.sync.SyncWorker()
+    dataset = FakeDataset()
+    callback = forest.app_hooks.DatasetSyncCallback(
+        [dataset, object()], worker)
+    callback()
+    worker.shutdown()
+    assert worker.progress(dataset).inserted == 1
+
+
+def test_worker_syncs_again_if_submitted_while_running():
+    worker = forest.sync.SyncWorker()
+    dataset = FakeDataset()
+    dataset.release.clear()
+    worker.submit(dataset)
+    assert worker.submit(dataset) is None
+    dataset.release.set()
+    assert wait_for(lambda: dataset.refreshed == 2)
+
+
+def test_worker_subscribe_syncs_when_files_added(tmpdir):
+    worker = forest.sync.SyncWorker()
+    dataset = FakeDataset()
+    catalogue = forest.watch.Catalogue(str(tmpdir / "*.nc"))
+    worker.subscribe(dataset, catalogue)
+    catalogue.update(removed=[str(tmpdir / "a.nc")])
+    catalogue.update(added=[str(tmpdir / "a.nc")])
+    assert wait_for(lambda: dataset.refreshed == 1)
+
+
+def wait_for(predicate, timeout=5):
+    end = time.time() + timeout
+    while time.time() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
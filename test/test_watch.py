@@ -0,0 +1,204 @@
+import datetime as dt
+import os
+import time
+import pytest
+import forest.watch
+from forest.watch import Catalogue, Watcher
+
+
+def touch(path):
+    with open(path, "w"):
+        pass
+
+
+def wait_for(predicate, timeout=5):
+    end = time.time() + timeout
+    while time.time() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_catalogue_paths_sorted(tmpdir):
+    for name in ["b.nc", "a.nc", "c.txt"]:
+        touch(str(tmpdir / name))
+    catalogue = Catalogue(str(tmpdir / "*.nc"))
+    assert catalogue.paths == [str(tmpdir / "a.nc"), str(tmpdir / "b.nc")]
+
+
+def test_catalogue_rescan_notifies_subscribers(tmpdir):
+    touch(str(tmpdir / "a.nc"))
+    catalogue = Catalogue(str(tmpdir / "*.nc"))
+    catalogue.rescan()
+    calls = []
+    catalogue.subscribe(lambda added, removed: calls.append((added, removed)))
+    touch(str(tmpdir / "b.nc"))
+    os.remove(str(tmpdir / "a.nc"))
+    catalogue.rescan()
+    assert calls == [([str(tmpdir / "b.nc")], [str(tmpdir / "a.nc")])]
+    assert catalogue.paths == [str(tmpdir / "b.nc")]
+
+
+def test_catalogue_follow_reports_each_path_once(tmpdir):
+    touch(str(tmpdir / "a.nc"))
+    catalogue = Catalogue(str(tmpdir / "*.nc"))
+    calls = []
+    catalogue.follow(lambda added, removed: calls.append((added, removed)))
+    touch(str(tmpdir / "b.nc"))
+    catalogue.rescan()
+    assert calls == [([str(tmpdir / "a.nc")], []),
+                     ([str(tmpdir / "b.nc")], [])]
+
+
+def test_catalogue_rescan_skips_unchanged_directories(tmpdir):
+    directory = tmpdir / "old"
+    directory.mkdir()
+    touch(str(directory / "a.nc"))
+    past = time.time() - 60
+    os.utime(str(directory), (past, past))
+    catalogue = Catalogue(str(tmpdir / "*" / "*.nc"))
+    catalogue.rescan()
+    listing = catalogue._listings[str(directory)]
+    catalogue.rescan()
+    assert catalogue._listings[str(directory)] is listing
+
+
+def test_catalogue_unwatched_rescans_after_max_age(tmpdir):
+    catalogue = Catalogue(str(tmpdir / "*.nc"), max_age=dt.timedelta(0))
+    assert catalogue.paths == []
+    touch(str(tmpdir / "a.nc"))
+    assert catalogue.paths == [str(tmpdir / "a.nc")]
+
+
+def test_catalogue_unwatched_uses_cache_within_max_age(tmpdir):
+    catalogue = Catalogue(str(tmpdir / "*.nc"),
+                          max_age=dt.timedelta(minutes=10))
+    assert catalogue.paths == []
+    touch(str(tmpdir / "a.nc"))
+    assert catalogue.paths == []
+
+
+@pytest.mark.parametrize("pattern,path,expect", [
+    ("/data/*.nc", "/data/file.nc", True),
+    ("/data/*.nc", "/data/sub/file.nc", False),
+    ("/data/*/*.nc", "/data/sub/file.nc", True),
+    ("/data/*.nc", "/data/file.txt", False),
+])
+def test_catalogue_match(pattern, path, expect):
+    assert Catalogue(pattern).match(path) == expect
+
+
+@pytest.mark.parametrize("pattern,root,recursive", [
+    ("/data/*.nc", "/data", False),
+    ("/data/2020*/*.nc", "/data", True),
+    ("/*/*.nc", "/", True),
+    ("*.nc", ".", False),
+])
+def test_catalogue_root(pattern, root, recursive):
+    catalogue = Catalogue(pattern)
+    assert catalogue.root == root
+    assert catalogue.recursive == recursive
+
+
+def test_catalogue_add_and_remove_events(tmpdir):
+    catalogue = Catalogue(str(tmpdir / "*.nc"))
+    catalogue.rescan()
+    catalogue.add(str(tmpdir / "b.nc"))
+    catalogue.add(str(tmpdir / "a.nc"))
+    catalogue.add(str(tmpdir / "a.txt"))
+    assert catalogue.paths == [str(tmpdir / "a.nc"), str(tmpdir / "b.nc")]
+    catalogue.remove(str(tmpdir / "a.nc"))
+    assert catalogue.paths == [str(tmpdir / "b.nc")]
+
+
+class Event:
+    def __init__(self, event_type, src_path, dest_path=None):
+        self.event_type = event_type
+        self.src_path = src_path
+        self.dest_path = dest_path
+        self.is_directory = False
+
+
+def test_handler_adds_created_files_once_closed(tmpdir):
+    path = str(tmpdir / "a.nc")
+    catalogue = Catalogue(str(tmpdir / "*.nc"))
+    catalogue.rescan()
+    touch(path)
+    handler = forest.watch._Handler(catalogue, settle=60)
+    handler.dispatch(Event("created", path))
+    assert catalogue.paths == []
+    handler.dispatch(Event("closed", path))
+    assert catalogue.paths == [path]
+    assert handler._pending == {}
+
+
+def test_handler_adds_created_files_once_size_settles(tmpdir):
+    path = str(tmpdir / "a.nc")
+    catalogue = Catalogue(str(tmpdir / "*.nc"))
+    catalogue.rescan()
+    with open(path, "w") as stream:
+        stream.write("partial")
+    handler = forest.watch._Handler(catalogue, settle=0.01)
+    handler.dispatch(Event("created", path))
+    assert wait_for(lambda: catalogue.paths == [path])
+
+
+def test_handler_adds_moved_files(tmpdir):
+    catalogue = Catalogue(str(tmpdir / "*.nc"))
+    catalogue.rescan()
+    handler = forest.watch._Handler(catalogue, settle=60)
+    handler.dispatch(Event("moved", str(tmpdir / "a.tmp"),
+                           str(tmpdir / "a.nc")))
+    assert catalogue.paths == [str(tmpdir / "a.nc")]
+
+
+def test_watcher_shares_catalogues():
+    watcher = Watcher()
+    a = watcher.catalogue("/data/*.nc", max_age=dt.timedelta(minutes=15))
+    b = watcher.catalogue("/data/*.nc", max_age=dt.timedelta(minutes=10))
+    assert a is b
+    assert a.max_age == dt.timedelta(minutes=10)
+
+
+def test_watcher_poll(tmpdir):
+    watcher = Watcher()
+    watcher.configure(method="poll", interval=0.01)
+    try:
+        catalogue = watcher.catalogue(str(tmpdir / "*.nc"))
+        assert catalogue.watched
+        assert catalogue.paths == []
+        touch(str(tmpdir / "a.nc"))
+        assert wait_for(lambda: catalogue.paths == [str(tmpdir / "a.nc")])
+    finally:
+        watcher.stop()
+    assert not catalogue.watched
+
+
+def test_watcher_inotify(tmpdir):
+    pytest.importorskip("watchdog")
+    watcher = Watcher()
+    watcher.configure(method="inotify")
+    try:
+        catalogue = watcher.catalogue(str(tmpdir / "*.nc"))
+        touch(str(tmpdir / "a.nc"))
+        assert wait_for(lambda: catalogue.paths == [str(tmpdir / "a.nc")])
+    finally:
+        watcher.stop()
+
+
+def test_watcher_configure_given_unknown_method():
+    with pytest.raises(ValueError):
+        Watcher().configure(method="magic")
+
+
+def test_is_network(tmpdir):
+    mounts = str(tmpdir / "mounts")
+    with open(mounts, "w") as stream:
+        stream.write("/dev/sda1 / ext4 rw 0 0\n")
+        stream.write("goofys /s3 fuse.goofys rw 0 0\n")
+        stream.write("server:/home /home nfs4 rw 0 0\n")
+    assert forest.watch.is_network("/s3/bucket/file.nc", mounts)
+    assert forest.watch.is_network("/home/user", mounts)
+    assert not forest.watch.is_network("/s3bucket", mounts)
+    assert not forest.watch.is_network("/data", mounts)